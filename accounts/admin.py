@@ -1,8 +1,134 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.contrib.auth.forms import UserChangeForm, UserCreationForm
+
+from core.admin import ReplicaChangeListMixin
+from core.paginator import EstimatedCountPaginator
+
 from .models import User, Customer, UserBankAccount, BankAccountType, UserAddress
+from .search import account_search_q
+
+
+class AccountSearchMixin:
+    """
+    Replace the admin's ``icontains``/``istartswith`` search, which can not
+    use an index, with the index-friendly prefix search of ``account_list``.
+    """
+    account_search_path = ''
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return (
+            queryset.filter(
+                account_search_q(search_term, self.account_search_path)
+            ),
+            False,
+        )
+
+
+class UserAdminCreationForm(UserCreationForm):
+    class Meta:
+        model = User
+        fields = ('email',)
+
+
+class UserAdminChangeForm(UserChangeForm):
+    class Meta:
+        model = User
+        fields = '__all__'
+
+
+@admin.register(User)
+class UserAdmin(ReplicaChangeListMixin, BaseUserAdmin):
+    form = UserAdminChangeForm
+    add_form = UserAdminCreationForm
+    fieldsets = (
+        (None, {'fields': ('email', 'password')}),
+        ('Personal info', {'fields': ('first_name', 'last_name')}),
+        ('Permissions', {
+            'fields': (
+                'is_active',
+                'is_staff',
+                'is_superuser',
+                'groups',
+                'user_permissions',
+            ),
+        }),
+        ('Important dates', {'fields': ('last_login', 'date_joined')}),
+    )
+    add_fieldsets = (
+        (None, {
+            'classes': ('wide',),
+            'fields': ('email', 'password1', 'password2'),
+        }),
+    )
+    list_display = ('email', 'first_name', 'last_name', 'is_staff')
+    list_filter = ('is_staff', 'is_superuser', 'is_active')
+    search_fields = ('email',)
+    ordering = ('email',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(email__startswith=search_term.strip()), False
+
+
+@admin.register(Customer)
+class CustomerAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = ('user', 'phone')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    search_fields = ('user__email',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return (
+            queryset.filter(user__email__startswith=search_term.strip()),
+            False,
+        )
+
+
+@admin.register(UserBankAccount)
+class UserBankAccountAdmin(
+    ReplicaChangeListMixin, AccountSearchMixin, admin.ModelAdmin
+):
+    list_display = ('account_no', 'user', 'account_type', 'balance')
+    list_select_related = ('user', 'account_type')
+    list_filter = ('account_type',)
+    raw_id_fields = ('user', 'customer')
+    search_fields = ('account_no', 'user__email')
+    ordering = ('account_no',)
+    # Maintained by the posting engine; see verify_account_aggregates.
+    readonly_fields = (
+        'total_credit',
+        'total_debit',
+        'daily_credit',
+        'daily_debit',
+        'monthly_credit',
+        'monthly_debit',
+        'transaction_count',
+        'last_transaction_at',
+        'counters_date',
+        'ledger_sequence',
+        'ledger_head_hash',
+    )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(UserAddress)
+class UserAddressAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = ('user', 'city', 'country')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
 
-admin.site.register(User)
-admin.site.register(Customer)
-admin.site.register(UserBankAccount)
 admin.site.register(BankAccountType)
-admin.site.register(UserAddress)
@@ -3,3 +3,18 @@ from django.apps import AppConfig
 
 class AccountsConfig(AppConfig):
     name = 'accounts'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from .cache import (
+            account_changed,
+            account_type_changed,
+            user_changed,
+        )
+        from .models import BankAccountType, User, UserBankAccount
+
+        for signal in (post_save, post_delete):
+            signal.connect(user_changed, sender=User)
+            signal.connect(account_changed, sender=UserBankAccount)
+            signal.connect(account_type_changed, sender=BankAccountType)
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from . import cache, hashers
+
+
+class PasswordPolicyBackend(ModelBackend):
+    """
+    ``ModelBackend`` that checks passwords through ``accounts.hashers`` and
+    stores the upgraded hash of an outdated one before the session is
+    created.
+
+    The session's user comes from ``accounts.cache``, joined to their bank
+    account and its type in one query, or none at all from a shared cache
+    (``CACHE_SESSION_USER``).
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway, so an unknown e-mail takes as long as a wrong
+            # password.
+            UserModel().set_password(password)
+            return None
+
+        valid, upgraded = hashers.check_password(password, user.password)
+        if not valid or not self.user_can_authenticate(user):
+            return None
+        if upgraded:
+            user.password = upgraded
+            user.save(update_fields=['password'])
+        return user
+
+    def get_user(self, user_id):
+        user = cache.get_user(user_id)
+        return user if self.user_can_authenticate(user) else None
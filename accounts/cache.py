@@ -0,0 +1,175 @@
+"""
+Per-account caching.
+
+Every account has a version number in the cache, keyed by its owner's user
+id. Cached views of an account store the version they were built from and
+are only served while it is still current; the posting path bumps the
+version after each commit that touches the account. Stale entries are never
+deleted, they just stop matching and expire on their own. Only a cache all
+processes share sees every bump, so ``CACHE_DASHBOARD`` and
+``CACHE_SESSION_USER`` are off without one.
+
+With ``CACHE_SESSION_USER``, the signed-in user is cached the same way,
+with their bank account and its type, so authenticated requests do not
+load them from the database. Saving a user or account bumps its version,
+and saving any account type bumps a version shared by all users.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+
+
+def version_key(user_id):
+    return f'account:{user_id}:version'
+
+
+def dashboard_key(user_id):
+    return f'account:{user_id}:dashboard'
+
+
+def user_key(user_id):
+    return f'account:{user_id}:user'
+
+
+ACCOUNT_TYPES_VERSION_KEY = 'account-types:version'
+
+
+def _new_version(user_id):
+    # Start from the clock rather than 1, so a version key that was evicted
+    # can never come back with a value an old entry was stored under.
+    cache.add(version_key(user_id), time.time_ns(), timeout=None)
+    return cache.get(version_key(user_id))
+
+
+def invalidate_account(user_id):
+    try:
+        cache.incr(version_key(user_id))
+    except ValueError:
+        _new_version(user_id)
+
+
+def invalidate_accounts(user_ids):
+    for user_id in set(user_ids):
+        invalidate_account(user_id)
+
+
+def _new_account_types_version():
+    cache.add(ACCOUNT_TYPES_VERSION_KEY, time.time_ns(), timeout=None)
+    return cache.get(ACCOUNT_TYPES_VERSION_KEY)
+
+
+def invalidate_account_types():
+    try:
+        cache.incr(ACCOUNT_TYPES_VERSION_KEY)
+    except ValueError:
+        _new_account_types_version()
+
+
+def _load_user(user_id):
+    from django.contrib.auth import get_user_model
+
+    UserModel = get_user_model()
+    # Always from the primary: a replica's older copy would be cached under
+    # the current version.
+    return UserModel._default_manager.using(
+        router.db_for_write(UserModel)
+    ).select_related('account__account_type').filter(pk=user_id).first()
+
+
+def get_user(user_id):
+    """
+    Return the user with ``user_id``, with ``account`` and
+    ``account.account_type`` loaded, or ``None`` if there is no such user.
+    With ``CACHE_SESSION_USER``, a warm cache answers with a single
+    ``get_many`` and no database queries.
+    """
+    if not settings.CACHE_SESSION_USER:
+        return _load_user(user_id)
+
+    keys = [
+        version_key(user_id), ACCOUNT_TYPES_VERSION_KEY, user_key(user_id)
+    ]
+    cached = cache.get_many(keys)
+    version = cached.get(keys[0])
+    if version is None:
+        version = _new_version(user_id)
+    types_version = cached.get(keys[1])
+    if types_version is None:
+        types_version = _new_account_types_version()
+
+    entry = cached.get(keys[2])
+    if entry is not None and entry['version'] == (version, types_version):
+        return entry['user']
+
+    user = _load_user(user_id)
+    if user is None:
+        return None
+
+    cache.set(
+        keys[2],
+        {'version': (version, types_version), 'user': user},
+        timeout=settings.ACCOUNT_CACHE_TIMEOUT,
+    )
+    return user
+
+
+# -------------------------
+# SIGNALS
+# -------------------------
+# Bumping before the commit would let a concurrent request cache the old
+# rows under the new version.
+def account_changed(sender, instance, using, **kwargs):
+    transaction.on_commit(
+        lambda: invalidate_account(instance.user_id), using=using
+    )
+
+
+def user_changed(sender, instance, using, **kwargs):
+    transaction.on_commit(lambda: invalidate_account(instance.pk), using=using)
+
+
+def account_type_changed(sender, instance, using, **kwargs):
+    transaction.on_commit(invalidate_account_types, using=using)
+
+
+def _load_dashboard(user, version=None):
+    from .models import UserBankAccount
+
+    try:
+        # Loaded with the user by ``get_user``.
+        account = user.account
+    except UserBankAccount.DoesNotExist:
+        return None
+    return {
+        'version': version,
+        'account': account,
+        'transactions': list(account.transactions.order_by('-timestamp')[:5]),
+    }
+
+
+def get_dashboard(user):
+    """
+    Return ``{'account': ..., 'transactions': [...]}`` for the dashboard of
+    ``user``, or ``None`` if they have no bank account. With
+    ``CACHE_DASHBOARD``, a warm cache answers with a single ``get_many``
+    and no database queries.
+    """
+    if not settings.CACHE_DASHBOARD:
+        return _load_dashboard(user)
+
+    keys = [version_key(user.pk), dashboard_key(user.pk)]
+    cached = cache.get_many(keys)
+    version = cached.get(keys[0])
+    if version is None:
+        version = _new_version(user.pk)
+
+    summary = cached.get(keys[1])
+    if summary is not None and summary['version'] == version:
+        return summary
+
+    summary = _load_dashboard(user, version)
+    if summary is not None:
+        cache.set(keys[1], summary, timeout=settings.ACCOUNT_CACHE_TIMEOUT)
+    return summary
@@ -5,3 +5,15 @@ GENDER_CHOICE = (
     (MALE, "Male"),
     (FEMALE, "Female"),
 )
+
+MONTHLY = 12
+QUARTERLY = 4
+HALF_YEARLY = 2
+YEARLY = 1
+
+INTEREST_CALCULATION_CHOICE = (
+    (MONTHLY, "Monthly"),
+    (QUARTERLY, "Quarterly"),
+    (HALF_YEARLY, "Half-yearly"),
+    (YEARLY, "Yearly"),
+)
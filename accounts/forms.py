@@ -1,5 +1,4 @@
 from django import forms
-from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm
 from django.db import transaction
 
@@ -11,6 +10,7 @@ from .models import (
     UserAddress,
 )
 from .constants import GENDER_CHOICE
+from .numbers import next_account_no
 
 
 # -------------------------
@@ -49,9 +49,8 @@ class UserRegistrationForm(UserCreationForm):
 
     @transaction.atomic
     def save(self, commit=True):
-        # Create User
+        # Create User. UserCreationForm has already hashed the password.
         user = super().save(commit=False)
-        user.set_password(self.cleaned_data['password1'])
 
         if commit:
             user.save()
@@ -66,7 +65,7 @@ class UserRegistrationForm(UserCreationForm):
                 account_type=self.cleaned_data.get('account_type'),
                 gender=self.cleaned_data.get('gender'),
                 birth_date=self.cleaned_data.get('birth_date'),
-                account_no=user.id + settings.ACCOUNT_NUMBER_START_FROM,
+                account_no=next_account_no(),
             )
 
         return user
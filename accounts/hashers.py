@@ -0,0 +1,96 @@
+"""
+Password hashing policy.
+
+``settings.PASSWORD_HASHER`` picks the hasher for new passwords and its cost
+comes from ``settings.PASSWORD_HASHING``, so each deployment can trade login
+latency against brute-force resistance (measure with
+``python -m benchmarks logins``). The hashers below keep Django's algorithm
+names, so existing hashes of any listed algorithm still verify, and
+``must_update`` flags hashes made with other costs. Outdated hashes are
+replaced on login, as Django does.
+
+Hashing runs in the request thread. hashlib's PBKDF2 and scrypt and
+argon2-cffi release the GIL while they work, and Django's ASGI handler runs
+each request's sync code in a thread of its own, so a login only ever holds
+its own thread. Moving the work to a process pool would add a round trip of
+inter-process communication and still block that thread on the result.
+"""
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+# -------------------------
+# HASHERS
+# -------------------------
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASHING['pbkdf2']['iterations']
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_HASHING['scrypt']['work_factor']
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_HASHING['scrypt']['block_size']
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_HASHING['scrypt']['parallelism']
+
+    @property
+    def maxmem(self):
+        # scrypt needs 128 * N * r bytes; OpenSSL refuses more than 32 MiB
+        # unless allowed.
+        return 256 * self.work_factor * self.block_size
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_HASHING['argon2']['time_cost']
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_HASHING['argon2']['memory_cost']
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_HASHING['argon2']['parallelism']
+
+
+# -------------------------
+# POLICY
+# -------------------------
+def is_outdated(encoded):
+    """
+    Whether a valid password with hash ``encoded`` should be rehashed with
+    the current policy. Depends only on the hash, not the password.
+    """
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+    preferred = hashers.get_hasher()
+    return (
+        hasher.algorithm != preferred.algorithm
+        or preferred.must_update(encoded)
+    )
+
+
+def check_password(password, encoded):
+    """
+    Check ``password`` against ``encoded`` and return ``(valid, upgraded)``,
+    where ``upgraded`` is the new hash to store when ``encoded`` is outdated.
+    """
+    valid = hashers.check_password(password, encoded)
+    if valid and is_outdated(encoded):
+        return valid, hashers.make_password(password)
+    return valid, None
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.16 on 2026-10-18 18:47
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankaccounttype',
+            name='annual_interest_rate',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Interest rate from 0 - 100', max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)]),
+        ),
+        migrations.AddField(
+            model_name='bankaccounttype',
+            name='interest_calculation_per_year',
+            field=models.PositiveSmallIntegerField(choices=[(12, 'Monthly'), (4, 'Quarterly'), (2, 'Half-yearly'), (1, 'Yearly')], default=12, help_text='How many times interest is compounded in a year'),
+        ),
+        migrations.AddField(
+            model_name='userbankaccount',
+            name='interest_accrued_until',
+            field=models.DateField(blank=True, help_text='End of the last period interest was credited for', null=True),
+        ),
+    ]
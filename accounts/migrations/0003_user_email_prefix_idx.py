@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 18:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_interest_fields'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['email'], name='user_email_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
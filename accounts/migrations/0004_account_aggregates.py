@@ -0,0 +1,63 @@
+# Generated by Django 4.2.16 on 2026-10-18 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_email_prefix_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankaccounttype',
+            name='maximum_daily_withdrawal_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Leave empty for no daily limit', max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='userbankaccount',
+            name='counters_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userbankaccount',
+            name='daily_credit',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='userbankaccount',
+            name='daily_debit',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='userbankaccount',
+            name='last_transaction_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userbankaccount',
+            name='monthly_credit',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='userbankaccount',
+            name='monthly_debit',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='userbankaccount',
+            name='total_credit',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='userbankaccount',
+            name='total_debit',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='userbankaccount',
+            name='transaction_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_account_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankaccounttype',
+            name='maximum_hourly_withdrawal_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Over any sliding hour. Leave empty for no hourly limit', max_digits=12, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_hourly_withdrawal_limit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userbankaccount',
+            name='ledger_head_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='userbankaccount',
+            name='ledger_sequence',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
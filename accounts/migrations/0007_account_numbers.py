@@ -0,0 +1,51 @@
+# Generated by Django 4.2.16 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+SEQUENCE = 'accounts_account_no_seq'
+
+
+def create_counter(apps, schema_editor):
+    """
+    Create the counter ``accounts.numbers`` allocates from: a sequence on
+    PostgreSQL, the single ``AccountNumberCounter`` row elsewhere.
+    """
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE SEQUENCE IF NOT EXISTS '
+            f'{schema_editor.quote_name(SEQUENCE)}'
+        )
+        return
+    AccountNumberCounter = apps.get_model('accounts', 'AccountNumberCounter')
+    AccountNumberCounter.objects.using(connection.alias).get_or_create(pk=1)
+
+
+def drop_counter(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'DROP SEQUENCE IF EXISTS {schema_editor.quote_name(SEQUENCE)}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_ledger_head'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountNumberCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='userbankaccount',
+            name='account_no',
+            field=models.PositiveBigIntegerField(unique=True),
+        ),
+        migrations.RunPython(create_counter, drop_counter),
+    ]
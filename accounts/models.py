@@ -1,8 +1,12 @@
+from decimal import Decimal
+
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 
-from .constants import GENDER_CHOICE
+from .constants import GENDER_CHOICE, INTEREST_CALCULATION_CHOICE, MONTHLY
 from .managers import UserManager
 
 
@@ -27,6 +31,16 @@ class User(AbstractUser):
             return self.account.balance
         return 0
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Serves ``email LIKE 'prefix%'`` under any collation.
+            models.Index(
+                fields=['email'],
+                name='user_email_prefix_idx',
+                opclasses=['varchar_pattern_ops'],
+            ),
+        ]
+
 
 # -------------------------
 # CUSTOMER MODEL
@@ -52,10 +66,45 @@ class BankAccountType(models.Model):
         max_digits=12,
         decimal_places=2
     )
+    maximum_daily_withdrawal_amount = models.DecimalField(
+        null=True,
+        blank=True,
+        max_digits=12,
+        decimal_places=2,
+        help_text='Leave empty for no daily limit',
+    )
+    maximum_hourly_withdrawal_amount = models.DecimalField(
+        null=True,
+        blank=True,
+        max_digits=12,
+        decimal_places=2,
+        help_text='Over any sliding hour. Leave empty for no hourly limit',
+    )
+    annual_interest_rate = models.DecimalField(
+        default=0,
+        max_digits=5,
+        decimal_places=2,
+        validators=(
+            MinValueValidator(0),
+            MaxValueValidator(100),
+        ),
+        help_text='Interest rate from 0 - 100',
+    )
+    interest_calculation_per_year = models.PositiveSmallIntegerField(
+        default=MONTHLY,
+        choices=INTEREST_CALCULATION_CHOICE,
+        help_text='How many times interest is compounded in a year',
+    )
 
     def __str__(self):
         return self.name
 
+    def is_interest_month(self, month):
+        """
+        Whether interest is credited at the end of ``month`` (1 - 12).
+        """
+        return month % (12 // self.interest_calculation_per_year) == 0
+
 
 # -------------------------
 # USER BANK ACCOUNT
@@ -77,7 +126,8 @@ class UserBankAccount(models.Model):
         BankAccountType,
         on_delete=models.CASCADE
     )
-    account_no = models.PositiveIntegerField(unique=True)
+    # Allocated by ``accounts.numbers``.
+    account_no = models.PositiveBigIntegerField(unique=True)
     gender = models.CharField(max_length=1, choices=GENDER_CHOICE)
     birth_date = models.DateField(null=True, blank=True)
     balance = models.DecimalField(
@@ -85,10 +135,79 @@ class UserBankAccount(models.Model):
         max_digits=12,
         decimal_places=2
     )
+    interest_accrued_until = models.DateField(
+        null=True,
+        blank=True,
+        help_text='End of the last period interest was credited for',
+    )
+
+    # Running aggregates, maintained by the posting engine in the same
+    # statement as the balance. The daily and monthly totals belong to the
+    # day and month of ``counters_date`` and restart on the next posting
+    # after it; read them through ``daily_totals``/``monthly_totals``.
+    total_credit = models.DecimalField(
+        default=0,
+        max_digits=14,
+        decimal_places=2
+    )
+    total_debit = models.DecimalField(
+        default=0,
+        max_digits=14,
+        decimal_places=2
+    )
+    daily_credit = models.DecimalField(
+        default=0,
+        max_digits=12,
+        decimal_places=2
+    )
+    daily_debit = models.DecimalField(
+        default=0,
+        max_digits=12,
+        decimal_places=2
+    )
+    monthly_credit = models.DecimalField(
+        default=0,
+        max_digits=12,
+        decimal_places=2
+    )
+    monthly_debit = models.DecimalField(
+        default=0,
+        max_digits=12,
+        decimal_places=2
+    )
+    transaction_count = models.PositiveIntegerField(default=0)
+    last_transaction_at = models.DateTimeField(null=True, blank=True)
+    counters_date = models.DateField(null=True, blank=True)
+
+    # Head of the account's ledger hash chain, advanced by the posting
+    # engine with every row it writes.
+    ledger_sequence = models.PositiveBigIntegerField(default=0)
+    ledger_head_hash = models.CharField(max_length=64, blank=True)
 
     def __str__(self):
         return str(self.account_no)
 
+    def daily_totals(self, today=None):
+        """
+        Return ``(credit, debit)`` posted today.
+        """
+        today = today or timezone.localdate()
+        if self.counters_date is None or self.counters_date < today:
+            return Decimal('0.00'), Decimal('0.00')
+        return self.daily_credit, self.daily_debit
+
+    def monthly_totals(self, today=None):
+        """
+        Return ``(credit, debit)`` posted in the current month.
+        """
+        today = today or timezone.localdate()
+        if (
+            self.counters_date is None
+            or self.counters_date < today.replace(day=1)
+        ):
+            return Decimal('0.00'), Decimal('0.00')
+        return self.monthly_credit, self.monthly_debit
+
 
 # -------------------------
 # USER ADDRESS
@@ -106,3 +225,17 @@ class UserAddress(models.Model):
 
     def __str__(self):
         return self.user.email
+
+
+# -------------------------
+# ACCOUNT NUMBER COUNTER
+# -------------------------
+class AccountNumberCounter(models.Model):
+    """
+    Single-row counter ``accounts.numbers`` allocates from on databases
+    without sequences. PostgreSQL uses a sequence instead.
+    """
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.last_value)
@@ -0,0 +1,110 @@
+"""
+Account number allocation.
+
+Numbers come from a database counter, the ``accounts_account_no_seq``
+sequence on PostgreSQL and the ``AccountNumberCounter`` row elsewhere. Value
+``n`` becomes ``ACCOUNT_NUMBER_START_FROM + n`` followed by its Luhn check
+digit, which catches any single mistyped digit and most swapped neighbours.
+Numbers given out before, ``ACCOUNT_NUMBER_START_FROM + user id``, are one
+digit shorter, so the two never collide.
+
+Sequences are not transactional, so on PostgreSQL each process reserves
+``ACCOUNT_NUMBER_BLOCK_SIZE`` values in one round trip and hands them out
+from memory; values a process never uses are skipped. The counter row is
+updated in the caller's transaction, which may roll back, so there only the
+numbers needed are reserved.
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.db import connections, router
+
+from .models import AccountNumberCounter
+
+SEQUENCE = 'accounts_account_no_seq'
+
+_block = []
+_block_pid = None
+_lock = threading.Lock()
+
+
+def check_digit(number):
+    """
+    The Luhn check digit of ``number``.
+    """
+    total = 0
+    for position, digit in enumerate(reversed(str(number))):
+        digit = int(digit)
+        if position % 2 == 0:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return (10 - total % 10) % 10
+
+
+def is_valid(account_no):
+    """
+    Whether ``account_no``'s last digit is the check digit of the rest.
+    """
+    number, digit = divmod(account_no, 10)
+    return number > 0 and check_digit(number) == digit
+
+
+def account_no(value):
+    number = settings.ACCOUNT_NUMBER_START_FROM + value
+    return number * 10 + check_digit(number)
+
+
+def reserve(count, using):
+    """
+    Reserve ``count`` counter values and return them.
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT nextval(%s) FROM generate_series(1, %s)',
+                [SEQUENCE, count],
+            )
+            return [value for value, in cursor.fetchall()]
+
+        cursor.execute(
+            f'UPDATE {AccountNumberCounter._meta.db_table} '
+            f'SET last_value = last_value + %s WHERE id = 1 '
+            f'RETURNING last_value',
+            [count],
+        )
+        last = cursor.fetchone()[0]
+    return list(range(last - count + 1, last + 1))
+
+
+def allocate(count, using=None):
+    """
+    Return ``count`` new account numbers.
+    """
+    using = using or router.db_for_write(AccountNumberCounter)
+    return [account_no(value) for value in reserve(count, using)]
+
+
+def next_account_no(using=None):
+    """
+    Return a new account number, from the process's block on PostgreSQL.
+    """
+    global _block_pid
+
+    using = using or router.db_for_write(AccountNumberCounter)
+    if connections[using].vendor != 'postgresql':
+        return allocate(1, using)[0]
+
+    with _lock:
+        if _block_pid != os.getpid():
+            # A forked worker must not hand out its parent's block.
+            _block.clear()
+            _block_pid = os.getpid()
+        if not _block:
+            _block.extend(
+                reversed(reserve(settings.ACCOUNT_NUMBER_BLOCK_SIZE, using))
+            )
+        return account_no(_block.pop())
@@ -0,0 +1,273 @@
+"""
+Bulk onboarding of customers migrated from legacy systems.
+
+Records are streamed and processed in chunks, like ``transactions.batch``.
+Each chunk is one database transaction that writes its users, customers,
+bank accounts and addresses with one ``bulk_create`` each, so memory use is
+bounded by the chunk size and a million customers take a few hundred
+transactions.
+
+Each record needs ``email``, ``account_type`` (a ``BankAccountType`` name)
+and ``gender``, and may have ``first_name``, ``last_name``, ``birth_date``
+(YYYY-MM-DD), ``phone``, ``password``, ``account_no`` and an address
+(``street_address``, ``city``, ``postal_code`` and ``country``, all or
+none).
+
+Passwords are never hashed here: a legacy hash in a format one of
+``PASSWORD_HASHERS`` understands is stored as is, and a missing one leaves
+the password unusable until the customer resets it. Records without an
+``account_no`` get one from ``accounts.numbers``. E-mails that already
+exist are skipped, so an interrupted run can be restarted with the same
+file.
+"""
+import datetime
+import secrets
+import time
+from collections import namedtuple
+from itertools import islice
+
+from django.contrib.auth.hashers import (
+    UNUSABLE_PASSWORD_PREFIX,
+    identify_hasher,
+)
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import router, transaction
+
+from .constants import GENDER_CHOICE
+from .models import (
+    BankAccountType,
+    Customer,
+    User,
+    UserAddress,
+    UserBankAccount,
+)
+from .numbers import allocate
+from .search import MAX_ACCOUNT_NO
+
+DEFAULT_CHUNK_SIZE = 5000
+
+ADDRESS_FIELDS = ('street_address', 'city', 'postal_code', 'country')
+GENDERS = dict(GENDER_CHOICE)
+
+Reject = namedtuple('Reject', ['line', 'email', 'reason'])
+
+
+class OnboardingResult:
+
+    def __init__(self):
+        self.created = 0
+        self.skipped = 0
+        self.rejected = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        if not self.elapsed:
+            return 0.0
+        return (self.created + self.skipped + self.rejected) / self.elapsed
+
+
+def _field(record, name):
+    return record.get(name) if isinstance(record, dict) else None
+
+
+def _text(record, field):
+    return str(record.get(field) or '').strip()
+
+
+def _parse(record, account_types):
+    """
+    Return the cleaned record as a dict, or a reject reason.
+    """
+    if not isinstance(record, dict):
+        return 'Malformed record'
+
+    email = User.objects.normalize_email(_text(record, 'email'))
+    try:
+        validate_email(email)
+    except ValidationError:
+        return 'Invalid e-mail'
+
+    account_type = account_types.get(_text(record, 'account_type'))
+    if account_type is None:
+        return 'Unknown account type'
+
+    gender = _text(record, 'gender').upper()
+    if gender not in GENDERS:
+        return 'Invalid gender'
+
+    first_name = _text(record, 'first_name')
+    last_name = _text(record, 'last_name')
+    if len(first_name) > 150 or len(last_name) > 150:
+        return 'Name is too long'
+
+    phone = _text(record, 'phone')
+    if len(phone) > 15:
+        return 'Phone number is too long'
+
+    birth_date = _text(record, 'birth_date')
+    try:
+        birth_date = (
+            datetime.date.fromisoformat(birth_date) if birth_date else None
+        )
+    except ValueError:
+        return 'Invalid birth date'
+
+    password = _text(record, 'password')
+    if password:
+        try:
+            identify_hasher(password)
+        except ValueError:
+            return 'Password is not a supported hash'
+    else:
+        # What make_password(None) returns, without its slow random string.
+        password = UNUSABLE_PASSWORD_PREFIX + secrets.token_hex(20)
+
+    account_no = _text(record, 'account_no')
+    if account_no:
+        if (
+            not account_no.isdecimal()
+            or not 0 < int(account_no) <= MAX_ACCOUNT_NO
+        ):
+            return 'Invalid account number'
+        account_no = int(account_no)
+    else:
+        account_no = None
+
+    address = {field: _text(record, field) for field in ADDRESS_FIELDS}
+    if not any(address.values()):
+        address = None
+    elif not all(address.values()):
+        return 'Incomplete address'
+    elif not address['postal_code'].isdigit():
+        return 'Invalid postal code'
+
+    return {
+        'email': email,
+        'first_name': first_name,
+        'last_name': last_name,
+        'password': password,
+        'phone': phone,
+        'account_type_id': account_type,
+        'gender': gender,
+        'birth_date': birth_date,
+        'account_no': account_no,
+        'address': address,
+    }
+
+
+def _onboard_chunk(rows, result, on_reject, account_types, using):
+    parsed = []
+    emails = set()
+    account_nos = set()
+    for line, record in rows:
+        value = _parse(record, account_types)
+        if isinstance(value, dict):
+            if value['email'] in emails:
+                value = 'Duplicate e-mail'
+            elif value['account_no'] in account_nos:
+                value = 'Duplicate account number'
+        if isinstance(value, str):
+            result.rejected += 1
+            on_reject(Reject(line, _field(record, 'email'), value))
+            continue
+        emails.add(value['email'])
+        if value['account_no'] is not None:
+            account_nos.add(value['account_no'])
+        parsed.append((line, value))
+
+    if not parsed:
+        return
+
+    with transaction.atomic(using=using):
+        existing = set(
+            User.objects.using(using).filter(
+                email__in=emails
+            ).values_list('email', flat=True)
+        )
+        taken = set(
+            UserBankAccount.objects.using(using).filter(
+                account_no__in=account_nos
+            ).values_list('account_no', flat=True)
+        )
+
+        accepted = []
+        for line, value in parsed:
+            if value['email'] in existing:
+                result.skipped += 1
+            elif value['account_no'] in taken:
+                result.rejected += 1
+                on_reject(
+                    Reject(line, value['email'], 'Account number in use')
+                )
+            else:
+                accepted.append(value)
+        if not accepted:
+            return
+
+        numbers = iter(allocate(
+            sum(value['account_no'] is None for value in accepted), using
+        ))
+        for value in accepted:
+            if value['account_no'] is None:
+                value['account_no'] = next(numbers)
+
+        users = User.objects.using(using).bulk_create([
+            User(
+                email=value['email'],
+                first_name=value['first_name'],
+                last_name=value['last_name'],
+                password=value['password'],
+            )
+            for value in accepted
+        ])
+        customers = Customer.objects.using(using).bulk_create([
+            Customer(user_id=user.pk, phone=value['phone'])
+            for user, value in zip(users, accepted)
+        ])
+        UserBankAccount.objects.using(using).bulk_create([
+            UserBankAccount(
+                user_id=user.pk,
+                customer_id=customer.pk,
+                account_type_id=value['account_type_id'],
+                account_no=value['account_no'],
+                gender=value['gender'],
+                birth_date=value['birth_date'],
+            )
+            for user, customer, value in zip(users, customers, accepted)
+        ])
+        UserAddress.objects.using(using).bulk_create([
+            UserAddress(user_id=user.pk, **value['address'])
+            for user, value in zip(users, accepted)
+            if value['address']
+        ])
+
+    result.created += len(accepted)
+
+
+def onboard(rows, chunk_size=DEFAULT_CHUNK_SIZE, on_reject=None):
+    """
+    Onboard an iterable of ``(line, record)`` pairs, as produced by
+    ``transactions.batch.read_csv``/``read_jsonl``.
+
+    Rejected rows are passed to ``on_reject`` as they are found rather than
+    collected, so arbitrarily large files can be processed.
+    """
+    result = OnboardingResult()
+    on_reject = on_reject or (lambda reject: None)
+    using = router.db_for_write(User)
+    account_types = dict(
+        BankAccountType.objects.using(using).values_list('name', 'pk')
+    )
+    rows = iter(rows)
+    started = time.perf_counter()
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        _onboard_chunk(chunk, result, on_reject, account_types, using)
+
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,45 @@
+"""
+Index-friendly prefix search over bank accounts.
+
+Account numbers are integers, so "starts with 12" can not use the unique
+index directly. It is rewritten as one range per possible number length
+(``[12, 13)``, ``[120, 130)``, ``[1200, 1300)``, ...) up to the largest
+value the column holds, each of which is an index range scan. E-mail
+prefixes use a case-sensitive ``LIKE 'x%'``, which the
+``varchar_pattern_ops`` index on ``User.email`` serves on PostgreSQL.
+"""
+from django.db.models import Q
+
+# Largest value a PositiveBigIntegerField holds.
+MAX_ACCOUNT_NO = 2 ** 63 - 1
+
+
+def account_no_prefix_q(prefix, field='account_no'):
+    if not prefix.isdecimal() or prefix.startswith('0'):
+        return Q(pk__in=[])
+
+    start = int(prefix)
+    # Matches nothing on its own, and disappears when OR-ed with a range.
+    q = Q(pk__in=[])
+    scale = 1
+    while start * scale <= MAX_ACCOUNT_NO:
+        # Bounds beyond the column's range would not bind on SQLite, and
+        # become numeric on PostgreSQL, which the index can not serve.
+        q |= Q(**{
+            f'{field}__gte': start * scale,
+            f'{field}__lte': min((start + 1) * scale - 1, MAX_ACCOUNT_NO),
+        })
+        scale *= 10
+    return q
+
+
+def account_search_q(term, path=''):
+    """
+    Match accounts by account number prefix, or by owner e-mail prefix when
+    ``term`` is not numeric. ``path`` is the lookup path from the queried
+    model to ``UserBankAccount``, e.g. ``'account__'``.
+    """
+    term = term.strip()
+    if term.isdecimal():
+        return account_no_prefix_q(term, f'{path}account_no')
+    return Q(**{f'{path}user__email__startswith': term})
@@ -1,3 +1,266 @@
-from django.test import TestCase
+import io
+import tempfile
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth.hashers import PBKDF2SHA1PasswordHasher
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from transactions import ledger
+from transactions.batch import read_jsonl
+
+from .models import BankAccountType, User, UserBankAccount
+from .numbers import is_valid
+from .onboarding import onboard
+from .search import MAX_ACCOUNT_NO, account_no_prefix_q
+
+
+def create_account(email, account_no, **kwargs):
+    account_type, _ = BankAccountType.objects.get_or_create(
+        name='Savings', defaults={'maximum_withdrawal_amount': 1000}
+    )
+    user = User.objects.create_user(email=email, password='secret')
+    return UserBankAccount.objects.create(
+        user=user,
+        account_type=account_type,
+        account_no=account_no,
+        gender='M',
+        **kwargs,
+    )
+
+
+# -------------------------
+# SEARCH
+# -------------------------
+class AccountNoPrefixTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.accounts = [
+            create_account('a@x.com', 9000000001),
+            create_account('b@x.com', 9500000002),
+            create_account('c@x.com', 1000000003),
+            create_account('d@x.com', MAX_ACCOUNT_NO),
+        ]
+
+    def search(self, prefix):
+        return set(
+            UserBankAccount.objects.filter(
+                account_no_prefix_q(prefix)
+            ).values_list('account_no', flat=True)
+        )
+
+    def test_matches_every_length(self):
+        self.assertEqual(
+            self.search('9'), {9000000001, 9500000002, MAX_ACCOUNT_NO}
+        )
+        self.assertEqual(self.search('95'), {9500000002})
+        self.assertEqual(self.search('1000000003'), {1000000003})
+
+    def test_bounds_stay_within_bigint(self):
+        # Out of range bounds raise OverflowError on SQLite.
+        self.assertEqual(self.search(str(MAX_ACCOUNT_NO)), {MAX_ACCOUNT_NO})
+        self.assertEqual(self.search(str(MAX_ACCOUNT_NO + 1)), set())
+        self.assertEqual(self.search('9' * 25), set())
+
+    def test_rejects_non_numeric_prefixes(self):
+        self.assertEqual(self.search('012'), set())
+        self.assertEqual(self.search('12a'), set())
+        # A digit to str.isdigit(), but not to int().
+        self.assertEqual(self.search('\u00b2'), set())
+
+    def test_account_list_search_and_pages(self):
+        self.client.force_login(self.accounts[0].user)
+        url = reverse('accounts:account_list')
+        for query in [
+            {'q': '9'},
+            {'q': '\u00b2'},
+            {'after': '9' * 25},
+            {'after': '\u00b2'},
+        ]:
+            self.assertEqual(self.client.get(url, query).status_code, 200)
+
+
+# -------------------------
+# PASSWORD POLICY
+# -------------------------
+class PasswordPolicyTests(TestCase):
+
+    def test_login_upgrades_outdated_hashes(self):
+        account = create_account('legacy@x.com', 1000000001)
+        legacy = PBKDF2SHA1PasswordHasher().encode('secret', 'salt')
+        User.objects.filter(pk=account.user_id).update(password=legacy)
+
+        self.assertFalse(
+            self.client.login(email='legacy@x.com', password='wrong')
+        )
+        self.assertEqual(User.objects.get().password, legacy)
+
+        self.assertTrue(
+            self.client.login(email='legacy@x.com', password='secret')
+        )
+        upgraded = User.objects.get().password
+        self.assertTrue(upgraded.startswith('pbkdf2_sha256$'))
+        # The session was created with the upgraded hash.
+        response = self.client.get(reverse('accounts:dashboard'))
+        self.assertEqual(response.status_code, 200)
+
+
+# -------------------------
+# ONBOARDING
+# -------------------------
+class OnboardingTests(TestCase):
+
+    def test_rejects_malformed_lines_and_keeps_going(self):
+        create_account('existing@x.com', 1000000001)
+        rejects = []
+        result = onboard(read_jsonl(io.StringIO(
+            '{"email": "new@x.com", "account_type": "Savings", '
+            '"gender": "F"}\n'
+            '{"email": "broken@x.com",\n'
+            '["list@x.com", "Savings", "F"]\n'
+            '42\n'
+            '{"email": "big@x.com", "account_type": "Savings", '
+            '"gender": "F", "account_no": "99999999999999999999"}\n'
+            '{"email": "taken@x.com", "account_type": "Savings", '
+            '"gender": "M", "account_no": 1000000001}\n'
+            '{"email": "existing@x.com", "account_type": "Savings", '
+            '"gender": "M"}\n'
+        )), on_reject=rejects.append)
+
+        self.assertEqual(
+            (result.created, result.skipped, result.rejected), (1, 1, 5)
+        )
+        self.assertEqual(
+            [(reject.line, reject.reason) for reject in rejects],
+            [
+                (2, 'Malformed record'),
+                (3, 'Malformed record'),
+                (4, 'Malformed record'),
+                (5, 'Invalid account number'),
+                (6, 'Account number in use'),
+            ],
+        )
+        account = UserBankAccount.objects.get(user__email='new@x.com')
+        self.assertTrue(is_valid(account.account_no))
+        self.assertFalse(account.user.has_usable_password())
+
+    def test_command_writes_rejects_to_a_file(self):
+        BankAccountType.objects.create(
+            name='Savings', maximum_withdrawal_amount=1000
+        )
+        temporary = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary.cleanup)
+        directory = Path(temporary.name)
+        customers = directory / 'customers.jsonl'
+        customers.write_text(
+            '{"email": "new@x.com", "account_type": "Savings", '
+            '"gender": "F"}\n'
+            '{"email": "broken@x.com",\n'
+        )
+
+        with self.assertRaises(CommandError):
+            call_command(
+                'onboard_customers', str(customers),
+                '--rejects', str(directory / 'missing' / 'rejects.csv'),
+            )
+        self.assertFalse(User.objects.exists())
+
+        rejects = directory / 'rejects.csv'
+        call_command(
+            'onboard_customers', str(customers), '--rejects', str(rejects),
+            stdout=io.StringIO(),
+        )
+        self.assertEqual(rejects.read_text().splitlines(), [
+            'line,email,reason',
+            '2,,Malformed record',
+        ])
+
+
+# -------------------------
+# SESSION USER CACHE
+# -------------------------
+class SessionUserCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.account = create_account('cached@x.com', 1000000001)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.account.user)
+
+    def dashboard(self):
+        return self.client.get(reverse('accounts:dashboard')).status_code
+
+    @override_settings(CACHE_SESSION_USER=True, CACHE_DASHBOARD=True)
+    def test_deactivation_ends_cached_sessions(self):
+        self.assertEqual(self.dashboard(), 200)
+        with self.assertNumQueries(1):
+            # Only the session; the user and account come from the cache.
+            self.dashboard()
+
+        user = User.objects.get(pk=self.account.user_id)
+        user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertEqual(self.dashboard(), 302)
+
+    # Ending the session costs queries over the dashboard's budget.
+    @override_settings(CACHE_SESSION_USER=True, QUERY_BUDGET_ACTION='log')
+    def test_password_change_ends_cached_sessions(self):
+        self.assertEqual(self.dashboard(), 200)
+        user = User.objects.get(pk=self.account.user_id)
+        user.set_password('changed')
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertEqual(self.dashboard(), 302)
+
+    @override_settings(CACHE_SESSION_USER=False)
+    def test_uncached_user_sees_changes_made_elsewhere(self):
+        self.assertEqual(self.dashboard(), 200)
+        # No signal: as if another process, with its own cache, made it.
+        User.objects.filter(pk=self.account.user_id).update(is_active=False)
+        self.assertEqual(self.dashboard(), 302)
+
+
+# -------------------------
+# DASHBOARD CACHE
+# -------------------------
+@override_settings(CACHE_SESSION_USER=False, QUERY_BUDGET_ACTION='raise')
+class DashboardCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.account = create_account('dashboard@x.com', 1000000001)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.account.user)
+
+    def balance(self):
+        response = self.client.get(reverse('accounts:dashboard'))
+        return response.context['account'].balance
+
+    @override_settings(CACHE_DASHBOARD=True)
+    def test_warm_cache_reads_only_the_session_and_user(self):
+        with self.assertNumQueries(3):
+            self.balance()
+        with self.assertNumQueries(2):
+            self.balance()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ledger.deposit(self.account, Decimal('50.00'))
+        self.assertEqual(self.balance(), Decimal('50.00'))
+
+    @override_settings(CACHE_DASHBOARD=False)
+    def test_uncached_dashboard_sees_changes_made_elsewhere(self):
+        self.assertEqual(self.balance(), 0)
+        # No invalidation: as if another process, with its own cache, made
+        # it.
+        UserBankAccount.objects.update(balance=Decimal('20.00'))
+        with self.assertNumQueries(3):
+            self.assertEqual(self.balance(), Decimal('20.00'))
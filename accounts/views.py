@@ -1,13 +1,20 @@
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import get_user_model, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LoginView
+from django.db import transaction
 from django.shortcuts import render, redirect
 from django.urls import reverse_lazy
 from django.views.generic import TemplateView, RedirectView
 
+from core.db.routers import read_only
+from core.paginator import EstimatedCountPaginator
+
+from .cache import get_dashboard
 from .forms import UserRegistrationForm, UserAddressForm
 from .models import Customer, UserBankAccount
+from .search import MAX_ACCOUNT_NO, account_search_q
 
 User = get_user_model()
 
@@ -28,14 +35,13 @@ class UserRegistrationView(TemplateView):
         address_form = UserAddressForm(request.POST)
 
         if registration_form.is_valid() and address_form.is_valid():
-            user = registration_form.save()
-
-            address = address_form.save(commit=False)
-            address.user = user
-            address.save()
+            # The form creates the user, customer and bank account.
+            with transaction.atomic():
+                user = registration_form.save()
 
-            # create customer profile only (NO account auto creation)
-            Customer.objects.get_or_create(user=user)
+                address = address_form.save(commit=False)
+                address.user = user
+                address.save()
 
             messages.success(
                 request,
@@ -88,23 +94,21 @@ class LogoutView(RedirectView):
 # ----------------------------------
 @login_required
 def dashboard(request):
-    account = UserBankAccount.objects.filter(user=request.user).first()
+    summary = get_dashboard(request.user)
 
-    if not account:
+    if not summary:
         messages.info(
             request,
             "No bank account found for your profile."
         )
         return redirect('accounts:account_list')
 
-    recent_transactions = account.transactions.order_by('-timestamp')[:5]
-
     return render(
         request,
         'accounts/dashboard.html',
         {
-            'account': account,
-            'transactions': recent_transactions,
+            'account': summary['account'],
+            'transactions': summary['transactions'],
         }
     )
 
@@ -112,24 +116,50 @@ def dashboard(request):
 # ----------------------------------
 # VIEW ALL ACCOUNTS (CORE MODULE)
 # ----------------------------------
+@read_only
 @login_required
 def account_list(request):
     """
     CORE REQUIREMENT:
     View Accounts - List ALL accounts with balances
+
+    Keyset-paginated on ``account_no`` and searchable by account number or
+    e-mail prefix, so every page is a bounded index scan.
     """
+    page_size = settings.ACCOUNT_LIST_PAGE_SIZE
+    query = request.GET.get('q', '').strip()
 
     accounts = UserBankAccount.objects.select_related(
         'user',
         'account_type',
-        'user__customer'
-    ).all()
+    ).order_by('account_no')
+
+    if query:
+        accounts = accounts.filter(account_search_q(query))
+        total = None
+    else:
+        total = EstimatedCountPaginator(accounts, page_size).count
+
+    after = request.GET.get('after', '')
+    if after.isdecimal():
+        accounts = accounts.filter(
+            account_no__gt=min(int(after), MAX_ACCOUNT_NO)
+        )
+
+    accounts = list(accounts[:page_size + 1])
+    next_account_no = (
+        accounts[page_size - 1].account_no
+        if len(accounts) > page_size else None
+    )
 
     return render(
         request,
         'accounts/account_list.html',
         {
-            'accounts': accounts,
+            'accounts': accounts[:page_size],
+            'query': query,
+            'total': total,
+            'next_account_no': next_account_no,
         }
     )
 
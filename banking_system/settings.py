@@ -3,11 +3,15 @@ Django settings for banking_system project.
 
 Purpose:
 - Simple Banking Application
-- Django + PostgreSQL
-- No Celery / No background jobs
-- Focus on models, views, templates
+- Django + PostgreSQL (monthly ledger partitions, optional connection pool
+  and read replicas), or SQLite for laptops and benchmarks
+- No Celery: batch jobs (interest, end of day, reconciliation, partition
+  maintenance, onboarding) are management commands run by cron
+- Settings come from the environment; see the sections below
 """
 
+import copy
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryMetricsMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,7 +68,7 @@ ROOT_URLCONF = 'banking_system.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.templating.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -85,20 +91,176 @@ WSGI_APPLICATION = 'banking_system.wsgi.application'
 
 
 # ==============================
-# DATABASE – PostgreSQL
+# DATABASE – PostgreSQL / SQLite
 # ==============================
+# Connection settings come from the environment so each deployment can tune
+# them. DB_POOL=1 switches to a psycopg_pool-backed backend
+# (core.db.backends.postgresql_pool) that keeps DB_POOL_MIN_SIZE to
+# DB_POOL_MAX_SIZE connections open for the whole process; otherwise
+# DB_CONN_MAX_AGE keeps one persistent connection per thread.
+# DB_PREPARE_THRESHOLD lets psycopg prepare queries run that many times on a
+# connection (it needs server-side parameter binding).
+#
+# DB_BACKEND=sqlite runs everything on a single SQLite file (DB_NAME,
+# default db.sqlite3) for laptops, edge boxes and benchmarks, with the
+# SQLITE_PRAGMAS below applied to every connection.
+
+
+def env_flag(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'banking_db',
-        'USER': 'postgres',
-        'PASSWORD': 'postgres',
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'NAME': os.environ.get('DB_NAME', 'banking_db'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'postgres'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '0')),
+        'CONN_HEALTH_CHECKS': env_flag('DB_CONN_HEALTH_CHECKS', True),
+        'OPTIONS': {},
     }
 }
 
+if env_flag('DB_POOL'):
+    DATABASES['default'].update({
+        'ENGINE': 'core.db.backends.postgresql_pool',
+        'CONN_MAX_AGE': 0,
+    })
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', '600')),
+    }
+
+if os.environ.get('DB_PREPARE_THRESHOLD'):
+    DATABASES['default']['OPTIONS'].update({
+        'server_side_binding': True,
+        'prepare_threshold': int(os.environ['DB_PREPARE_THRESHOLD']),
+    })
+
+if os.environ.get('DB_BACKEND') == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'core.db.backends.sqlite3',
+        'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '0')),
+        'OPTIONS': {
+            # Seconds the sqlite3 module itself waits for a lock.
+            'timeout': 10,
+        },
+    }
+
+SQLITE_PRAGMAS = {
+    # Readers never block the writer and vice versa.
+    'journal_mode': 'wal',
+    # With WAL, a power failure can lose the latest commits but never
+    # corrupts the database.
+    'synchronous': 'normal',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', '10000')),
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+
+
+# ==============================
+# READ REPLICAS
+# ==============================
+# DB_REPLICAS lists read replicas of the default database, comma separated:
+# host[:port][/name] for PostgreSQL, database files for SQLite. They become
+# the aliases replica_1, replica_2, ... with the default's other settings.
+# core.db.routers sends the reads of views marked read-only to a replica,
+# except for REPLICA_STICKY_SECONDS after the user's own write, and skips
+# replicas more than REPLICA_MAX_LAG seconds behind (checked at most every
+# REPLICA_LAG_CHECK_INTERVAL seconds per process).
+
+DATABASE_REPLICAS = []
+
+for index, replica in enumerate(
+    filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1
+):
+    alias = f'replica_{index}'
+    DATABASES[alias] = copy.deepcopy(DATABASES['default'])
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    if DATABASES['default']['ENGINE'] == 'core.db.backends.sqlite3':
+        DATABASES[alias]['NAME'] = replica.strip()
+    else:
+        address, _, name = replica.strip().partition('/')
+        host, _, port = address.partition(':')
+        DATABASES[alias]['HOST'] = host
+        DATABASES[alias]['PORT'] = port or DATABASES['default']['PORT']
+        DATABASES[alias]['NAME'] = name or DATABASES['default']['NAME']
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+
+REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', '10'))
+REPLICA_STICKY_COOKIE = 'primary_until'
+REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', '5'))
+REPLICA_LAG_CHECK_INTERVAL = 2
+
+
+# ==============================
+# CACHE
+# ==============================
+# CACHE_URL selects the backend: redis://host:port/db for production,
+# file:///path/to/dir for a shared local cache, unset for in-process memory.
+
+CACHE_URL = os.environ.get('CACHE_URL', '')
+
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+elif CACHE_URL.startswith('file://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_URL[len('file://'):],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# The dashboard (account and latest transactions) is cached per account and
+# invalidated by the posting path. An in-process cache would only hear of
+# the postings its own process made, and serve other processes' users stale
+# balances for up to ACCOUNT_CACHE_TIMEOUT, so it needs CACHE_URL.
+
+ACCOUNT_CACHE_TIMEOUT = 300
+CACHE_DASHBOARD = bool(CACHE_URL)
+
+
+# ==============================
+# SESSIONS
+# ==============================
+# With a shared cache, sessions are read from it and written through to the
+# database, so a signed-in request needs no session query, and
+# CACHE_SESSION_USER caches the session's user with their bank account (see
+# accounts.cache). In-process caches are used for neither: other processes
+# would keep serving a session after its logout, and a user after their
+# deactivation or password change.
+
+if CACHE_URL:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+
+CACHE_SESSION_USER = bool(CACHE_URL)
+
 
 # ==============================
 # AUTHENTICATION
@@ -121,6 +283,64 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+AUTHENTICATION_BACKENDS = ['accounts.backends.PasswordPolicyBackend']
+
+
+# ==============================
+# PASSWORD HASHING
+# ==============================
+# PASSWORD_HASHER picks the hasher for new passwords: pbkdf2 (default),
+# scrypt, or argon2 (needs argon2-cffi), with the costs below. Hashes of the
+# other hashers, or with other costs, still verify and are replaced on the
+# next login. Compare the policies with `python -m benchmarks logins`.
+
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+
+PASSWORD_HASHING = {
+    'pbkdf2': {
+        'iterations': int(
+            os.environ.get('PASSWORD_PBKDF2_ITERATIONS', '600000')
+        ),
+    },
+    'scrypt': {
+        # N, a power of two.
+        'work_factor': int(
+            os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR', str(2 ** 14))
+        ),
+        'block_size': int(os.environ.get('PASSWORD_SCRYPT_BLOCK_SIZE', '8')),
+        'parallelism': int(
+            os.environ.get('PASSWORD_SCRYPT_PARALLELISM', '1')
+        ),
+    },
+    'argon2': {
+        'time_cost': int(os.environ.get('PASSWORD_ARGON2_TIME_COST', '2')),
+        # KiB
+        'memory_cost': int(
+            os.environ.get('PASSWORD_ARGON2_MEMORY_COST', '102400')
+        ),
+        'parallelism': int(
+            os.environ.get('PASSWORD_ARGON2_PARALLELISM', '8')
+        ),
+    },
+}
+
+PASSWORD_HASHER_CLASSES = {
+    'pbkdf2': 'accounts.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'accounts.hashers.ScryptPasswordHasher',
+    'argon2': 'accounts.hashers.Argon2PasswordHasher',
+}
+
+# The first one makes new hashes; the others only verify.
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_CLASSES[PASSWORD_HASHER],
+    *(
+        path for name, path in PASSWORD_HASHER_CLASSES.items()
+        if name != PASSWORD_HASHER
+    ),
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
 
 # ==============================
 # INTERNATIONALIZATION
@@ -147,8 +367,113 @@ STATIC_URL = '/static/'
 # ==============================
 
 ACCOUNT_NUMBER_START_FROM = 1000000000
+# Account numbers each process reserves at a time on PostgreSQL; see
+# accounts.numbers.
+ACCOUNT_NUMBER_BLOCK_SIZE = 100
 MINIMUM_DEPOSIT_AMOUNT = 10
 MINIMUM_WITHDRAWAL_AMOUNT = 10
+TRANSACTION_REPORT_PAGE_SIZE = 50
+TRANSACTION_EXPORT_CHUNK_SIZE = 2000
+ACCOUNT_LIST_PAGE_SIZE = 50
+# Above this many rows, unfiltered listings show PostgreSQL's row estimate
+# instead of running COUNT(*).
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+
+# ==============================
+# BATCH JOBS
+# ==============================
+# Checkpoints of runs that finished more than BATCH_CHECKPOINT_RETENTION_DAYS
+# ago are deleted when the next run starts; rerunning one of those run keys
+# starts it over.
+
+BATCH_JOBS = {
+    'accrue_interest': 'transactions.jobs.accrue_interest',
+    'rollup_snapshots': 'transactions.jobs.rollup_snapshots',
+    'generate_statements': 'transactions.jobs.generate_statements',
+    'verify_ledger': 'transactions.jobs.verify_ledger',
+    'reconcile_ledger': 'transactions.jobs.reconcile_ledger',
+}
+STATEMENTS_DIR = BASE_DIR / 'statements'
+RECONCILIATION_DIR = BASE_DIR / 'reconciliation'
+BATCH_CHECKPOINT_RETENTION_DAYS = 30
+
+
+# ==============================
+# LEDGER PARTITIONS
+# ==============================
+# PostgreSQL only. maintain_partitions keeps this many monthly partitions
+# of the ledger created ahead of the current month, and with --archive moves
+# months older than TRANSACTION_ARCHIVE_AFTER_MONTHS into compressed files
+# in TRANSACTION_ARCHIVE_DIR.
+
+TRANSACTION_PARTITION_MONTHS_AHEAD = 3
+TRANSACTION_ARCHIVE_AFTER_MONTHS = 24
+TRANSACTION_ARCHIVE_DIR = BASE_DIR / 'archive'
+
+
+# ==============================
+# WITHDRAWAL LIMITS
+# ==============================
+# Where the hourly withdrawal windows live. CacheStore shares them through
+# the cache, and is the default with a Redis CACHE_URL. LocalStore keeps
+# them in process memory: with several server processes each one would
+# allow the full hourly limit, so a user could withdraw it once per process.
+# SERVER_PROCESSES (WEB_CONCURRENCY, which gunicorn and uvicorn read as
+# their worker count) above 1 therefore refuses LocalStore, and CacheStore
+# on an in-process or file cache. Windows are reloaded from the ledger
+# every LIMITS_RECONCILE_INTERVAL seconds.
+
+SERVER_PROCESSES = int(os.environ.get('WEB_CONCURRENCY', '1'))
+
+LIMITS_STORE = os.environ.get(
+    'LIMITS_STORE',
+    'transactions.limits.CacheStore'
+    if CACHE_URL.startswith(('redis://', 'rediss://'))
+    else 'transactions.limits.LocalStore',
+)
+LIMITS_RECONCILE_INTERVAL = 300
+
+
+# ==============================
+# IDEMPOTENCY KEYS
+# ==============================
+# Retries of a posting request with the same Idempotency-Key replay the
+# stored result for this many seconds. Finished results are also kept, for
+# no longer, in a per-process LRU of IDEMPOTENCY_LRU_SIZE entries.
+
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+IDEMPOTENCY_LRU_SIZE = 10000
+
+
+# ==============================
+# REQUEST METRICS
+# ==============================
+# Maximum SQL queries per request, by URL name. Overruns are logged, or
+# raised when QUERY_BUDGET_ACTION is 'raise' (use that in test settings).
+# The dashboard takes 3 queries cold and 2 with the cache warm; the request
+# that ends a session after a password change deletes it with 2 more.
+# /metrics answers logged-in staff and the addresses in METRICS_ALLOWED_IPS
+# (comma separated, none by default). Behind a reverse proxy every request
+# comes from the proxy, so only list scrapers that connect directly.
+
+QUERY_BUDGETS = {
+    'accounts:dashboard': 3,
+    'accounts:account_list': 5,
+    'transactions:transaction_report': 4,
+    'transactions:deposit_money': 14,
+    'transactions:withdraw_money': 14,
+    'transactions:fund_transfer': 17,
+    'api:account_balance': 2,
+    'api:account_transactions': 3,
+    'api:account_transfers': 17,
+}
+QUERY_BUDGET_ACTION = os.environ.get('QUERY_BUDGET_ACTION', 'log')
+METRICS_ALLOWED_IPS = [
+    address.strip()
+    for address in os.environ.get('METRICS_ALLOWED_IPS', '').split(',')
+    if address.strip()
+]
 
 
 # ==============================
@@ -16,13 +16,15 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
-from core.views import HomeView
+from core.views import HomeView, metrics
 
 
 urlpatterns = [
     path('', HomeView.as_view(), name='home'),
     path('accounts/', include('accounts.urls', namespace='accounts')),
     path('admin/', admin.site.urls),
+    path('api/v1/', include('transactions.api_urls', namespace='api')),
+    path('metrics', metrics, name='metrics'),
     path(
         'transactions/',
         include('transactions.urls', namespace='transactions')
@@ -0,0 +1,10 @@
+"""
+Load tests and benchmarks for the banking hot paths.
+
+    python -m benchmarks seed --users 1000 --transactions 50
+    python -m benchmarks run --driver client --concurrency 8 -o before.json
+    python -m benchmarks compare before.json after.json
+
+Point ``DJANGO_SETTINGS_MODULE`` at a throwaway database: seeding writes
+users, accounts and transactions, and the scenarios post real money moves.
+"""
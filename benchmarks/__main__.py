@@ -0,0 +1,258 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def command_seed(args):
+    from .seed import seed
+
+    result = seed(args.users, args.transactions)
+    print(
+        f'Seeded {args.users} users; posted {result.posted} transactions '
+        f'({result.rows_per_second:.0f} rows/s)'
+    )
+
+
+def load_context(users):
+    from .seed import bench_accounts
+
+    accounts = list(bench_accounts().select_related('user')[:users])
+    if not accounts:
+        sys.exit('No benchmark accounts found, run "seed" first.')
+
+    return {
+        'users': [account.user for account in accounts],
+        'account_nos': [account.account_no for account in accounts],
+    }
+
+
+def new_report(driver, concurrency):
+    from django.conf import settings
+
+    return {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'driver': driver,
+        'concurrency': concurrency,
+        'database': settings.DATABASES['default']['ENGINE'],
+        'scenarios': {},
+    }
+
+
+def print_summary(name, summary):
+    print(
+        f'{name:<10} {summary["throughput"]:8.1f} req/s  '
+        f'p50 {summary["latency_ms"]["p50"]:7.1f} ms  '
+        f'p99 {summary["latency_ms"]["p99"]:7.1f} ms  '
+        f'queries {summary["queries"]["p50"]}  '
+        f'errors {summary["errors"]}',
+        file=sys.stderr,
+    )
+
+
+def write_report(report, output):
+    text = json.dumps(report, indent=2)
+    if output:
+        Path(output).write_text(text)
+    else:
+        print(text)
+
+
+def command_run(args):
+    from .drivers import DRIVERS
+    from .scenarios import SCENARIOS
+    from .stats import summarize
+
+    context = load_context(args.users)
+    report = new_report(args.driver, args.concurrency)
+
+    for name in args.scenario or list(SCENARIOS):
+        started = time.perf_counter()
+        samples = DRIVERS[args.driver](
+            SCENARIOS[name],
+            context,
+            requests=args.requests,
+            concurrency=args.concurrency,
+            base_url=args.base_url,
+        )
+        summary = summarize(samples, time.perf_counter() - started)
+        report['scenarios'][name] = summary
+        print_summary(name, summary)
+
+    write_report(report, args.output)
+
+
+def command_connections(args):
+    from .connections import run_connections
+    from .stats import summarize
+
+    context = load_context(args.users)
+    report = new_report('connections', args.concurrency)
+
+    started = time.perf_counter()
+    samples = run_connections(
+        context, requests=args.requests, concurrency=args.concurrency
+    )
+    summary = summarize(samples, time.perf_counter() - started)
+    report['scenarios']['connections'] = summary
+    print_summary('connections', summary)
+
+    write_report(report, args.output)
+
+
+def command_logins(args):
+    from django.conf import settings
+
+    from .logins import run_logins
+    from .stats import summarize
+
+    context = load_context(1)
+    report = new_report('logins', 1)
+
+    for policy in args.policy or list(settings.PASSWORD_HASHER_CLASSES):
+        started = time.perf_counter()
+        result = run_logins(context, policy, args.requests)
+        if result is None:
+            print(
+                f'{policy:<10} hashing library not installed',
+                file=sys.stderr,
+            )
+            continue
+        samples, cpu = result
+        summary = summarize(samples, time.perf_counter() - started)
+        summary['logins_per_core_second'] = len(samples) / cpu if cpu else None
+        summary['params'] = settings.PASSWORD_HASHING[policy]
+        report['scenarios'][f'login_{policy}'] = summary
+        print_summary(policy, summary)
+        print(
+            f'{policy:<10} {summary["logins_per_core_second"]:8.1f} '
+            f'logins/s per core',
+            file=sys.stderr,
+        )
+
+    write_report(report, args.output)
+
+
+def command_compare(args):
+    before = json.loads(Path(args.before).read_text())
+    after = json.loads(Path(args.after).read_text())
+    print(f'{before["commit"]} -> {after["commit"]}')
+    for name, new in after['scenarios'].items():
+        old = before['scenarios'].get(name)
+        if not old:
+            continue
+        for metric in ('p50', 'p95', 'p99'):
+            a, b = old['latency_ms'][metric], new['latency_ms'][metric]
+            change = (b - a) / a * 100 if a else 0
+            print(f'{name:<10} {metric}  {a:8.1f} -> {b:8.1f} ms ({change:+.1f}%)')
+        a, b = old['throughput'], new['throughput']
+        print(f'{name:<10} req/s {a:8.1f} -> {b:8.1f}')
+        print(
+            f'{name:<10} queries {old["queries"]["p50"]} -> '
+            f'{new["queries"]["p50"]}'
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed = commands.add_parser('seed', help='Generate benchmark data.')
+    seed.add_argument('--users', type=int, default=100)
+    seed.add_argument(
+        '--transactions',
+        type=int,
+        default=20,
+        help='Historical transactions per account.',
+    )
+    seed.set_defaults(handler=command_seed)
+
+    run = commands.add_parser('run', help='Run scenarios.')
+    run.add_argument(
+        '--driver',
+        choices=['client', 'async_client', 'threads', 'asyncio'],
+        default='client',
+    )
+    run.add_argument(
+        '--scenario',
+        action='append',
+        choices=[
+            'deposit', 'withdraw', 'transfer', 'dashboard', 'report',
+            'api_balance', 'api_transactions',
+        ],
+        help='Scenario to run. May be repeated; defaults to all.',
+    )
+    run.add_argument('--concurrency', type=int, default=8)
+    run.add_argument('--requests', type=int, default=200)
+    run.add_argument(
+        '--users', type=int, default=100, help='Benchmark users to log in.'
+    )
+    run.add_argument(
+        '--base-url',
+        default='http://127.0.0.1:8000',
+        help='Server for the HTTP drivers.',
+    )
+    run.add_argument('-o', '--output', help='Write the JSON report here.')
+    run.set_defaults(handler=command_run)
+
+    connections = commands.add_parser(
+        'connections',
+        help=(
+            'Time connection setup plus the hot reads per request. Run '
+            'with and without DB_POOL=1 and compare the reports.'
+        ),
+    )
+    connections.add_argument('--concurrency', type=int, default=8)
+    connections.add_argument('--requests', type=int, default=1000)
+    connections.add_argument('--users', type=int, default=100)
+    connections.add_argument('-o', '--output')
+    connections.set_defaults(handler=command_connections)
+
+    logins = commands.add_parser(
+        'logins',
+        help='Measure logins per second per core for each hashing policy.',
+    )
+    logins.add_argument(
+        '--policy',
+        action='append',
+        choices=['pbkdf2', 'scrypt', 'argon2'],
+        help='Hashing policy to run. May be repeated; defaults to all.',
+    )
+    logins.add_argument('--requests', type=int, default=50)
+    logins.add_argument('-o', '--output')
+    logins.set_defaults(handler=command_logins)
+
+    compare = commands.add_parser('compare', help='Compare two reports.')
+    compare.add_argument('before')
+    compare.add_argument('after')
+    compare.set_defaults(handler=command_compare)
+
+    args = parser.parse_args()
+    if args.command != 'compare':
+        import django
+
+        os.environ.setdefault(
+            'DJANGO_SETTINGS_MODULE', 'banking_system.settings'
+        )
+        django.setup()
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Connection overhead benchmark.
+
+Each sample is one request's worth of database work, the balance lookup by
+``account_no`` and the first page of recent transactions, run between
+Django's ``request_started`` and ``request_finished`` signals. Connections
+are therefore opened and released exactly as they are for a real request:
+reconnecting every time by default, checked out of the pool with
+``DB_POOL=1``, or kept open with ``DB_CONN_MAX_AGE``.
+"""
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import DatabaseError, connections
+
+from accounts.models import UserBankAccount
+from transactions.models import Transaction
+
+from .drivers import _run_threads
+from .scenarios import Sample
+
+
+def run_connections(context, requests, concurrency):
+
+    def worker(count, user):
+        account_no = user.account.account_no
+        samples = []
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                request_started.send(sender=None)
+                try:
+                    account = UserBankAccount.objects.only(
+                        'pk', 'balance'
+                    ).get(account_no=account_no)
+                    list(
+                        Transaction.objects.filter(account=account)
+                        .order_by('-timestamp', '-pk')
+                        [:settings.TRANSACTION_REPORT_PAGE_SIZE]
+                    )
+                    ok = True
+                except DatabaseError:
+                    ok = False
+                finally:
+                    request_finished.send(sender=None)
+                samples.append(Sample(time.perf_counter() - started, ok, 2))
+        finally:
+            connections.close_all()
+        return samples
+
+    return _run_threads(worker, context['users'], requests, concurrency)
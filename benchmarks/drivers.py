@@ -0,0 +1,309 @@
+"""
+Load drivers. Each one runs ``requests`` requests of a scenario spread over
+``concurrency`` workers, every worker logged in as a different user, and
+returns the list of ``Sample`` measurements.
+
+``client`` drives the application in-process through Django's test client,
+i.e. the WSGI handler with one thread per worker. ``async_client`` drives
+the ASGI handler in-process with every worker on one event loop, so the two
+compare WSGI and ASGI on the same database. ``threads`` and ``asyncio``
+drive a running server over HTTP, e.g. ``manage.py runserver`` or a
+production WSGI/ASGI server.
+"""
+import asyncio
+import http.cookiejar
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from .scenarios import Sample, query_count
+from .seed import PASSWORD
+
+
+def _split(requests, concurrency):
+    return [
+        requests // concurrency + (1 if i < requests % concurrency else 0)
+        for i in range(concurrency)
+    ]
+
+
+def _run_threads(worker, users, requests, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(worker, count, users[i % len(users)])
+            for i, count in enumerate(_split(requests, concurrency))
+        ]
+        return [sample for future in futures for sample in future.result()]
+
+
+def _allow_test_host():
+    # The test clients send Host: testserver, which only the test runner
+    # allows by default.
+    if 'testserver' not in settings.ALLOWED_HOSTS:
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+
+
+# -------------------------
+# IN-PROCESS TEST CLIENT
+# -------------------------
+def run_client(scenario, context, requests, concurrency, **kwargs):
+    _allow_test_host()
+
+    def worker(count, user):
+        client = Client()
+        client.force_login(user)
+        samples = []
+        try:
+            for _ in range(count):
+                method, path, data = scenario(context, user)
+                started = time.perf_counter()
+                if method == 'GET':
+                    response = client.get(path)
+                else:
+                    response = client.post(path, data)
+                samples.append(Sample(
+                    time.perf_counter() - started,
+                    response.status_code < 400,
+                    query_count(response.get('Server-Timing')),
+                ))
+        finally:
+            connections.close_all()
+        return samples
+
+    return _run_threads(worker, context['users'], requests, concurrency)
+
+
+# -------------------------
+# IN-PROCESS ASGI CLIENT
+# -------------------------
+def run_async_client(scenario, context, requests, concurrency, **kwargs):
+    _allow_test_host()
+    users = context['users']
+    clients = []
+    for i in range(concurrency):
+        # force_login is sync-only, so log in before the loop starts.
+        client = AsyncClient()
+        client.force_login(users[i % len(users)])
+        clients.append((client, users[i % len(users)]))
+
+    async def worker(count, client, user):
+        samples = []
+        for _ in range(count):
+            method, path, data = scenario(context, user)
+            started = time.perf_counter()
+            if method == 'GET':
+                response = await client.get(path)
+            else:
+                response = await client.post(path, data)
+            samples.append(Sample(
+                time.perf_counter() - started,
+                response.status_code < 400,
+                query_count(response.get('Server-Timing')),
+            ))
+        return samples
+
+    async def main():
+        results = await asyncio.gather(*[
+            worker(count, *clients[i])
+            for i, count in enumerate(_split(requests, concurrency))
+        ])
+        return [sample for samples in results for sample in samples]
+
+    try:
+        return asyncio.run(main())
+    finally:
+        connections.close_all()
+
+
+# -------------------------
+# THREADED HTTP
+# -------------------------
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """
+    Report redirects as responses, so each sample is a single request like
+    in the other drivers.
+    """
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def run_threads(scenario, context, requests, concurrency, base_url, **kwargs):
+
+    def worker(count, user):
+        cookies = http.cookiejar.CookieJar()
+        opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(cookies), NoRedirect
+        )
+
+        def send(method, path, data=None):
+            csrf_token = next(
+                (c.value for c in cookies if c.name == 'csrftoken'), ''
+            )
+            request = urllib.request.Request(
+                base_url + path,
+                data=urllib.parse.urlencode(data).encode() if data else None,
+                method=method,
+                headers={'X-CSRFToken': csrf_token},
+            )
+            try:
+                with opener.open(request) as response:
+                    response.read()
+                    return response.status, response.headers
+            except urllib.error.HTTPError as e:
+                return e.code, e.headers
+
+        login = reverse('accounts:user_login')
+        send('GET', login)
+        send('POST', login, {'username': user.email, 'password': PASSWORD})
+
+        samples = []
+        for _ in range(count):
+            method, path, data = scenario(context, user)
+            started = time.perf_counter()
+            status, headers = send(method, path, data)
+            samples.append(Sample(
+                time.perf_counter() - started,
+                status < 400,
+                query_count(headers.get('Server-Timing')),
+            ))
+        return samples
+
+    return _run_threads(worker, context['users'], requests, concurrency)
+
+
+# -------------------------
+# ASYNCIO HTTP
+# -------------------------
+class AsyncSession:
+    """
+    Minimal keep-alive HTTP/1.1 client on asyncio streams with a cookie
+    jar, enough to log in and drive form posts without extra dependencies.
+    Redirects are not followed, so each sample is a single request.
+    """
+
+    def __init__(self, base_url):
+        url = urllib.parse.urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.cookies = {}
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data else b''
+        headers = {
+            'Host': f'{self.host}:{self.port}',
+            'Content-Length': str(len(body)),
+            'X-CSRFToken': self.cookies.get('csrftoken', ''),
+            'Cookie': '; '.join(f'{k}={v}' for k, v in self.cookies.items()),
+        }
+        if data:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        head = f'{method} {path} HTTP/1.1\r\n' + ''.join(
+            f'{name}: {value}\r\n' for name, value in headers.items()
+        ) + '\r\n'
+
+        for attempt in range(2):
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(
+                    self.host, self.port
+                )
+            try:
+                self.writer.write(head.encode() + body)
+                await self.writer.drain()
+                return await self._read_response()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # The server closed an idle keep-alive connection.
+                await self.close()
+                if attempt:
+                    raise
+
+    async def _read_response(self):
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = (await self.reader.readline()).decode().strip()
+            if not line:
+                break
+            name, value = line.split(':', 1)
+            name, value = name.lower(), value.strip()
+            if name == 'set-cookie':
+                cookie = value.split(';', 1)[0]
+                key, _, cookie_value = cookie.partition('=')
+                self.cookies[key] = cookie_value
+            headers[name] = value
+
+        if headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int(await self.reader.readline(), 16)
+                await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+        elif 'content-length' in headers:
+            await self.reader.readexactly(int(headers['content-length']))
+        else:
+            await self.reader.read()
+
+        if headers.get('connection', '').lower() == 'close' or (
+            'content-length' not in headers
+            and headers.get('transfer-encoding') != 'chunked'
+        ):
+            await self.close()
+        return status, headers
+
+
+def run_asyncio(scenario, context, requests, concurrency, base_url,
+                **kwargs):
+
+    async def worker(count, user):
+        session = AsyncSession(base_url)
+        login = reverse('accounts:user_login')
+        await session.request('GET', login)
+        await session.request(
+            'POST', login, {'username': user.email, 'password': PASSWORD}
+        )
+
+        samples = []
+        try:
+            for _ in range(count):
+                method, path, data = scenario(context, user)
+                started = time.perf_counter()
+                status, headers = await session.request(method, path, data)
+                samples.append(Sample(
+                    time.perf_counter() - started,
+                    status < 400,
+                    query_count(headers.get('server-timing')),
+                ))
+        finally:
+            await session.close()
+        return samples
+
+    async def main():
+        users = context['users']
+        results = await asyncio.gather(*[
+            worker(count, users[i % len(users)])
+            for i, count in enumerate(_split(requests, concurrency))
+        ])
+        return [sample for samples in results for sample in samples]
+
+    return asyncio.run(main())
+
+
+DRIVERS = {
+    'client': run_client,
+    'async_client': run_async_client,
+    'threads': run_threads,
+    'asyncio': run_asyncio,
+}
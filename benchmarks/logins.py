@@ -0,0 +1,58 @@
+"""
+Login throughput per password hashing policy.
+
+For each policy the first benchmark user's password is hashed with it, and
+logins are then run one after another through ``authenticate()``, which
+looks the user up and checks the password, so logins per CPU second is
+what one core sustains with that policy.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.test import override_settings
+
+from accounts.models import User
+
+from .scenarios import Sample
+from .seed import PASSWORD
+
+
+def policy_settings(policy):
+    classes = settings.PASSWORD_HASHER_CLASSES
+    return override_settings(
+        PASSWORD_HASHERS=[
+            classes[policy],
+            *(path for name, path in classes.items() if name != policy),
+        ],
+    )
+
+
+def run_logins(context, policy, requests):
+    """
+    Return the samples and the CPU time of ``requests`` logins, or ``None``
+    when the policy's hashing library is not installed.
+    """
+    user = context['users'][0]
+    original = user.password
+    with policy_settings(policy):
+        try:
+            encoded = make_password(PASSWORD)
+        except ValueError:
+            return None
+        User.objects.filter(pk=user.pk).update(password=encoded)
+
+        samples = []
+        try:
+            cpu_started = time.process_time()
+            for _ in range(requests):
+                started = time.perf_counter()
+                ok = authenticate(
+                    None, username=user.email, password=PASSWORD
+                ) is not None
+                samples.append(Sample(time.perf_counter() - started, ok, None))
+            cpu = time.process_time() - cpu_started
+        finally:
+            User.objects.filter(pk=user.pk).update(password=original)
+    return samples, cpu
@@ -0,0 +1,77 @@
+"""
+Request mixes for the hot paths, shared by every driver.
+
+A scenario takes the benchmark context and the worker's user and returns
+``(method, path, data)`` for one request.
+"""
+import random
+import re
+from collections import namedtuple
+
+from django.urls import reverse
+
+from transactions.constants import DEPOSIT, WITHDRAWAL
+
+Sample = namedtuple('Sample', ['latency', 'ok', 'queries'])
+
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def query_count(server_timing):
+    """
+    Read the query count the metrics middleware put in ``Server-Timing``.
+    """
+    match = QUERIES_RE.search(server_timing or '')
+    return int(match.group(1)) if match else None
+
+
+def deposit(context, user):
+    return 'POST', reverse('transactions:deposit_money'), {
+        'amount': '25',
+        'transaction_type': DEPOSIT,
+    }
+
+
+def withdraw(context, user):
+    return 'POST', reverse('transactions:withdraw_money'), {
+        'amount': '10',
+        'transaction_type': WITHDRAWAL,
+    }
+
+
+def transfer(context, user):
+    return 'POST', reverse('transactions:fund_transfer'), {
+        'to_account': random.choice(context['account_nos']),
+        'amount': '10',
+    }
+
+
+def dashboard(context, user):
+    return 'GET', reverse('accounts:dashboard'), None
+
+
+def report(context, user):
+    return 'GET', reverse('transactions:transaction_report'), None
+
+
+def api_balance(context, user):
+    return 'GET', reverse(
+        'api:account_balance', args=[user.account.account_no]
+    ), None
+
+
+def api_transactions(context, user):
+    return 'GET', reverse(
+        'api:account_transactions', args=[user.account.account_no]
+    ), None
+
+
+SCENARIOS = {
+    'deposit': deposit,
+    'withdraw': withdraw,
+    'transfer': transfer,
+    'dashboard': dashboard,
+    'report': report,
+    'api_balance': api_balance,
+    'api_transactions': api_transactions,
+}
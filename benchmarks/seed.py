@@ -0,0 +1,100 @@
+"""
+Data generator for benchmark runs.
+
+Users are built by ``UserManager`` conventions (normalized e-mail, one
+password hash shared by all of them) and written with ``bulk_create``;
+opening balances and history go through the batch posting path.
+"""
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from accounts.models import BankAccountType, Customer, User, UserBankAccount
+from transactions.batch import post_batch
+
+EMAIL_DOMAIN = 'bench.example'
+PASSWORD = 'bench-password-1'
+ACCOUNT_NO_START = 9000000000
+
+
+def _index(user):
+    return int(user.email.split('@')[0][len('user'):])
+
+
+def bench_accounts():
+    return UserBankAccount.objects.filter(
+        user__email__endswith=f'@{EMAIL_DOMAIN}'
+    )
+
+
+def seed(users, transactions_per_account, batch_size=1000):
+    account_type, _ = BankAccountType.objects.get_or_create(
+        name='Benchmark',
+        defaults={
+            'maximum_withdrawal_amount': Decimal('100000'),
+            'annual_interest_rate': Decimal('3.5'),
+        },
+    )
+    password = make_password(PASSWORD)
+    offset = User.objects.filter(
+        email__endswith=f'@{EMAIL_DOMAIN}'
+    ).count()
+
+    for start in range(offset, offset + users, batch_size):
+        stop = min(start + batch_size, offset + users)
+        with transaction.atomic():
+            created = User.objects.bulk_create([
+                User(
+                    email=User.objects.normalize_email(
+                        f'user{i}@{EMAIL_DOMAIN}'
+                    ),
+                    password=password,
+                    first_name='Bench',
+                    last_name='User',
+                )
+                for i in range(start, stop)
+            ])
+            created = list(User.objects.filter(
+                email__in=[user.email for user in created]
+            ))
+            customers = Customer.objects.bulk_create([
+                Customer(user=user) for user in created
+            ])
+            UserBankAccount.objects.bulk_create([
+                UserBankAccount(
+                    user=user,
+                    customer=customer,
+                    account_type=account_type,
+                    account_no=ACCOUNT_NO_START + _index(user),
+                    gender='M',
+                )
+                for user, customer in zip(created, customers)
+            ])
+
+    account_nos = list(
+        bench_accounts().values_list('account_no', flat=True)
+    )
+
+    def rows():
+        line = 0
+        for account_no in account_nos:
+            line += 1
+            yield line, {
+                'account_no': account_no,
+                'amount': '100000',
+                'transaction_type': 'deposit',
+            }
+        for _ in range(transactions_per_account):
+            for account_no in account_nos:
+                line += 1
+                yield line, {
+                    'account_no': account_no,
+                    'amount': str(random.randint(10, 500)),
+                    'transaction_type': random.choice(
+                        ['deposit', 'withdrawal']
+                    ),
+                }
+
+    return post_batch(rows())
@@ -0,0 +1,34 @@
+import statistics
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+def summarize(samples, elapsed):
+    """
+    Reduce ``Sample`` objects from one scenario run to a JSON-friendly dict.
+    Latencies are reported in milliseconds.
+    """
+    latencies = [sample.latency * 1000 for sample in samples]
+    queries = [s.queries for s in samples if s.queries is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if not sample.ok),
+        'throughput': len(samples) / elapsed if elapsed else None,
+        'latency_ms': {
+            'mean': statistics.fmean(latencies) if latencies else None,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': max(latencies, default=None),
+        },
+        'queries': {
+            'p50': percentile(queries, 50),
+            'max': max(queries, default=None),
+        },
+    }
@@ -1,3 +1,12 @@
-from django.contrib import admin
+from core.db.routers import read_only
 
-# Register your models here.
+
+class ReplicaChangeListMixin:
+    """
+    Serve the change list from a read replica. Its URL wrapper copies the
+    ``read_only`` mark from the method.
+    """
+
+    @read_only
+    def changelist_view(self, request, extra_context=None):
+        return super().changelist_view(request, extra_context)
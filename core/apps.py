@@ -3,3 +3,12 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from .db.backends.sqlite3.base import apply_pragmas
+        from .middleware import install_query_recorder
+
+        connection_created.connect(install_query_recorder)
+        connection_created.connect(apply_pragmas)
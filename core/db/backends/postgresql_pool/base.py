@@ -0,0 +1,137 @@
+"""
+PostgreSQL backend that checks connections out of a ``psycopg_pool``
+pool instead of opening one per request.
+
+Configure the pool in ``OPTIONS['pool']`` with any ``ConnectionPool``
+argument (``min_size``, ``max_size``, ``timeout``, ``max_idle``,
+``max_lifetime``...). ``CONN_HEALTH_CHECKS`` makes the pool test each
+connection before handing it out. ``CONN_MAX_AGE`` must be 0: the pool keeps
+connections open, and Django gives them back at the end of each request.
+
+Because connections outlive requests, so does session state. Cursors that
+``iterator()`` declared ``WITH HOLD`` are closed when a connection goes
+back, in case a request stopped reading one. psycopg's prepared statements
+are reused across requests: set ``OPTIONS['server_side_binding'] = True``
+and ``OPTIONS['prepare_threshold']`` to let psycopg prepare any query
+executed that many times on a connection, which covers the hot balance and
+history lookups.
+
+Maintenance connections to the ``postgres`` database are not pooled, and
+the test runner closes the test database's pool before dropping it.
+"""
+import os
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base
+from django.utils.asyncio import async_unsafe
+from psycopg import IsolationLevel
+from psycopg_pool import ConnectionPool
+
+from .creation import DatabaseCreation
+
+_pools = {}
+_pools_lock = threading.Lock()
+# Pools inherited by a forked child still hold the parent's sockets and
+# threads. They are kept referenced, never closed, so garbage collection can
+# not terminate the parent's sessions.
+_orphaned = []
+
+
+def _forget_pools():
+    _orphaned.extend(_pools.values())
+    _pools.clear()
+
+
+os.register_at_fork(after_in_child=_forget_pools)
+
+
+def _reset(connection):
+    """
+    Close the ``WITH HOLD`` cursors a request left open; the pool's
+    rollback has closed the others.
+    """
+    connection.autocommit = True
+    connection.execute('CLOSE ALL')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def __init__(self, settings_dict, *args, **kwargs):
+        if settings_dict.get('CONN_MAX_AGE'):
+            raise ImproperlyConfigured(
+                'The pooled PostgreSQL backend requires CONN_MAX_AGE = 0.'
+            )
+        super().__init__(settings_dict, *args, **kwargs)
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    @property
+    def pool_key(self):
+        return self.alias, self.settings_dict['NAME']
+
+    def get_pool(self, conn_params):
+        key = self.pool_key
+        pool = _pools.get(key)
+        if pool is not None:
+            return pool
+
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                options = self.settings_dict['OPTIONS'].get('pool', {})
+                pool = ConnectionPool(
+                    kwargs=conn_params,
+                    check=(
+                        ConnectionPool.check_connection
+                        if self.settings_dict['CONN_HEALTH_CHECKS']
+                        else None
+                    ),
+                    reset=_reset,
+                    name=self.alias,
+                    open=True,
+                    **options,
+                )
+                _pools[key] = pool
+        return pool
+
+    def close_pool(self):
+        with _pools_lock:
+            pool = _pools.pop(self.pool_key, None)
+        if pool is not None:
+            pool.close()
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        if self.alias == NO_DB_ALIAS:
+            return super().get_new_connection(conn_params)
+
+        connection = self.get_pool(conn_params).getconn()
+        options = self.settings_dict['OPTIONS']
+        if 'isolation_level' not in options:
+            self.isolation_level = IsolationLevel.READ_COMMITTED
+            return connection
+
+        try:
+            self.isolation_level = IsolationLevel(options['isolation_level'])
+        except ValueError:
+            connection._pool.putconn(connection)
+            raise ImproperlyConfigured(
+                f'Invalid transaction isolation level '
+                f'{options["isolation_level"]} specified.'
+            )
+        connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        if self.connection is None or self.alias == NO_DB_ALIAS:
+            return super()._close()
+        with self.wrap_database_errors:
+            # The pool rolls back anything left open before reuse.
+            self.connection._pool.putconn(self.connection)
+            self.connection = None
@@ -0,0 +1,32 @@
+"""
+SQLite backend for local and edge deployments.
+
+SQLite takes its write lock lazily: a transaction that reads before it
+writes, like every posting, only asks for the lock on its first write, and
+if another connection got there first it fails with "database is locked"
+straight away instead of honouring ``busy_timeout``. Starting every
+``atomic()`` block with ``BEGIN IMMEDIATE`` takes the write lock up front,
+so concurrent postings queue on ``busy_timeout`` and then run one at a time.
+
+The pragmas in ``settings.SQLITE_PRAGMAS`` are applied to every new
+connection by ``apply_pragmas``, connected in ``CoreConfig.ready``.
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """
+    ``connection_created`` receiver. Runs on the raw connection so the
+    pragmas are not counted as request queries.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
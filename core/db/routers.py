@@ -0,0 +1,170 @@
+"""
+Read replica routing.
+
+``settings.DATABASE_REPLICAS`` names replica aliases of ``default`` (see
+``DB_REPLICAS``). ``ReplicaRouter`` sends a read to a replica only while a
+request is being served and all of these hold:
+
+* the view is marked read-only, with ``read_only = True`` on the class or
+  the ``read_only`` decorator on the function;
+* the request is a GET or HEAD;
+* the client has not written anything in the last
+  ``REPLICA_STICKY_SECONDS``, so users see their own deposit. The
+  ``ReplicaMiddleware`` cookie tracks this;
+* a replica is at most ``REPLICA_MAX_LAG`` seconds behind.
+
+Everything else, every write and all code outside requests uses
+``default``. Querysets evaluated after the view returns, like the rows of a
+streaming response, should take their alias from ``router.db_for_read``
+inside the view.
+
+Locally, copy the migrated SQLite file and list the copy in
+``DB_REPLICAS``: SQLite has no replication, so the copy simply stays behind.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+# The request being served, set by ``core.middleware.ReplicaMiddleware``.
+current_request = ContextVar('current_request', default=None)
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+# Always read from the primary: a session that was just ended must not
+# stay valid on a lagging replica.
+PRIMARY_APPS = ('sessions',)
+
+LAG_SQL = {
+    # Zero on a primary, or on a replica that has replayed everything it
+    # received; otherwise the age of the last replayed transaction.
+    'postgresql': (
+        'SELECT CASE WHEN NOT pg_is_in_recovery() '
+        'OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+        'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) '
+        'END'
+    ),
+}
+
+# alias -> (monotonic time of the check, lag in seconds or None)
+_lag = {}
+
+
+def read_only(view):
+    """
+    Mark a function view as safe to serve from a replica.
+    """
+    view.read_only = True
+    return view
+
+
+def is_read_only(view):
+    view_class = getattr(view, 'view_class', None)
+    return getattr(view, 'read_only', False) or getattr(
+        view_class, 'read_only', False
+    )
+
+
+def measure_lag(alias):
+    """
+    Seconds ``alias`` is behind the primary, or ``None`` when it can not be
+    reached. Runs on the raw connection so the check is not counted as a
+    request query. Databases without a lag query count as up to date.
+    """
+    connection = connections[alias]
+    sql = LAG_SQL.get(connection.vendor)
+    if sql is None:
+        return 0.0
+    try:
+        with connection.wrap_database_errors:
+            connection.ensure_connection()
+            with connection.connection.cursor() as cursor:
+                cursor.execute(sql)
+                lag = cursor.fetchone()[0]
+    except DatabaseError:
+        return None
+    return float(lag or 0)
+
+
+def replica_lag(alias):
+    now = time.monotonic()
+    checked = _lag.get(alias)
+    if (
+        checked is None
+        or now - checked[0] >= settings.REPLICA_LAG_CHECK_INTERVAL
+    ):
+        checked = _lag[alias] = (now, measure_lag(alias))
+    return checked[1]
+
+
+def usable_replicas():
+    usable = []
+    for alias in settings.DATABASE_REPLICAS:
+        lag = replica_lag(alias)
+        if lag is not None and lag <= settings.REPLICA_MAX_LAG:
+            usable.append(alias)
+    return usable
+
+
+def is_sticky(request):
+    """
+    Whether the client wrote recently enough to be kept on the primary.
+    """
+    try:
+        until = float(request.COOKIES.get(settings.REPLICA_STICKY_COOKIE, 0))
+    except ValueError:
+        return False
+    return until > time.time()
+
+
+def choose_replica(request):
+    if (
+        request.method not in SAFE_METHODS
+        or not is_read_only(request.resolver_match.func)
+        or is_sticky(request)
+    ):
+        return None
+    replicas = usable_replicas()
+    return random.choice(replicas) if replicas else None
+
+
+def request_replica(request):
+    """
+    The replica serving ``request``'s reads, or ``None`` for the primary.
+    Chosen once per request, when the view runs.
+    """
+    if not settings.DATABASE_REPLICAS or request.resolver_match is None:
+        # Reads made before the URL is resolved stay on the primary.
+        return None
+    try:
+        return request._replica
+    except AttributeError:
+        request._replica = choose_replica(request)
+        return request._replica
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        request = current_request.get()
+        if request is None or model._meta.app_label in PRIMARY_APPS:
+            return None
+        return request_replica(request)
+
+    def db_for_write(self, model, **hints):
+        # Without this, saving an instance read from a replica would write
+        # to the replica.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import runner
+from core.models import BatchCheckpoint
+
+
+class Command(BaseCommand):
+    help = (
+        'Run an end-of-day job over account number partitions in parallel. '
+        'Rerunning with the same --run-key resumes unfinished partitions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('job', help='Job name from settings.BATCH_JOBS.')
+        parser.add_argument(
+            '--run-key',
+            required=True,
+            help='Identifies the run, e.g. the business date.',
+        )
+        parser.add_argument('--partitions', type=int, default=8)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Worker processes. Defaults to the number of CPUs.',
+        )
+        parser.add_argument(
+            '--option',
+            action='append',
+            default=[],
+            metavar='KEY=VALUE',
+            help=(
+                'Keyword argument passed to the job; true, false and whole '
+                'numbers are converted. May be repeated.'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        try:
+            job_options = runner.parse_options(options['option'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        try:
+            checkpoints = runner.run(
+                options['job'],
+                options['run_key'],
+                partitions=options['partitions'],
+                workers=options['workers'],
+                options=job_options,
+            )
+        except ValueError as e:
+            raise CommandError(e)
+
+        failed = 0
+        for checkpoint in checkpoints:
+            duration = (
+                f'{checkpoint.duration:.2f}s'
+                if checkpoint.duration is not None else '-'
+            )
+            self.stdout.write(
+                f'[{checkpoint.account_no_start}, '
+                f'{checkpoint.account_no_end}) '
+                f'{checkpoint.status:<7} {duration:>9} '
+                f'{checkpoint.result or ""}'
+            )
+            if checkpoint.status == BatchCheckpoint.FAILED:
+                failed += 1
+                self.stderr.write(checkpoint.error)
+
+        if failed:
+            raise CommandError(f'{failed} partitions failed')
+        self.stdout.write(self.style.SUCCESS('All partitions done'))
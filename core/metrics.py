@@ -0,0 +1,142 @@
+"""
+In-process request metrics, exposed in the Prometheus text format.
+
+Each worker process keeps its own histograms; Prometheus sums them when it
+scrapes every worker.
+"""
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+
+SECONDS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class RequestStats:
+    """
+    Timings collected for the request being handled.
+    """
+
+    def __init__(self):
+        self.query_count = 0
+        self.query_time = 0.0
+        self.template_time = 0.0
+
+
+current_stats = ContextVar('current_stats', default=None)
+
+
+class Histogram:
+
+    def __init__(self, name, documentation, buckets, label='view'):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.label = label
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = {
+                    'buckets': [0] * (len(self.buckets) + 1),
+                    'sum': 0.0,
+                    'count': 0,
+                }
+            series['buckets'][bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        with self._lock:
+            series = {
+                key: {**value, 'buckets': list(value['buckets'])}
+                for key, value in self._series.items()
+            }
+        for label_value, value in sorted(series.items()):
+            label = f'{self.label}="{label_value}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, value['buckets']):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f'{self.name}_bucket{{{label},le="+Inf"}} {value["count"]}'
+            )
+            lines.append(f'{self.name}_sum{{{label}}} {value["sum"]}')
+            lines.append(f'{self.name}_count{{{label}}} {value["count"]}')
+        return '\n'.join(lines)
+
+
+class Counter:
+
+    def __init__(self, name, documentation, label='view'):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] = (
+                self._values.get(label_value, 0) + amount
+            )
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} counter',
+        ]
+        with self._lock:
+            values = dict(self._values)
+        for label_value, value in sorted(values.items()):
+            lines.append(f'{self.name}{{{self.label}="{label_value}"}} {value}')
+        return '\n'.join(lines)
+
+
+REQUEST_DURATION = Histogram(
+    'banking_request_duration_seconds',
+    'Time spent handling the request.',
+    SECONDS_BUCKETS,
+)
+DB_DURATION = Histogram(
+    'banking_request_db_duration_seconds',
+    'Time spent executing SQL per request.',
+    SECONDS_BUCKETS,
+)
+TEMPLATE_DURATION = Histogram(
+    'banking_request_template_duration_seconds',
+    'Time spent rendering templates per request.',
+    SECONDS_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'banking_request_db_queries',
+    'Number of SQL queries per request.',
+    QUERY_BUCKETS,
+)
+QUERY_BUDGET_EXCEEDED = Counter(
+    'banking_query_budget_exceeded_total',
+    'Requests that issued more queries than their budget allows.',
+)
+
+REGISTRY = [
+    REQUEST_DURATION,
+    DB_DURATION,
+    TEMPLATE_DURATION,
+    DB_QUERIES,
+    QUERY_BUDGET_EXCEEDED,
+]
+
+
+def render():
+    return '\n'.join(metric.render() for metric in REGISTRY) + '\n'
@@ -0,0 +1,170 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics
+from .db import routers
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def record_query(execute, sql, params, many, context):
+    stats = metrics.current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.query_time += time.perf_counter() - started
+        stats.query_count += 1
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    ``connection_created`` receiver. The wrapper stays on the connection
+    and reads the current request from a context variable, so it also sees
+    queries the async ORM runs in worker threads.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class QueryMetricsMiddleware:
+    """
+    Record SQL query count and time, template render time and total time
+    for every request. The numbers are sent back in a ``Server-Timing``
+    header, aggregated per URL name for ``/metrics`` and checked against
+    ``settings.QUERY_BUDGETS``.
+
+    Budgets map URL names (``'accounts:dashboard'``) to the maximum number
+    of queries a request may issue. ``QUERY_BUDGET_ACTION = 'raise'`` turns
+    an overrun into a ``QueryBudgetExceeded`` error, which is meant for the
+    test settings; anything else only logs a warning.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        stats = metrics.RequestStats()
+        token = metrics.current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_stats.reset(token)
+        return self.finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = metrics.RequestStats()
+        token = metrics.current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_stats.reset(token)
+        return self.finish(request, response, stats, started)
+
+    def finish(self, request, response, stats, started):
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+
+        metrics.REQUEST_DURATION.observe(view, duration)
+        metrics.DB_DURATION.observe(view, stats.query_time)
+        metrics.DB_QUERIES.observe(view, stats.query_count)
+        metrics.TEMPLATE_DURATION.observe(view, stats.template_time)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={stats.query_time * 1000:.1f};'
+            f'desc="{stats.query_count} queries"',
+            f'tpl;dur={stats.template_time * 1000:.1f}',
+            # The whole request, db and tpl included.
+            f'total;dur={duration * 1000:.1f}',
+        ])
+
+        self.check_budget(view, stats)
+        return response
+
+    def check_budget(self, view, stats):
+        budget = settings.QUERY_BUDGETS.get(view)
+        if budget is None or stats.query_count <= budget:
+            return
+
+        metrics.QUERY_BUDGET_EXCEEDED.inc(view)
+        message = (
+            f'{view} issued {stats.query_count} queries, '
+            f'budget is {budget}'
+        )
+        if settings.QUERY_BUDGET_ACTION == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class ReplicaMiddleware:
+    """
+    Expose the request to ``core.db.routers.ReplicaRouter``, and keep
+    clients that just wrote on the primary: every request with an unsafe
+    method sets a cookie holding the time their reads may go back to a
+    replica, ``REPLICA_STICKY_SECONDS`` later.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = routers.current_request.set(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.current_request.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = routers.current_request.set(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.current_request.reset(token)
+        return self.finish(request, response)
+
+    def finish(self, request, response):
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method not in routers.SAFE_METHODS
+        ):
+            seconds = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE,
+                f'{time.time() + seconds:.3f}',
+                max_age=seconds,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
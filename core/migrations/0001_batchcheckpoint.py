@@ -0,0 +1,36 @@
+# Generated by Django 4.2.16 on 2026-10-18 18:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BatchCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.CharField(max_length=100)),
+                ('run_key', models.CharField(max_length=100)),
+                ('account_no_start', models.PositiveBigIntegerField()),
+                ('account_no_end', models.PositiveBigIntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('duration', models.FloatField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['job', 'run_key', 'account_no_start'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='batchcheckpoint',
+            constraint=models.UniqueConstraint(fields=('job', 'run_key', 'account_no_start'), name='unique_batch_partition'),
+        ),
+    ]
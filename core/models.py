@@ -1,3 +1,47 @@
 from django.db import models
 
-# Create your models here.
+
+class BatchCheckpoint(models.Model):
+    """
+    One account number partition of a batch run. Rows are created up front
+    for the whole run, so a restarted run with the same ``run_key`` keeps
+    the original partition boundaries and only processes what is not done.
+    """
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    job = models.CharField(max_length=100)
+    run_key = models.CharField(max_length=100)
+    account_no_start = models.PositiveBigIntegerField()
+    account_no_end = models.PositiveBigIntegerField()
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+    )
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    duration = models.FloatField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return (
+            f'{self.job} {self.run_key} '
+            f'[{self.account_no_start}, {self.account_no_end})'
+        )
+
+    class Meta:
+        ordering = ['job', 'run_key', 'account_no_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['job', 'run_key', 'account_no_start'],
+                name='unique_batch_partition',
+            ),
+        ]
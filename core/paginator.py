@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+
+def estimated_count(queryset):
+    """
+    Return the planner's row estimate for the queryset's table, or ``None``
+    when the database can not provide one cheaply (anything but
+    PostgreSQL, or a table that was never analyzed).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that skips ``COUNT(*)`` on big unfiltered tables and uses the
+    planner's estimate instead. Filtered querysets are still counted
+    exactly, since they are usually small and the estimate would not apply.
+    """
+
+    @cached_property
+    def count(self):
+        object_list = self.object_list
+        if isinstance(object_list, QuerySet) and not object_list.query.where:
+            estimate = estimated_count(object_list)
+            if (
+                estimate is not None
+                and estimate >= settings.ESTIMATED_COUNT_THRESHOLD
+            ):
+                return estimate
+        return super().count
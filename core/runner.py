@@ -0,0 +1,193 @@
+"""
+Parallel, resumable end-of-day batch runner.
+
+A run splits ``UserBankAccount`` into ``account_no`` range partitions and
+hands each one to a job on a ``ProcessPoolExecutor``. Every worker opens its
+own database connection. Progress is checkpointed per partition in
+``BatchCheckpoint``, so running the same job with the same ``run_key`` again
+only picks up the partitions that have not finished.
+
+Jobs are named in ``settings.BATCH_JOBS`` and are called as
+``job(accounts, **options)``, where ``accounts`` is the partition's
+``UserBankAccount`` queryset. Whatever JSON-serializable value they return is
+stored on the checkpoint. ``parse_options`` turns ``KEY=VALUE`` strings from
+the command line into those options.
+
+Each run first deletes the checkpoints of runs that finished more than
+``BATCH_CHECKPOINT_RETENTION_DAYS`` ago, so runs keyed by the time they
+started do not pile up.
+"""
+import datetime
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Exists, Max, Min, OuterRef
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import BatchCheckpoint
+
+
+def get_job(name):
+    try:
+        return import_string(settings.BATCH_JOBS[name])
+    except KeyError:
+        raise ValueError(f'Unknown batch job {name!r}')
+
+
+def parse_option(value):
+    """
+    ``true`` and ``false`` as booleans, whole numbers as ints, and anything
+    else as it is.
+    """
+    if value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def parse_options(pairs):
+    """
+    Job options from ``KEY=VALUE`` strings. Raise ``ValueError`` for a
+    string without ``=``.
+    """
+    options = {}
+    for pair in pairs:
+        key, separator, value = pair.partition('=')
+        if not separator or not key:
+            raise ValueError(f'Options must be KEY=VALUE, not {pair!r}')
+        options[key] = parse_option(value)
+    return options
+
+
+def prune(before):
+    """
+    Delete the checkpoints of the runs whose partitions were all done
+    before ``before``, and return how many were deleted.
+    """
+    same_run = BatchCheckpoint.objects.filter(
+        job=OuterRef('job'), run_key=OuterRef('run_key')
+    )
+    deleted, _ = BatchCheckpoint.objects.filter(
+        ~Exists(same_run.exclude(status=BatchCheckpoint.DONE)),
+        ~Exists(same_run.filter(completed_at__gte=before)),
+    ).delete()
+    return deleted
+
+
+def plan(job, run_key, partitions):
+    """
+    Return the checkpoints of a run, creating evenly sized ``account_no``
+    ranges the first time the run is seen.
+    """
+    from accounts.models import UserBankAccount
+
+    checkpoints = BatchCheckpoint.objects.filter(job=job, run_key=run_key)
+    if checkpoints.exists():
+        return list(checkpoints)
+
+    bounds = UserBankAccount.objects.aggregate(
+        low=Min('account_no'), high=Max('account_no')
+    )
+    if bounds['low'] is None:
+        return []
+
+    low, high = bounds['low'], bounds['high'] + 1
+    size = max(1, -(-(high - low) // partitions))
+    BatchCheckpoint.objects.bulk_create(
+        [
+            BatchCheckpoint(
+                job=job,
+                run_key=run_key,
+                account_no_start=start,
+                account_no_end=min(start + size, high),
+            )
+            for start in range(low, high, size)
+        ],
+        ignore_conflicts=True,
+    )
+    return list(checkpoints.all())
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+
+    # Spawned workers start from scratch; forked ones inherit the parent's
+    # connections, which must not be shared across processes.
+    if not apps.ready:
+        os.environ.setdefault(
+            'DJANGO_SETTINGS_MODULE', 'banking_system.settings'
+        )
+        django.setup()
+    connections.close_all()
+
+
+def run_partition(checkpoint_pk, options):
+    """
+    Run one partition and record its outcome. Executed in a worker.
+    """
+    from accounts.models import UserBankAccount
+
+    checkpoint = BatchCheckpoint.objects.get(pk=checkpoint_pk)
+    accounts = UserBankAccount.objects.filter(
+        account_no__gte=checkpoint.account_no_start,
+        account_no__lt=checkpoint.account_no_end,
+    )
+
+    started = time.perf_counter()
+    try:
+        result = get_job(checkpoint.job)(accounts, **options)
+    except Exception:
+        checkpoint.status = BatchCheckpoint.FAILED
+        checkpoint.error = traceback.format_exc()
+    else:
+        checkpoint.status = BatchCheckpoint.DONE
+        checkpoint.result = result
+        checkpoint.error = ''
+    checkpoint.duration = time.perf_counter() - started
+    checkpoint.completed_at = timezone.now()
+    checkpoint.save(update_fields=[
+        'status', 'result', 'error', 'duration', 'completed_at',
+    ])
+    return checkpoint.pk
+
+
+def run(job, run_key, partitions=8, workers=None, options=None):
+    """
+    Run ``job`` over every unfinished partition of ``run_key`` and return
+    all of the run's checkpoints. ``workers=1`` runs in-process.
+    """
+    get_job(job)
+    options = options or {}
+    prune(timezone.now() - datetime.timedelta(
+        days=settings.BATCH_CHECKPOINT_RETENTION_DAYS
+    ))
+    pending = [
+        checkpoint.pk
+        for checkpoint in plan(job, run_key, partitions)
+        if checkpoint.status != BatchCheckpoint.DONE
+    ]
+
+    if workers == 1:
+        for pk in pending:
+            run_partition(pk, options)
+    elif pending:
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker
+        ) as executor:
+            futures = [
+                executor.submit(run_partition, pk, options)
+                for pk in pending
+            ]
+            for future in as_completed(futures):
+                future.result()
+
+    return list(BatchCheckpoint.objects.filter(job=job, run_key=run_key))
@@ -0,0 +1,36 @@
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from .metrics import current_stats
+
+
+class InstrumentedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        stats = current_stats.get()
+        if stats is None:
+            return super().render(context, request)
+
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    The regular Django template backend, timing every top-level render into
+    the current request's ``RequestStats``. Included and extended templates
+    are rendered inside their parent, so nothing is counted twice.
+    """
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(
+            self.engine.from_string(template_code), self
+        )
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
@@ -1,3 +1,292 @@
-from django.test import TestCase
+import datetime
+import io
+import time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, router
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from accounts.models import User
+from accounts.tests import create_account
+from transactions.models import Transaction
+
+from . import runner
+from .db import routers
+from .middleware import ReplicaMiddleware
+from .models import BatchCheckpoint
+
+POOLED = (
+    connection.settings_dict['ENGINE'] == 'core.db.backends.postgresql_pool'
+)
+
+
+# -------------------------
+# REQUEST METRICS
+# -------------------------
+class MetricsTests(TestCase):
+
+    def test_server_timing_reports_total_separately(self):
+        response = self.client.get(reverse('home'))
+        names = [
+            metric.split(';')[0].strip()
+            for metric in response['Server-Timing'].split(',')
+        ]
+        self.assertEqual(names, ['db', 'tpl', 'total'])
+
+    def test_metrics_closed_to_local_addresses_by_default(self):
+        # The test client connects from 127.0.0.1, like a local proxy.
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+    def test_metrics_open_to_allowed_addresses(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    def test_metrics_open_to_staff(self):
+        user = User.objects.create_user(
+            email='staff@x.com', password='secret', is_staff=True
+        )
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+
+# -------------------------
+# READ REPLICAS
+# -------------------------
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRoutingTests(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(routers, 'replica_lag', return_value=0)
+        self.lag = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def serve(self, method, name, cookies=None):
+        """
+        Serve a request to URL ``name`` through ``ReplicaMiddleware`` and
+        return the response and the aliases its view would read
+        ``Transaction`` and ``Session`` from and write ``Transaction`` to.
+        No query reaches the replica, which only exists in name.
+        """
+        path = reverse(name)
+        request = RequestFactory().generic(method, path)
+        request.COOKIES.update(cookies or {})
+        request.resolver_match = resolve(path)
+        aliases = []
+
+        def view(request):
+            aliases.extend([
+                router.db_for_read(Transaction),
+                router.db_for_read(Session),
+                router.db_for_write(Transaction),
+            ])
+            return HttpResponse()
+
+        return ReplicaMiddleware(view)(request), aliases
+
+    def test_read_only_views_read_from_the_replica(self):
+        for name in (
+            'transactions:transaction_report', 'accounts:account_list',
+        ):
+            with self.subTest(name=name):
+                response, aliases = self.serve('GET', name)
+                self.assertEqual(
+                    aliases, ['replica_1', 'default', 'default']
+                )
+                self.assertNotIn(
+                    settings.REPLICA_STICKY_COOKIE, response.cookies
+                )
+
+    def test_other_views_read_from_the_primary(self):
+        _, aliases = self.serve('GET', 'accounts:dashboard')
+        self.assertEqual(aliases, ['default', 'default', 'default'])
+
+    def test_writes_keep_the_client_on_the_primary(self):
+        response, aliases = self.serve(
+            'POST', 'transactions:transaction_report'
+        )
+        self.assertEqual(aliases, ['default', 'default', 'default'])
+        cookie = response.cookies[settings.REPLICA_STICKY_COOKIE]
+        self.assertAlmostEqual(
+            float(cookie.value),
+            time.time() + settings.REPLICA_STICKY_SECONDS,
+            delta=5,
+        )
+
+        cookies = {settings.REPLICA_STICKY_COOKIE: cookie.value}
+        _, aliases = self.serve(
+            'GET', 'transactions:transaction_report', cookies
+        )
+        self.assertEqual(aliases[0], 'default')
+
+        expired = {settings.REPLICA_STICKY_COOKIE: f'{time.time() - 1}'}
+        _, aliases = self.serve(
+            'GET', 'transactions:transaction_report', expired
+        )
+        self.assertEqual(aliases[0], 'replica_1')
+
+    def test_skips_lagging_and_unreachable_replicas(self):
+        for lag in (settings.REPLICA_MAX_LAG + 1, None):
+            with self.subTest(lag=lag):
+                self.lag.return_value = lag
+                _, aliases = self.serve(
+                    'GET', 'transactions:transaction_report'
+                )
+                self.assertEqual(aliases[0], 'default')
+
+
+# -------------------------
+# BATCH RUNNER
+# -------------------------
+class BatchRunnerTests(TestCase):
+
+    def test_parses_options(self):
+        self.assertEqual(
+            runner.parse_options([
+                'full=false', 'resume=True', 'limit=10', 'period=2024-05',
+                'note=a=b',
+            ]),
+            {
+                'full': False, 'resume': True, 'limit': 10,
+                'period': '2024-05', 'note': 'a=b',
+            },
+        )
+        for pair in ('full', '=false'):
+            with self.subTest(pair=pair), self.assertRaises(ValueError):
+                runner.parse_options([pair])
+
+    @mock.patch('transactions.jobs.verify_ledger', return_value={})
+    def test_run_batch_passes_parsed_options(self, job):
+        create_account('batch@x.com', 1000000001)
+        call_command(
+            'run_batch', 'verify_ledger', '--run-key', 'options',
+            '--partitions', '1', '--workers', '1', '--option', 'full=false',
+            stdout=io.StringIO(),
+        )
+        self.assertIs(job.call_args.kwargs['full'], False)
+
+        with self.assertRaisesMessage(CommandError, 'KEY=VALUE'):
+            call_command(
+                'run_batch', 'verify_ledger', '--run-key', 'options',
+                '--option', 'full',
+            )
+
+    def checkpoint(self, run_key, status, days_ago, start=0):
+        return BatchCheckpoint.objects.create(
+            job='verify_ledger',
+            run_key=run_key,
+            account_no_start=start,
+            account_no_end=start + 1,
+            status=status,
+            completed_at=timezone.now() - datetime.timedelta(days=days_ago),
+        )
+
+    def test_prunes_runs_finished_before_the_retention(self):
+        done, failed = BatchCheckpoint.DONE, BatchCheckpoint.FAILED
+        self.checkpoint('old', done, 40)
+        self.checkpoint('old', done, 35, start=1)
+        self.checkpoint('old-failed', done, 40)
+        self.checkpoint('old-failed', failed, 40, start=1)
+        self.checkpoint('finished-lately', done, 40)
+        self.checkpoint('finished-lately', done, 1, start=1)
+        self.checkpoint('recent', done, 1)
+
+        self.assertEqual(
+            runner.prune(timezone.now() - datetime.timedelta(days=30)), 2
+        )
+        self.assertEqual(
+            set(BatchCheckpoint.objects.values_list('run_key', flat=True)),
+            {'old-failed', 'finished-lately', 'recent'},
+        )
+
+    @override_settings(BATCH_CHECKPOINT_RETENTION_DAYS=30)
+    @mock.patch('transactions.jobs.verify_ledger', return_value={})
+    def test_runs_prune_old_checkpoints(self, job):
+        self.checkpoint('old', BatchCheckpoint.DONE, 40)
+        create_account('batch@x.com', 1000000001)
+        checkpoints = runner.run(
+            'verify_ledger', 'new', partitions=1, workers=1
+        )
+        self.assertEqual(
+            [checkpoint.status for checkpoint in checkpoints],
+            [BatchCheckpoint.DONE],
+        )
+        self.assertFalse(
+            BatchCheckpoint.objects.filter(run_key='old').exists()
+        )
+
+
+# -------------------------
+# CONNECTION POOL
+# -------------------------
+@skipUnless(POOLED, 'Needs DB_POOL=1')
+class ConnectionPoolTests(TestCase):
+
+    def connect(self, **settings):
+        from core.db.backends.postgresql_pool.base import DatabaseWrapper
+
+        # A pool of one of its own, so reuse is deterministic.
+        options = connection.settings_dict['OPTIONS']
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'OPTIONS': {**options, 'pool': {'min_size': 1, 'max_size': 1}},
+            **settings,
+        }, alias='pool_tests')
+        self.addCleanup(wrapper.close_pool)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def backend_pid(self, wrapper):
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def test_close_returns_the_connection(self):
+        wrapper = self.connect()
+        pid = self.backend_pid(wrapper)
+        raw = wrapper.connection
+        wrapper.close()
+        self.assertIsNone(wrapper.connection)
+        self.assertFalse(raw.closed)
+        self.assertEqual(self.backend_pid(wrapper), pid)
+
+    def test_requires_conn_max_age_zero(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.connect(CONN_MAX_AGE=60)
+
+    def test_replaces_broken_connections(self):
+        wrapper = self.connect()
+        pid = self.backend_pid(wrapper)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+        with self.assertRaises(OperationalError):
+            self.backend_pid(wrapper)
+
+        # What request_finished does.
+        wrapper.close_if_unusable_or_obsolete()
+        self.assertIsNone(wrapper.connection)
+        self.assertNotEqual(self.backend_pid(wrapper), pid)
+
+    def test_closes_held_cursors(self):
+        wrapper = self.connect()
+        pid = self.backend_pid(wrapper)
+        # As a streaming export abandoned mid-way leaves it.
+        cursor = wrapper.chunked_cursor()
+        cursor.execute('SELECT generate_series(1, 10)')
+        cursor.fetchone()
+        wrapper.close()
+
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid(), COUNT(*) FROM pg_cursors')
+            self.assertEqual(cursor.fetchone(), (pid, 0))
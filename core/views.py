@@ -1,5 +1,26 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.views.generic import TemplateView
 
+from . import metrics as request_metrics
+
 
 class HomeView(TemplateView):
     template_name = 'core/index.html'
+
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint. Open to ``METRICS_ALLOWED_IPS`` and to
+    logged-in staff.
+    """
+    if (
+        request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS
+        and not request.user.is_staff
+    ):
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        request_metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
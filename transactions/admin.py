@@ -1,5 +1,38 @@
 from django.contrib import admin
 
+from accounts.admin import AccountSearchMixin
+from core.admin import ReplicaChangeListMixin
+from core.paginator import EstimatedCountPaginator
 from transactions.models import Transaction
 
-admin.site.register(Transaction)
+
+@admin.register(Transaction)
+class TransactionAdmin(
+    ReplicaChangeListMixin, AccountSearchMixin, admin.ModelAdmin
+):
+    account_search_path = 'account__'
+    list_display = (
+        'account',
+        'transaction_type',
+        'amount',
+        'balance_after_transaction',
+        'timestamp',
+    )
+    list_select_related = ('account',)
+    list_filter = ('transaction_type',)
+    raw_id_fields = ('account',)
+    search_fields = ('account__account_no', 'account__user__email')
+    ordering = ('-pk',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # The ledger is append-only: rows are written by the posting engine and
+    # chained by hash, see ``transactions.chain``.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,152 @@
+"""
+Verification of the running aggregates kept on ``UserBankAccount``.
+
+The posting engine maintains them incrementally; ``verify`` recomputes them
+from the ledger, one chunk of accounts at a time, and reports (and
+optionally repairs) any account where the two disagree.
+"""
+import datetime
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from accounts.models import UserBankAccount
+
+from . import ledger
+from .constants import CREDIT_TRANSACTION_TYPES
+from .models import ArchivedLedger, Transaction
+
+TOTAL_FIELDS = [
+    'total_credit',
+    'total_debit',
+    'daily_credit',
+    'daily_debit',
+    'monthly_credit',
+    'monthly_debit',
+]
+AGGREGATE_FIELDS = TOTAL_FIELDS + ['transaction_count', 'last_transaction_at']
+
+Drift = namedtuple('Drift', ['account_no', 'field', 'stored', 'expected'])
+
+
+def _start_of(date):
+    return timezone.make_aware(
+        datetime.datetime.combine(date, datetime.time.min)
+    )
+
+
+def expected_aggregates(account_ids, today, using):
+    """
+    Return ``{account_id: {field: value}}`` computed from the ledger, with
+    one grouped query, plus the lifetime totals of archived rows.
+    """
+    credit = Q(transaction_type__in=CREDIT_TRANSACTION_TYPES)
+    debit = ~credit
+    day = Q(timestamp__gte=_start_of(today))
+    month = Q(timestamp__gte=_start_of(today.replace(day=1)))
+
+    def total(condition):
+        return Sum('amount', filter=condition, default=ledger.ZERO)
+
+    rows = Transaction.objects.using(using).filter(
+        account_id__in=account_ids
+    ).values('account_id').annotate(
+        total_credit=total(credit),
+        total_debit=total(debit),
+        daily_credit=total(credit & day),
+        daily_debit=total(debit & day),
+        monthly_credit=total(credit & month),
+        monthly_debit=total(debit & month),
+        transaction_count=Count('pk'),
+        last_transaction_at=Max('timestamp'),
+    ).order_by()
+
+    empty = dict.fromkeys(TOTAL_FIELDS, ledger.ZERO)
+    empty.update(transaction_count=0, last_transaction_at=None)
+    expected = {pk: dict(empty) for pk in account_ids}
+    for row in rows:
+        for field in TOTAL_FIELDS:
+            # SQLite sums decimals as floats.
+            row[field] = row[field].quantize(ledger.CENT)
+        expected[row.pop('account_id')] = row
+
+    for archived in ArchivedLedger.objects.using(using).filter(
+        account_id__in=account_ids
+    ):
+        values = expected[archived.account_id]
+        values['total_credit'] += archived.total_credit
+        values['total_debit'] += archived.total_debit
+        values['transaction_count'] += archived.transaction_count
+        values['last_transaction_at'] = (
+            values['last_transaction_at'] or archived.last_transaction_at
+        )
+    return expected
+
+
+def stored_aggregates(account, today):
+    daily_credit, daily_debit = account.daily_totals(today)
+    monthly_credit, monthly_debit = account.monthly_totals(today)
+    return {
+        'total_credit': account.total_credit,
+        'total_debit': account.total_debit,
+        'daily_credit': daily_credit,
+        'daily_debit': daily_debit,
+        'monthly_credit': monthly_credit,
+        'monthly_debit': monthly_debit,
+        'transaction_count': account.transaction_count,
+        'last_transaction_at': account.last_transaction_at,
+    }
+
+
+def verify(accounts=None, fix=False, chunk_size=1000):
+    """
+    Compare the stored aggregates of ``accounts`` (a ``UserBankAccount``
+    queryset, all accounts by default) with the ledger and yield a
+    ``Drift`` per mismatching field. Each chunk is locked while it is
+    checked, so postings in flight can not show up as drift. With ``fix``
+    the mismatching accounts are rewritten from the ledger.
+    """
+    using = ledger.posting_db()
+    queryset = accounts if accounts is not None else UserBankAccount.objects
+    queryset = queryset.using(using).only(
+        'pk', 'account_no', 'counters_date', *AGGREGATE_FIELDS
+    ).order_by('pk')
+
+    last_pk = 0
+    while True:
+        with transaction.atomic(using=using):
+            chunk = list(
+                queryset.select_for_update().filter(pk__gt=last_pk)
+                [:chunk_size]
+            )
+            if not chunk:
+                return
+
+            today = timezone.localdate()
+            expected = expected_aggregates(
+                [account.pk for account in chunk], today, using
+            )
+            drifted = []
+            for account in chunk:
+                stored = stored_aggregates(account, today)
+                values = expected[account.pk]
+                mismatches = [
+                    Drift(account.account_no, field, stored[field], value)
+                    for field, value in values.items()
+                    if stored[field] != value
+                ]
+                if mismatches:
+                    yield from mismatches
+                    for field, value in values.items():
+                        setattr(account, field, value)
+                    account.counters_date = today
+                    drifted.append(account)
+
+            if fix and drifted:
+                UserBankAccount.objects.using(using).bulk_update(
+                    drifted, AGGREGATE_FIELDS + ['counters_date']
+                )
+
+        last_pk = chunk[-1].pk
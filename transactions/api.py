@@ -0,0 +1,154 @@
+"""
+JSON API for balances, transaction history and transfers.
+
+The views are async, but Django 4.2 has no async database or session
+layer: the async ORM and the session user run their sync code through
+``sync_to_async`` on the thread-sensitive executor, one hop at a time.
+Requests therefore make as few hops as they can. The session user comes
+with their account in one (``request.auser()`` can replace it on Django
+5.0), after which a balance needs no query and a history page one. A
+transfer, including its idempotency key, is posted by the synchronous
+ledger engine in a single hop.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db.models import Q
+from django.http import JsonResponse
+from django.views import View
+
+from accounts.models import UserBankAccount
+
+from . import ledger
+from .forms import FundTransferForm
+from .idempotency import idempotent
+from .models import Transaction
+from .statements import STATEMENT_FIELDS, encode_row
+from .views import decode_cursor, encode_cursor
+
+
+def error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def serialize(transaction):
+    return dict(zip(STATEMENT_FIELDS, encode_row(
+        transaction.timestamp,
+        transaction.transaction_type,
+        transaction.amount,
+        transaction.balance_after_transaction,
+    )))
+
+
+class AccountAPIView(View):
+    """
+    Base for ``/api/v1/accounts/<account_no>/...`` endpoints. Resolves the
+    session user and the requested account, which must belong to them.
+    """
+
+    async def dispatch(self, request, account_no, *args, **kwargs):
+        # The session, the user and their account in one hop; see the
+        # module docstring.
+        request.user = await sync_to_async(get_user)(request)
+        if not request.user.is_authenticated:
+            return error('Authentication required', 401)
+
+        # The cached session user comes with their account.
+        try:
+            self.account = request.user.account
+        except UserBankAccount.DoesNotExist:
+            self.account = None
+        if self.account is None or self.account.account_no != account_no:
+            return error('Account not found', 404)
+
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class BalanceView(AccountAPIView):
+    read_only = True
+
+    async def get(self, request):
+        return JsonResponse({
+            'account_no': self.account.account_no,
+            'balance': str(self.account.balance),
+        })
+
+
+class TransactionListView(AccountAPIView):
+    """
+    Keyset-paginated history, like the HTML report: pass the ``next``
+    cursor of a page as ``?after=`` to get the following one.
+    """
+    read_only = True
+
+    async def get(self, request):
+        page_size = settings.TRANSACTION_REPORT_PAGE_SIZE
+        queryset = Transaction.objects.filter(account_id=self.account.pk)
+
+        cursor = decode_cursor(request.GET.get('after', ''))
+        if cursor:
+            timestamp, pk = cursor
+            queryset = queryset.filter(
+                Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, pk__gt=pk),
+                timestamp__gte=timestamp,
+            )
+
+        transactions = [
+            transaction
+            async for transaction in queryset.only(
+                'pk', *STATEMENT_FIELDS
+            ).order_by('timestamp', 'pk')[:page_size + 1]
+        ]
+        has_next = len(transactions) > page_size
+        transactions = transactions[:page_size]
+
+        return JsonResponse({
+            'account_no': self.account.account_no,
+            'transactions': [serialize(t) for t in transactions],
+            'next': encode_cursor(transactions[-1]) if has_next else None,
+        })
+
+
+@idempotent
+def post_transfer(request, account):
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return error('Invalid JSON', 400)
+    if not isinstance(data, dict):
+        return error('Expected a JSON object', 400)
+
+    form = FundTransferForm(data, account=account)
+    if form.is_valid():
+        try:
+            to_account = UserBankAccount.objects.get(
+                account_no=form.cleaned_data['to_account']
+            )
+        except UserBankAccount.DoesNotExist:
+            form.add_error('to_account', 'Target account not found')
+        else:
+            try:
+                debit, credit = ledger.transfer(
+                    account, to_account, form.cleaned_data['amount']
+                )
+            except ledger.PostingError as e:
+                form.add_error(None, str(e))
+            else:
+                return JsonResponse(
+                    dict(serialize(debit), to_account=to_account.account_no),
+                    status=201,
+                )
+
+    return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+
+
+class TransferView(AccountAPIView):
+    """
+    ``POST {"to_account": ..., "amount": "..."}``. Send an
+    ``Idempotency-Key`` header to make retries safe.
+    """
+
+    async def post(self, request):
+        return await sync_to_async(post_transfer)(request, self.account)
@@ -0,0 +1,23 @@
+from django.urls import path
+
+from .api import BalanceView, TransactionListView, TransferView
+
+app_name = "api"
+
+urlpatterns = [
+    path(
+        "accounts/<int:account_no>/balance",
+        BalanceView.as_view(),
+        name="account_balance",
+    ),
+    path(
+        "accounts/<int:account_no>/transactions",
+        TransactionListView.as_view(),
+        name="account_transactions",
+    ),
+    path(
+        "accounts/<int:account_no>/transfers",
+        TransferView.as_view(),
+        name="account_transfers",
+    ),
+]
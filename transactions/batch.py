@@ -0,0 +1,289 @@
+"""
+Bulk posting of credit/debit files (payroll, ACH and similar).
+
+Rows are streamed from CSV or JSON-lines input and processed in chunks.
+Each chunk is one database transaction: the touched accounts are locked
+with a single query, every row is validated against the same rules as
+``DepositForm``/``WithdrawForm``, the accepted rows are written with one
+``bulk_create`` and the balances are moved with set-based ``UPDATE``s.
+Memory use is bounded by the chunk size, not by the file size.
+"""
+import csv
+import json
+import time
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import UserBankAccount
+from accounts.search import MAX_ACCOUNT_NO
+
+from . import ledger, limits
+from .constants import DEPOSIT, WITHDRAWAL
+from .models import Transaction
+
+DEFAULT_CHUNK_SIZE = 5000
+
+TRANSACTION_TYPES = {
+    'deposit': DEPOSIT,
+    'credit': DEPOSIT,
+    str(DEPOSIT): DEPOSIT,
+    'withdrawal': WITHDRAWAL,
+    'debit': WITHDRAWAL,
+    str(WITHDRAWAL): WITHDRAWAL,
+}
+
+# Largest amount the ledger's DECIMAL(12, 2) amount column holds.
+MAXIMUM_AMOUNT = Decimal('9999999999.99')
+
+Reject = namedtuple('Reject', ['line', 'account_no', 'reason'])
+
+
+class BatchResult:
+
+    def __init__(self):
+        self.posted = 0
+        self.rejected = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        if not self.elapsed:
+            return 0.0
+        return (self.posted + self.rejected) / self.elapsed
+
+
+# -------------------------
+# INPUT
+# -------------------------
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    for line, record in enumerate(reader, start=2):
+        yield line, record
+
+
+def read_jsonl(stream):
+    """
+    Yield the records of a JSON-lines stream. A line that is not valid JSON
+    is yielded as ``None`` and rejected like any other malformed record.
+    """
+    for line, text in enumerate(stream, start=1):
+        text = text.strip()
+        if text:
+            try:
+                record = json.loads(text)
+            except ValueError:
+                record = None
+            yield line, record
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+def _field(record, name):
+    return record.get(name) if isinstance(record, dict) else None
+
+
+def _account_no(value):
+    """
+    An account number from a JSON integer or a string of digits. Floats
+    and booleans are refused rather than truncated.
+    """
+    if isinstance(value, str):
+        value = value.strip()
+        value = int(value) if value.isdecimal() else None
+    elif isinstance(value, bool) or not isinstance(value, int):
+        value = None
+    if value is None or not 0 < value <= MAX_ACCOUNT_NO:
+        return None
+    return value
+
+
+def _amount(value):
+    """
+    A finite amount the ledger can hold, in whole cents. Sub-cent amounts
+    are refused rather than rounded, as the forms do.
+    """
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return None
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        return None
+    if not amount.is_finite() or abs(amount) > MAXIMUM_AMOUNT:
+        return None
+    if amount != amount.quantize(ledger.CENT):
+        return None
+    return amount.quantize(ledger.CENT)
+
+
+def _parse(record):
+    """
+    Return ``(account_no, amount, transaction_type)`` or a reject reason.
+    """
+    if not isinstance(record, dict):
+        return 'Malformed record'
+
+    account_no = _account_no(record.get('account_no'))
+    if account_no is None:
+        return 'Invalid account number'
+
+    amount = _amount(record.get('amount'))
+    if amount is None:
+        return 'Invalid amount'
+
+    transaction_type = TRANSACTION_TYPES.get(
+        str(record.get('transaction_type', '')).strip().lower()
+    )
+    if transaction_type is None:
+        return 'Invalid transaction type'
+
+    if transaction_type == DEPOSIT:
+        if amount < settings.MINIMUM_DEPOSIT_AMOUNT:
+            return (
+                f'You need to deposit at least '
+                f'{settings.MINIMUM_DEPOSIT_AMOUNT} $'
+            )
+    elif amount < settings.MINIMUM_WITHDRAWAL_AMOUNT:
+        return (
+            f'You can withdraw at least '
+            f'{settings.MINIMUM_WITHDRAWAL_AMOUNT} $'
+        )
+
+    return account_no, amount, transaction_type
+
+
+# -------------------------
+# POSTING
+# -------------------------
+def _withdrawn_this_hour(account):
+    if account[7] is None:
+        account[7] = limits.withdrawn_this_hour(account[0])
+    return account[7]
+
+
+def _post_chunk(rows, result, on_reject, using):
+    parsed = []
+    for line, record in rows:
+        value = _parse(record)
+        if isinstance(value, str):
+            result.rejected += 1
+            on_reject(Reject(line, _field(record, 'account_no'), value))
+        else:
+            parsed.append((line, *value))
+
+    if not parsed:
+        return
+
+    today = timezone.localdate()
+    with transaction.atomic(using=using):
+        # account_no -> [pk, balance, maximum_withdrawal_amount, user_id,
+        #                maximum_daily_withdrawal_amount, withdrawn_today,
+        #                maximum_hourly_withdrawal_amount,
+        #                withdrawn_this_hour (loaded when first needed)]
+        accounts = {}
+        heads = {}
+        for (account_no, *values, daily_debit, counters_date,
+             ledger_sequence, ledger_head_hash, hourly_limit) in (
+            UserBankAccount.objects.using(using)
+            .select_for_update(of=('self',))
+            .filter(account_no__in={row[1] for row in parsed})
+            .order_by('pk')
+            .values_list(
+                'account_no',
+                'pk',
+                'balance',
+                'account_type__maximum_withdrawal_amount',
+                'user_id',
+                'account_type__maximum_daily_withdrawal_amount',
+                'daily_debit',
+                'counters_date',
+                'ledger_sequence',
+                'ledger_head_hash',
+                'account_type__maximum_hourly_withdrawal_amount',
+            )
+        ):
+            if counters_date is None or counters_date < today:
+                daily_debit = ledger.ZERO
+            accounts[account_no] = [*values, daily_debit, hourly_limit, None]
+            heads[values[0]] = (ledger_sequence, ledger_head_hash)
+
+        entries = []
+        user_ids = set()
+        for line, account_no, amount, transaction_type in parsed:
+            account = accounts.get(account_no)
+            if account is None:
+                reason = 'Account not found'
+            elif transaction_type == WITHDRAWAL and amount > account[2]:
+                reason = f'You can withdraw at most {account[2]} $'
+            elif (
+                transaction_type == WITHDRAWAL
+                and account[4] is not None
+                and amount + account[5] > account[4]
+            ):
+                reason = f'You can withdraw at most {account[4]} $ per day'
+            elif (
+                transaction_type == WITHDRAWAL
+                and account[6] is not None
+                and amount + _withdrawn_this_hour(account) > account[6]
+            ):
+                reason = f'You can withdraw at most {account[6]} $ per hour'
+            elif transaction_type == WITHDRAWAL and amount > account[1]:
+                reason = 'Insufficient balance'
+            else:
+                reason = None
+
+            if reason:
+                result.rejected += 1
+                on_reject(Reject(line, account_no, reason))
+                continue
+
+            account[1] += ledger.signed_amount(amount, transaction_type)
+            if transaction_type == WITHDRAWAL:
+                account[5] += amount
+                if account[7] is not None:
+                    account[7] += amount
+            user_ids.add(account[3])
+            entries.append(Transaction(
+                account_id=account[0],
+                amount=amount,
+                balance_after_transaction=account[1],
+                transaction_type=transaction_type,
+            ))
+
+        ledger.apply_entries(entries, using, heads)
+        ledger.record(entries, using, user_ids)
+
+    result.posted += len(entries)
+
+
+def post_batch(rows, chunk_size=DEFAULT_CHUNK_SIZE, on_reject=None):
+    """
+    Post an iterable of ``(line, record)`` pairs, as produced by
+    ``read_csv``/``read_jsonl``. Each record needs ``account_no``,
+    ``amount`` and ``transaction_type`` keys.
+
+    Rejected rows are passed to ``on_reject`` as they are found rather than
+    collected, so arbitrarily large files can be processed.
+    """
+    result = BatchResult()
+    on_reject = on_reject or (lambda reject: None)
+    using = ledger.posting_db()
+    rows = iter(rows)
+    started = time.perf_counter()
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        _post_chunk(chunk, result, on_reject, using)
+
+    result.elapsed = time.perf_counter() - started
+    return result
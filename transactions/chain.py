@@ -0,0 +1,175 @@
+"""
+Tamper evidence for the ledger.
+
+Every row the posting engine writes carries its position in the account's
+ledger (``sequence``, starting at 1) and ``entry_hash``, a SHA-256 over the
+row's contents and the hash of the row before it. The account keeps the
+head of its chain in ``ledger_sequence``/``ledger_head_hash``, advanced in
+the same transaction as the row. Editing, deleting or reordering any row
+breaks the chain from that row on.
+
+``verify`` walks the chains and records how far each account was verified
+in ``LedgerCheckpoint``. Later runs start from the checkpoint, so history
+that was verified once is never read or hashed again; ``full`` ignores the
+checkpoints and starts over, from the last archived link for accounts with
+archived rows. Rows posted before the chain was introduced have no
+sequence and are not covered.
+"""
+import datetime
+import hashlib
+from collections import namedtuple
+
+from django.db.models import F, Q
+
+from .models import ArchivedLedger, LedgerCheckpoint, Transaction
+
+GENESIS = ''
+DEFAULT_CHUNK_SIZE = 5000
+
+Break = namedtuple('Break', ['account_no', 'sequence', 'reason'])
+
+
+def digest(previous, account_id, sequence, transaction_type, amount,
+           balance_after, timestamp):
+    timestamp = timestamp.astimezone(datetime.timezone.utc)
+    message = '|'.join([
+        previous,
+        str(account_id),
+        str(sequence),
+        str(transaction_type),
+        f'{amount:.2f}',
+        f'{balance_after:.2f}',
+        timestamp.isoformat(timespec='microseconds'),
+    ])
+    return hashlib.sha256(message.encode()).hexdigest()
+
+
+def seal(entry, sequence, previous):
+    """
+    Give ``entry`` the next position in its account's chain after the row
+    hashed ``previous`` and return its hash.
+    """
+    entry.sequence = sequence
+    entry.entry_hash = digest(
+        previous,
+        entry.account_id,
+        sequence,
+        entry.transaction_type,
+        entry.amount,
+        entry.balance_after_transaction,
+        entry.timestamp,
+    )
+    return entry.entry_hash
+
+
+# -------------------------
+# VERIFICATION
+# -------------------------
+def verify_account(account, checkpoint, using, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Verify ``account``'s chain from ``checkpoint`` up to the head read with
+    the account, saving the checkpoint after every chunk of rows. Return
+    the number of rows verified and a ``Break``, or ``None`` if the chain
+    is intact.
+    """
+    head = account.ledger_sequence
+    rows = Transaction.objects.using(using).filter(
+        account_id=account.pk,
+        sequence__lte=head,
+    ).order_by('sequence').values_list(
+        'sequence',
+        'transaction_type',
+        'amount',
+        'balance_after_transaction',
+        'timestamp',
+        'entry_hash',
+    )
+
+    verified = 0
+    balance = None
+    while checkpoint.sequence < head:
+        sequence, previous = checkpoint.sequence, checkpoint.entry_hash
+        found = None
+        chunk = rows.filter(sequence__gt=sequence)[:chunk_size]
+        for (next_sequence, transaction_type, amount, balance_after,
+             timestamp, stored) in chunk:
+            if next_sequence != sequence + 1:
+                break
+            expected = digest(
+                previous, account.pk, next_sequence, transaction_type,
+                amount, balance_after, timestamp,
+            )
+            if stored != expected:
+                found = Break(
+                    account.account_no, next_sequence, 'Hash mismatch'
+                )
+                break
+            sequence, previous = next_sequence, expected
+            balance = balance_after
+
+        if sequence == checkpoint.sequence and found is None:
+            found = Break(account.account_no, sequence + 1, 'Row is missing')
+        if sequence > checkpoint.sequence:
+            verified += sequence - checkpoint.sequence
+            checkpoint.sequence, checkpoint.entry_hash = sequence, previous
+            checkpoint.save(using=using)
+        if found:
+            return verified, found
+
+    if checkpoint.entry_hash != account.ledger_head_hash:
+        return verified, Break(account.account_no, head, 'Head hash mismatch')
+    if verified and balance != account.balance:
+        return verified, Break(
+            account.account_no, head, 'Balance does not match the ledger'
+        )
+    return verified, None
+
+
+def verify(accounts, using, full=False, chunk_size=1000):
+    """
+    Verify the chains of ``accounts`` (a ``UserBankAccount`` queryset) that
+    grew since their checkpoint. Return ``(accounts, rows, breaks)``.
+    """
+    queryset = accounts.using(using).select_related(
+        'ledger_checkpoint', 'archived_ledger'
+    ).order_by('pk')
+    if full:
+        queryset = queryset.filter(ledger_sequence__gt=0)
+    else:
+        queryset = queryset.filter(
+            Q(ledger_checkpoint__isnull=True, ledger_sequence__gt=0)
+            | Q(ledger_sequence__gt=F('ledger_checkpoint__sequence'))
+        )
+
+    checked = rows = 0
+    breaks = []
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            break
+        for account in chunk:
+            try:
+                checkpoint = account.ledger_checkpoint
+            except LedgerCheckpoint.DoesNotExist:
+                checkpoint = LedgerCheckpoint(account=account)
+            if full or checkpoint.pk is None:
+                checkpoint.sequence = 0
+                checkpoint.entry_hash = GENESIS
+                try:
+                    archived = account.archived_ledger
+                except ArchivedLedger.DoesNotExist:
+                    pass
+                else:
+                    if archived.sequence is not None:
+                        checkpoint.sequence = archived.sequence
+                        checkpoint.entry_hash = archived.entry_hash
+
+            verified, found = verify_account(account, checkpoint, using)
+            checked += 1
+            rows += verified
+            if found:
+                breaks.append(found)
+        last_pk = chunk[-1].pk
+
+    return checked, rows, breaks
@@ -1,9 +1,16 @@
 DEPOSIT = 1
 WITHDRAWAL = 2
 INTEREST = 3
+TRANSFER_IN = 4
+TRANSFER_OUT = 5
 
 TRANSACTION_TYPE_CHOICES = (
     (DEPOSIT, 'Deposit'),
     (WITHDRAWAL, 'Withdrawal'),
     (INTEREST, 'Interest'),
+    (TRANSFER_IN, 'Transfer In'),
+    (TRANSFER_OUT, 'Transfer Out'),
 )
+
+CREDIT_TRANSACTION_TYPES = (DEPOSIT, INTEREST, TRANSFER_IN)
+DEBIT_TRANSACTION_TYPES = (WITHDRAWAL, TRANSFER_OUT)
@@ -2,7 +2,9 @@ import datetime
 
 from django import forms
 from django.conf import settings
+from django.utils import timezone
 
+from . import ledger, limits
 from .models import Transaction
 
 
@@ -23,9 +25,12 @@ class TransactionForm(forms.ModelForm):
         self.fields['transaction_type'].widget = forms.HiddenInput()
 
     def save(self, commit=True):
-        self.instance.account = self.account
-        self.instance.balance_after_transaction = self.account.balance
-        return super().save()
+        self.instance = ledger.post(
+            self.account,
+            self.cleaned_data['amount'],
+            self.cleaned_data['transaction_type'],
+        )
+        return self.instance
 
 
 class DepositForm(TransactionForm):
@@ -64,6 +69,11 @@ class WithdrawForm(TransactionForm):
                 f'You can withdraw at most {max_withdraw_amount} $'
             )
 
+        try:
+            limits.check_withdrawal(account, amount)
+        except limits.LimitExceeded as e:
+            raise forms.ValidationError(str(e))
+
         if amount > balance:
             raise forms.ValidationError(
                 f'You have {balance} $ in your account. '
@@ -77,23 +87,38 @@ class TransactionDateRangeForm(forms.Form):
     daterange = forms.CharField(required=False)
 
     def clean_daterange(self):
+        """
+        Return the selected dates as a half-open ``[start, end)`` pair of
+        aware datetimes, so the filter compares the raw ``timestamp``
+        column and can use the index instead of casting every row to a date.
+        An empty value means no filter.
+        """
         daterange = self.cleaned_data.get("daterange")
-        print(daterange)
+        if not daterange:
+            return None
 
         try:
             daterange = daterange.split(' - ')
-            print(daterange)
             if len(daterange) == 2:
-                for date in daterange:
+                start, end = (
                     datetime.datetime.strptime(date, '%Y-%m-%d')
-                return daterange
+                    for date in daterange
+                )
+                return (
+                    timezone.make_aware(start),
+                    timezone.make_aware(end + datetime.timedelta(days=1)),
+                )
             else:
                 raise forms.ValidationError("Please select a date range.")
         except (ValueError, AttributeError):
             raise forms.ValidationError("Invalid date range")
+
+
 class FundTransferForm(forms.Form):
     to_account = forms.IntegerField(label="To Account Number")
-    amount = forms.DecimalField(max_digits=12, decimal_places=2)
+    amount = forms.DecimalField(
+        max_digits=12, decimal_places=2, min_value=ledger.CENT
+    )
 
     def __init__(self, *args, **kwargs):
         self.from_account = kwargs.pop('account')
@@ -102,6 +127,14 @@ class FundTransferForm(forms.Form):
     def clean(self):
         cleaned = super().clean()
         amount = cleaned.get('amount')
+        if amount is None:
+            return cleaned
+
+        # The outgoing leg is a debit, limited like a withdrawal.
+        try:
+            limits.check_withdrawal(self.from_account, amount)
+        except limits.LimitExceeded as e:
+            raise forms.ValidationError(str(e))
 
         if amount > self.from_account.balance:
             raise forms.ValidationError("Insufficient balance")
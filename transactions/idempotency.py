@@ -0,0 +1,237 @@
+"""
+Idempotency keys for the posting endpoints.
+
+A client (or a load balancer retrying on its behalf) sends the same
+``Idempotency-Key`` header, or the ``idempotency_key`` hidden form field,
+with every attempt of one request. The first attempt reserves the key in
+the same database transaction as the posting, so concurrent duplicates wait
+on the unique index and then replay the stored result instead of posting
+again. Finished results are also kept in a small per-process LRU so hot
+retries never reach the database; entries there expire with the key,
+``IDEMPOTENCY_KEY_TTL`` seconds after it was reserved.
+
+Only final outcomes are stored: redirects after a successful form post and
+``201 Created`` API responses. Anything else (a form re-rendered with
+errors, a server error) releases the key so the request can be retried.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib import messages
+from django.db import IntegrityError, router, transaction
+from django.http import HttpResponse, HttpResponseRedirect
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+FORM_FIELD = 'idempotency_key'
+
+
+class LRUCache:
+    """
+    At most ``maxsize`` entries, each dropped ``ttl`` seconds after it was
+    set unless ``set`` is given a shorter ``timeout``.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        if timeout is None:
+            timeout = self.ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+_recent = LRUCache(settings.IDEMPOTENCY_LRU_SIZE, settings.IDEMPOTENCY_KEY_TTL)
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+FORM_CONTENT_TYPES = (
+    'application/x-www-form-urlencoded',
+    'multipart/form-data',
+)
+
+
+def fingerprint(request):
+    if request.content_type in FORM_CONTENT_TYPES:
+        payload = urlencode(sorted(
+            (name, value)
+            for name, values in request.POST.lists()
+            if name not in ('csrfmiddlewaretoken', FORM_FIELD)
+            for value in values
+        )).encode()
+    else:
+        payload = request.body
+    return hashlib.sha256(request.path.encode() + b'\0' + payload).hexdigest()
+
+
+def _is_final(response):
+    return response.status_code == 201 or 300 <= response.status_code < 400
+
+
+def _result(record):
+    return {
+        'request_hash': record.request_hash,
+        'status': record.response_status,
+        'location': record.response_location,
+        'content_type': record.response_content_type,
+        'body': record.response_body,
+    }
+
+
+def _remaining(record):
+    """
+    Seconds until ``record`` is older than ``IDEMPOTENCY_KEY_TTL``.
+    """
+    age = timezone.now() - record.created_at
+    return settings.IDEMPOTENCY_KEY_TTL - age.total_seconds()
+
+
+def _replay(request, result, request_hash):
+    if result['request_hash'] != request_hash:
+        return HttpResponse(
+            f'{HEADER} was already used for a different request',
+            status=422,
+        )
+
+    if result['location']:
+        messages.info(request, 'This request was already processed.')
+        response = HttpResponseRedirect(result['location'])
+        response.status_code = result['status']
+    else:
+        response = HttpResponse(
+            result['body'],
+            status=result['status'],
+            content_type=result['content_type'] or None,
+        )
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view_func):
+    """
+    Make a posting view safe to retry with an idempotency key. Requests
+    without a key, and non-POST requests, are passed through untouched.
+    """
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None and request.method == 'POST':
+            key = request.POST.get(FORM_FIELD)
+        if (
+            not key
+            or request.method != 'POST'
+            or not request.user.is_authenticated
+        ):
+            return view_func(request, *args, **kwargs)
+        if len(key) > 255:
+            return HttpResponse(f'{HEADER} is too long', status=400)
+
+        request_hash = fingerprint(request)
+        cache_key = (request.user.pk, key)
+        result = _recent.get(cache_key)
+        if result is not None:
+            return _replay(request, result, request_hash)
+
+        using = router.db_for_write(IdempotencyKey)
+        with transaction.atomic(using=using):
+            try:
+                with transaction.atomic(using=using):
+                    record = IdempotencyKey.objects.using(using).create(
+                        user=request.user,
+                        key=key,
+                        request_hash=request_hash,
+                    )
+            except IntegrityError:
+                # Either an earlier attempt finished, or a concurrent one
+                # held the key until it committed.
+                record = IdempotencyKey.objects.using(using).get(
+                    user=request.user, key=key
+                )
+                if record.response_status is None:
+                    return HttpResponse(
+                        'This request is still being processed',
+                        status=409,
+                    )
+                result = _result(record)
+                _recent.set(cache_key, result, _remaining(record))
+                return _replay(request, result, request_hash)
+
+            response = view_func(request, *args, **kwargs)
+
+            if not _is_final(response):
+                record.delete()
+                return response
+
+            record.response_status = response.status_code
+            if response.has_header('Location'):
+                record.response_location = response['Location']
+            else:
+                record.response_content_type = response.get(
+                    'Content-Type', ''
+                )
+                record.response_body = response.content.decode()
+            record.save(update_fields=[
+                'response_status',
+                'response_location',
+                'response_content_type',
+                'response_body',
+            ])
+            result = _result(record)
+            transaction.on_commit(
+                lambda: _recent.set(cache_key, result, _remaining(record)),
+                using=using,
+            )
+
+        return response
+
+    return wrapper
+
+
+def purge_expired(batch_size=10000):
+    """
+    Delete keys older than ``IDEMPOTENCY_KEY_TTL`` seconds in batches, so
+    the purge never holds long locks. Returns the number of rows deleted.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    deleted = 0
+    while True:
+        pks = list(
+            IdempotencyKey.objects.filter(created_at__lt=cutoff)
+            .order_by('created_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=pks).delete()[0]
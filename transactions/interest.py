@@ -0,0 +1,117 @@
+"""
+Periodic interest accrual.
+
+Accounts of one ``BankAccountType`` are processed in primary key order, a
+chunk per database transaction: one query locks the chunk and reads the
+balances, the interest rows are written with one ``bulk_create`` and all
+balances move with one ``UPDATE``. ``UserBankAccount.interest_accrued_until``
+is set in that same statement, so rerunning a period skips every account it
+already credited and a crashed run can simply be started again.
+
+Interest is paid on the closing balance of the period's last day, read from
+the daily snapshots, so a late or catch-up run ignores what was posted
+after the period. Accounts with history from before the snapshots need
+``backfill_snapshots`` first.
+"""
+import calendar
+import datetime
+from decimal import ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from accounts.models import UserBankAccount
+
+from . import ledger
+from .constants import INTEREST
+from .models import DailyBalanceSnapshot, Transaction
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def period_end(year, month):
+    return datetime.date(year, month, calendar.monthrange(year, month)[1])
+
+
+def accrue_interest(account_type, until, chunk_size=DEFAULT_CHUNK_SIZE,
+                    accounts=None):
+    """
+    Credit one compounding period of interest, ending on ``until``, to the
+    accounts of ``account_type``. ``accounts`` optionally narrows the run to
+    a ``UserBankAccount`` queryset. Returns ``(accounts, total_interest)``.
+    """
+    if not account_type.annual_interest_rate:
+        return 0, 0
+
+    rate = (
+        account_type.annual_interest_rate
+        / 100
+        / account_type.interest_calculation_per_year
+    )
+    using = ledger.posting_db()
+    queryset = accounts if accounts is not None else UserBankAccount.objects
+    queryset = queryset.using(using).annotate(
+        period_balance=Coalesce(
+            Subquery(
+                DailyBalanceSnapshot.objects.filter(
+                    account=OuterRef('pk'), date__lte=until
+                ).order_by('-date').values('closing_balance')[:1]
+            ),
+            Value(ledger.ZERO),
+        ),
+    ).filter(
+        Q(interest_accrued_until__isnull=True)
+        | Q(interest_accrued_until__lt=until),
+        account_type=account_type,
+        period_balance__gt=0,
+    ).order_by('pk')
+
+    credited = 0
+    total = 0
+    last_pk = 0
+    while True:
+        with transaction.atomic(using=using):
+            rows = list(
+                queryset.select_for_update()
+                .filter(pk__gt=last_pk)
+                .values_list(
+                    'pk',
+                    'balance',
+                    'period_balance',
+                    'user_id',
+                    'ledger_sequence',
+                    'ledger_head_hash',
+                )[:chunk_size]
+            )
+            if not rows:
+                break
+
+            entries = []
+            for pk, balance, period_balance, *_ in rows:
+                interest = (period_balance * rate).quantize(
+                    ledger.CENT, rounding=ROUND_HALF_UP
+                )
+                if interest:
+                    entries.append(Transaction(
+                        account_id=pk,
+                        amount=interest,
+                        balance_after_transaction=balance + interest,
+                        transaction_type=INTEREST,
+                    ))
+                    total += interest
+
+            # Accounts whose interest rounds to zero are marked too.
+            ledger.apply_entries(
+                entries,
+                using,
+                {row[0]: row[4:] for row in rows},
+                accounts=[row[0] for row in rows],
+                interest_accrued_until=until,
+            )
+            ledger.record(entries, using, [row[3] for row in rows])
+
+        credited += len(entries)
+        last_pk = rows[-1][0]
+
+    return credited, total
@@ -0,0 +1,105 @@
+"""
+End-of-day jobs for ``core.runner``. Each one processes the accounts of a
+single ``account_no`` partition.
+"""
+import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Min
+from django.utils import timezone
+
+from accounts.models import BankAccountType
+
+from . import (
+    chain,
+    interest,
+    ledger,
+    reconciliation,
+    snapshots,
+    statements,
+)
+from .models import Transaction
+
+
+def _month(period):
+    year, month = map(int, period.split('-'))
+    return year, month
+
+
+def accrue_interest(accounts, period):
+    until = interest.period_end(*_month(period))
+    result = {'accounts': 0, 'interest': '0'}
+    total = 0
+    for account_type in BankAccountType.objects.filter(
+        annual_interest_rate__gt=0
+    ):
+        if account_type.is_interest_month(until.month):
+            credited, amount = interest.accrue_interest(
+                account_type, until, accounts=accounts
+            )
+            result['accounts'] += credited
+            total += amount
+    result['interest'] = str(total)
+    return result
+
+
+def rollup_snapshots(accounts, before=None):
+    before = (
+        datetime.date.fromisoformat(before) if before
+        else timezone.localdate()
+    )
+    return {
+        'snapshots': snapshots.rebuild(
+            Transaction.objects.filter(
+                account__in=accounts,
+                timestamp__lt=timezone.make_aware(
+                    datetime.datetime.combine(before, datetime.time.min)
+                ),
+            )
+        ),
+    }
+
+
+def generate_statements(accounts, period):
+    year, month = _month(period)
+    start = timezone.make_aware(datetime.datetime(year, month, 1))
+    end = timezone.make_aware(
+        datetime.datetime.combine(
+            interest.period_end(year, month) + datetime.timedelta(days=1),
+            datetime.time.min,
+        )
+    )
+    return {
+        'statements': statements.write_statements(
+            Transaction.objects.filter(
+                account__in=accounts,
+                timestamp__gte=start,
+                timestamp__lt=end,
+            ),
+            settings.STATEMENTS_DIR / period,
+        ),
+    }
+
+
+def verify_ledger(accounts, full=False):
+    checked, rows, breaks = chain.verify(
+        accounts, ledger.posting_db(), full=full
+    )
+    return {
+        'accounts': checked,
+        'rows': rows,
+        'breaks': [list(found) for found in breaks],
+    }
+
+
+def reconcile_ledger(accounts, report_dir):
+    # Named after the partition's first account, so a rerun replaces it.
+    first = accounts.aggregate(first=Min('account_no'))['first']
+    path = Path(report_dir) / f'{first}.csv'
+    return {
+        'discrepancies': reconciliation.write_report(
+            reconciliation.reconcile(accounts, ledger.posting_db()), path
+        ),
+        'report': str(path) if path.exists() else None,
+    }
@@ -0,0 +1,46 @@
+"""
+Queries over journal entries, the headers that tie the legs of a transfer
+together.
+"""
+import datetime
+
+from django.db.models import Case, F, Sum, When
+from django.utils import timezone
+
+from .constants import CREDIT_TRANSACTION_TYPES
+from .models import Transaction
+
+# A row's amount, positive for credits and negative for debits.
+SIGNED_AMOUNT = Case(
+    When(transaction_type__in=CREDIT_TRANSACTION_TYPES, then=F('amount')),
+    default=-F('amount'),
+)
+
+
+def legs(journal_entry_id, using=None):
+    """
+    The legs of a journal entry with their header and accounts, fetched
+    with one query on the ``journal_entry`` index.
+    """
+    return Transaction.objects.using(using).filter(
+        journal_entry_id=journal_entry_id
+    ).select_related('journal_entry', 'account').order_by('pk')
+
+
+def unbalanced(date, using=None):
+    """
+    Return ``{journal_entry_id: total}`` for the entries posted on ``date``
+    whose legs do not sum to zero, with one aggregate query over that day's
+    legs.
+    """
+    start = timezone.make_aware(
+        datetime.datetime.combine(date, datetime.time.min)
+    )
+    rows = Transaction.objects.using(using).filter(
+        journal_entry__isnull=False,
+        timestamp__gte=start,
+        timestamp__lt=start + datetime.timedelta(days=1),
+    ).values('journal_entry_id').annotate(
+        total=Sum(SIGNED_AMOUNT)
+    ).exclude(total=0).order_by().values_list('journal_entry_id', 'total')
+    return dict(rows)
@@ -0,0 +1,338 @@
+"""
+Posting engine for deposits, withdrawals and transfers.
+
+Every movement is applied as one conditional ``UPDATE`` of the account
+balance (``balance = balance + delta``, guarded against overdraft) followed
+by the ledger insert, both inside a single database transaction. Balances
+are never read into Python and written back, so concurrent postings to the
+same account queue on the row lock for the length of one statement instead
+of overwriting each other.
+
+The same statement maintains the account's running aggregates (lifetime,
+daily and monthly credit/debit totals, transaction count and time of the
+last transaction). The daily and monthly totals restart when the stored
+``counters_date`` falls in an earlier day or month than the posting.
+
+It also advances the account's ledger sequence and hands back the head of
+its hash chain, so the new row can be chained to the previous one (see
+``transactions.chain``) without reading the ledger.
+"""
+from decimal import Decimal
+
+from django.db import connections, models, router, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from accounts.cache import invalidate_accounts
+from accounts.models import UserBankAccount
+
+from . import chain, limits, snapshots
+from .constants import (
+    CREDIT_TRANSACTION_TYPES,
+    DEPOSIT,
+    TRANSFER_IN,
+    TRANSFER_OUT,
+    WITHDRAWAL,
+)
+from .models import JournalEntry, Transaction
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+# Accounts per set-based UPDATE, to stay under the bind parameter limits.
+UPDATE_BATCH_SIZE = 500
+
+
+class PostingError(Exception):
+    pass
+
+
+class InsufficientFunds(PostingError):
+    pass
+
+
+def posting_db():
+    return router.db_for_write(UserBankAccount)
+
+
+def signed_amount(amount, transaction_type):
+    if transaction_type in CREDIT_TRANSACTION_TYPES:
+        return amount
+    return -amount
+
+
+def _to_decimal(value):
+    if isinstance(value, Decimal):
+        return value
+    # SQLite hands numeric columns back as float/int.
+    return Decimal(str(value)).quantize(CENT)
+
+
+def _split(amount, transaction_type):
+    if transaction_type in CREDIT_TRANSACTION_TYPES:
+        return amount, ZERO
+    return ZERO, amount
+
+
+def _apply(account_id, amount, transaction_type, now, using):
+    """
+    Post one movement to the account balance and its running aggregates in
+    one statement. Return the new balance, the row's ledger sequence and
+    the hash of the previous row. Debits only match rows that stay
+    non-negative, so an overdraft simply updates nothing.
+    """
+    connection = connections[using]
+    ops = connection.ops
+    qn = ops.quote_name
+    balance = qn('balance')
+    counters_date = qn('counters_date')
+    credit, debit = _split(amount, transaction_type)
+    delta = credit - debit
+    today = timezone.localdate(now)
+
+    def rolling(field, start, value):
+        field = qn(field)
+        return (
+            f'{field} = CASE WHEN {counters_date} >= %s THEN {field} '
+            f'ELSE 0 END + %s',
+            [ops.adapt_datefield_value(start), value],
+        )
+
+    assignments = [
+        (f'{balance} = {balance} + %s', [delta]),
+        (f'{qn("total_credit")} = {qn("total_credit")} + %s', [credit]),
+        (f'{qn("total_debit")} = {qn("total_debit")} + %s', [debit]),
+        rolling('daily_credit', today, credit),
+        rolling('daily_debit', today, debit),
+        rolling('monthly_credit', today.replace(day=1), credit),
+        rolling('monthly_debit', today.replace(day=1), debit),
+        (f'{qn("transaction_count")} = {qn("transaction_count")} + 1', []),
+        (
+            f'{qn("last_transaction_at")} = %s',
+            [ops.adapt_datetimefield_value(now)],
+        ),
+        (f'{counters_date} = %s', [ops.adapt_datefield_value(today)]),
+        (f'{qn("ledger_sequence")} = {qn("ledger_sequence")} + 1', []),
+    ]
+    sql = (
+        f'UPDATE {qn(UserBankAccount._meta.db_table)} '
+        f'SET {", ".join(sql for sql, _ in assignments)} '
+        f'WHERE {qn("id")} = %s'
+    )
+    params = [param for _, values in assignments for param in values]
+    params.append(account_id)
+    if delta < 0:
+        sql += f' AND {balance} + %s >= 0'
+        params.append(delta)
+    sql += (
+        f' RETURNING {balance}, {qn("ledger_sequence")}, '
+        f'{qn("ledger_head_hash")}'
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+
+    if row is None:
+        raise InsufficientFunds(
+            'You can not withdraw more than your account balance'
+        )
+    return _to_decimal(row[0]), row[1], row[2]
+
+
+def _advance_heads(entries, using):
+    """
+    Store the hashes of ``entries``, one per account, as their accounts'
+    chain heads.
+    """
+    heads = {entry.account_id: entry.entry_hash for entry in entries}
+    UserBankAccount.objects.using(using).filter(pk__in=heads).update(
+        ledger_head_hash=Case(
+            *[When(pk=pk, then=Value(head)) for pk, head in heads.items()],
+            output_field=models.CharField(),
+        ),
+    )
+
+
+def apply_entries(entries, using, heads, accounts=(), **fields):
+    """
+    Chain many ledger rows and post them to their accounts' balances and
+    running aggregates with set-based ``UPDATE`` statements, one per
+    ``UPDATE_BATCH_SIZE`` accounts.
+
+    The caller is expected to hold the row locks and to have checked the
+    resulting balances already, as the batch paths do. ``heads`` maps the
+    primary key of every account in ``entries`` to its
+    ``(ledger_sequence, ledger_head_hash)`` as read under the lock. Extra
+    ``fields`` are set on every account touched by ``entries`` and on the
+    primary keys in ``accounts`` in the same statement.
+    """
+    empty = [ZERO, ZERO, 0, None, None, None]
+    totals = {pk: list(empty) for pk in accounts}
+    for entry in entries:
+        total = totals.setdefault(entry.account_id, list(empty))
+        sequence, head = total[4:] if total[4] else heads[entry.account_id]
+        credit, debit = _split(entry.amount, entry.transaction_type)
+        total[0] += credit
+        total[1] += debit
+        total[2] += 1
+        total[3] = max(total[3] or entry.timestamp, entry.timestamp)
+        total[5] = chain.seal(entry, sequence + 1, head)
+        total[4] = sequence + 1
+    if not totals:
+        return
+
+    today = timezone.localdate()
+    month_start = today.replace(day=1)
+    money = models.DecimalField(max_digits=14, decimal_places=2)
+
+    def case(batch, index, default, output_field):
+        # Accounts without a value for this column keep ``default``.
+        return Case(
+            *[
+                When(pk=pk, then=Value(total[index]))
+                for pk, total in batch
+                if total[index]
+            ],
+            default=default,
+            output_field=output_field,
+        )
+
+    def rolling(field, start, value):
+        return Case(
+            When(counters_date__gte=start, then=F(field)),
+            default=Value(ZERO),
+            output_field=money,
+        ) + value
+
+    totals = list(totals.items())
+    for start in range(0, len(totals), UPDATE_BATCH_SIZE):
+        batch = totals[start:start + UPDATE_BATCH_SIZE]
+        credit = case(batch, 0, Value(ZERO), money)
+        debit = case(batch, 1, Value(ZERO), money)
+        UserBankAccount.objects.using(using).filter(
+            pk__in=[pk for pk, _ in batch]
+        ).update(
+            balance=F('balance') + credit - debit,
+            total_credit=F('total_credit') + credit,
+            total_debit=F('total_debit') + debit,
+            daily_credit=rolling('daily_credit', today, credit),
+            daily_debit=rolling('daily_debit', today, debit),
+            monthly_credit=rolling('monthly_credit', month_start, credit),
+            monthly_debit=rolling('monthly_debit', month_start, debit),
+            transaction_count=F('transaction_count') + case(
+                batch, 2, Value(0), models.PositiveIntegerField()
+            ),
+            last_transaction_at=case(
+                batch, 3, F('last_transaction_at'), models.DateTimeField()
+            ),
+            counters_date=Value(today),
+            ledger_sequence=case(
+                batch, 4, F('ledger_sequence'),
+                models.PositiveBigIntegerField(),
+            ),
+            ledger_head_hash=case(
+                batch, 5, F('ledger_head_hash'), models.CharField()
+            ),
+            **fields,
+        )
+
+
+def record(entries, using, user_ids):
+    """
+    Insert ledger rows and bring the derived per-day snapshots up to date.
+    Runs inside the posting transaction, after the balances were applied.
+    Once the transaction commits, the cached views of the owners in
+    ``user_ids`` are invalidated and the debits reach the limits store.
+    """
+    Transaction.objects.using(using).bulk_create(entries)
+    snapshots.record(entries, using)
+    user_ids = list(user_ids)
+    transaction.on_commit(
+        lambda: invalidate_accounts(user_ids), using=using
+    )
+    transaction.on_commit(lambda: limits.record(entries), using=using)
+
+
+# -------------------------
+# PUBLIC API
+# -------------------------
+def post(account, amount, transaction_type):
+    """
+    Apply a single movement to ``account`` and record it in the ledger.
+    """
+    using = posting_db()
+    now = timezone.now()
+
+    with transaction.atomic(using=using):
+        balance, sequence, head = _apply(
+            account.pk, amount, transaction_type, now, using
+        )
+        entry = Transaction(
+            account=account,
+            amount=amount,
+            balance_after_transaction=balance,
+            transaction_type=transaction_type,
+            timestamp=now,
+        )
+        chain.seal(entry, sequence, head)
+        _advance_heads([entry], using)
+        record([entry], using, [account.user_id])
+
+    account.balance = balance
+    return entry
+
+
+def deposit(account, amount):
+    return post(account, amount, DEPOSIT)
+
+
+def withdraw(account, amount):
+    return post(account, amount, WITHDRAWAL)
+
+
+def transfer(from_account, to_account, amount):
+    """
+    Move ``amount`` between two accounts atomically, as a journal entry
+    with a ``TRANSFER_OUT`` and a ``TRANSFER_IN`` leg.
+
+    Rows are always locked in primary key order, whichever direction the
+    money flows, so two opposite transfers between the same pair of hot
+    accounts can not deadlock each other.
+    """
+    if from_account.pk == to_account.pk:
+        raise PostingError('You can not transfer money to the same account')
+
+    using = posting_db()
+    now = timezone.now()
+    legs = [
+        (from_account, TRANSFER_OUT),
+        (to_account, TRANSFER_IN),
+    ]
+
+    with transaction.atomic(using=using):
+        journal_entry = JournalEntry.objects.using(using).create(timestamp=now)
+        entries = {}
+        for account, transaction_type in sorted(legs, key=lambda l: l[0].pk):
+            balance, sequence, head = _apply(
+                account.pk, amount, transaction_type, now, using
+            )
+            entries[transaction_type] = Transaction(
+                account=account,
+                journal_entry=journal_entry,
+                amount=amount,
+                balance_after_transaction=balance,
+                transaction_type=transaction_type,
+                timestamp=now,
+            )
+            chain.seal(entries[transaction_type], sequence, head)
+        _advance_heads(entries.values(), using)
+        record(
+            [entries[TRANSFER_OUT], entries[TRANSFER_IN]],
+            using,
+            [from_account.user_id, to_account.user_id],
+        )
+
+    for entry in entries.values():
+        entry.account.balance = entry.balance_after_transaction
+    return entries[TRANSFER_OUT], entries[TRANSFER_IN]
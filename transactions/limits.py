@@ -0,0 +1,312 @@
+"""
+Withdrawal velocity limits.
+
+``check_withdrawal`` runs before the posting transaction and enforces the
+account type's per-day and per-hour limits on debits:
+
+* The daily limit reads the account's running ``daily_debit`` total, which
+  the ledger keeps exact.
+* The hourly limit is a sliding window kept in a pluggable store,
+  ``settings.LIMITS_STORE``. ``LocalStore`` keeps it in process memory, so
+  it only fits a single process; ``CacheStore`` keeps it in a shared cache
+  so every process and node sees the same window. ``get_store`` refuses a
+  store that is not shared when ``settings.SERVER_PROCESSES`` is above 1.
+
+Stores are caches of the ledger, not the source of truth. An account the
+store has not seen, or has not reloaded for ``LIMITS_RECONCILE_INTERVAL``
+seconds, is loaded from its last hour of ledger rows. Committed debits are
+added as they happen, so a warm check costs no query at all. Loading merges
+with the debits added meanwhile instead of replacing them, so a debit that
+commits while its account is being loaded is never lost; it may be counted
+twice, which only ever makes the limit stricter.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import router
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from accounts.models import UserBankAccount
+
+from .constants import DEBIT_TRANSACTION_TYPES
+from .models import Transaction
+
+HOUR = 60 * 60
+ZERO = Decimal('0.00')
+
+
+class LimitExceeded(Exception):
+    pass
+
+
+# -------------------------
+# STORES
+# -------------------------
+class LocalStore:
+    """
+    Exact sliding window: a log of ``(time, amount)`` per account, pruned
+    as it is read. Holds at most ``max_accounts`` accounts, dropping the
+    least recently used. Only the current process sees it.
+    """
+    shared = False
+
+    def __init__(self, window=HOUR, max_accounts=100000):
+        self.window = window
+        self.max_accounts = max_accounts
+        self._accounts = OrderedDict()
+        # Debits added while their account is being loaded.
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def _sum(self, events, now):
+        cutoff = now - self.window
+        while events and events[0][0] <= cutoff:
+            events.popleft()
+        return sum((amount for _, amount in events), ZERO)
+
+    def withdrawn(self, account_id, now):
+        """
+        Return the amount debited in the window ending at ``now`` (epoch
+        seconds), or ``None`` if it has to be loaded from the ledger.
+        """
+        with self._lock:
+            state = self._accounts.get(account_id)
+            if state is None:
+                return None
+            loaded_at, events = state
+            if now - loaded_at > settings.LIMITS_RECONCILE_INTERVAL:
+                return None
+            self._accounts.move_to_end(account_id)
+            return self._sum(events, now)
+
+    def load(self, account_id, read, now):
+        """
+        Replace the account's window with the debits ``read()`` returns
+        from the ledger, plus those added while it ran, and return the
+        amount debited in it.
+        """
+        pending = []
+        with self._lock:
+            self._loading.setdefault(account_id, []).append(pending)
+        try:
+            events = read()
+        except BaseException:
+            with self._lock:
+                self._stop_loading(account_id, pending)
+            raise
+        with self._lock:
+            self._stop_loading(account_id, pending)
+            events = deque(sorted(events + pending))
+            self._accounts[account_id] = (now, events)
+            self._accounts.move_to_end(account_id)
+            while len(self._accounts) > self.max_accounts:
+                self._accounts.popitem(last=False)
+            return self._sum(events, now)
+
+    def _stop_loading(self, account_id, pending):
+        loads = [
+            other for other in self._loading.pop(account_id)
+            if other is not pending
+        ]
+        if loads:
+            self._loading[account_id] = loads
+
+    def add(self, account_id, amount, when):
+        with self._lock:
+            for pending in self._loading.get(account_id, ()):
+                pending.append((when, amount))
+            state = self._accounts.get(account_id)
+            # Accounts that are not loaded pick the debit up from the
+            # ledger on their next check.
+            if state is not None:
+                state[1].append((when, amount))
+
+
+class CacheStore:
+    """
+    Sliding window over per-minute buckets in the default cache, summed
+    with one ``get_many``. The oldest bucket is counted whole, so the
+    window errs on the strict side by up to a minute.
+
+    Debits are added with ``incr``, and loading moves buckets by a
+    difference rather than overwriting them, so concurrent updates are
+    never lost.
+    """
+    bucket = 60
+
+    def __init__(self, window=HOUR):
+        self.window = window
+
+    @property
+    def shared(self):
+        # Local memory is per process, and the file cache's incr is not
+        # atomic across processes.
+        return not isinstance(
+            caches[DEFAULT_CACHE_ALIAS],
+            (DummyCache, FileBasedCache, LocMemCache),
+        )
+
+    def _key(self, account_id, bucket):
+        return f'limits:{account_id}:{bucket}'
+
+    def _loaded_key(self, account_id):
+        return f'limits:{account_id}:loaded'
+
+    def _buckets(self, now):
+        last = int(now // self.bucket)
+        return range(last - self.window // self.bucket, last + 1)
+
+    def withdrawn(self, account_id, now):
+        keys = [self._key(account_id, b) for b in self._buckets(now)]
+        values = cache.get_many(keys + [self._loaded_key(account_id)])
+        if self._loaded_key(account_id) not in values:
+            return None
+        cents = sum(values.get(key, 0) for key in keys)
+        return Decimal(cents).scaleb(-2)
+
+    def load(self, account_id, read, now):
+        """
+        Set the account's buckets to the debits ``read()`` returns from the
+        ledger and return the amount debited in the window. Buckets are
+        moved by the difference from what they held before the read, so
+        debits added meanwhile are kept.
+        """
+        buckets = dict.fromkeys(self._buckets(now), 0)
+        keys = [self._key(account_id, b) for b in buckets]
+        before = cache.get_many(keys)
+        for when, amount in read():
+            bucket = int(when // self.bucket)
+            if bucket in buckets:
+                buckets[bucket] += int(amount * 100)
+
+        for key, cents in zip(keys, buckets.values()):
+            difference = cents - before.get(key, 0)
+            if difference > 0:
+                self._incr(key, difference)
+            elif difference < 0:
+                try:
+                    cache.incr(key, difference)
+                except ValueError:
+                    # Expired meanwhile: nothing left to take off.
+                    pass
+        cache.set(
+            self._loaded_key(account_id),
+            True,
+            timeout=settings.LIMITS_RECONCILE_INTERVAL,
+        )
+        withdrawn = self.withdrawn(account_id, now)
+        if withdrawn is None:
+            # The cache dropped the keys already.
+            withdrawn = Decimal(sum(buckets.values())).scaleb(-2)
+        return withdrawn
+
+    def _incr(self, key, cents):
+        try:
+            cache.incr(key, cents)
+        except ValueError:
+            if not cache.add(key, cents, timeout=self.window + self.bucket):
+                cache.incr(key, cents)
+
+    def add(self, account_id, amount, when):
+        self._incr(
+            self._key(account_id, int(when // self.bucket)), int(amount * 100)
+        )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = import_string(settings.LIMITS_STORE)()
+                if settings.SERVER_PROCESSES > 1 and not store.shared:
+                    raise ImproperlyConfigured(
+                        f'{settings.LIMITS_STORE} is not shared between '
+                        f'processes, so each of the '
+                        f'{settings.SERVER_PROCESSES} server processes would '
+                        f'allow the full hourly limit. Use CacheStore with '
+                        f'a shared CACHE_URL.'
+                    )
+                _store = store
+    return _store
+
+
+# -------------------------
+# ENGINE
+# -------------------------
+def _ledger_debits(account_id):
+    """
+    The account's debits in the last hour, as ``(epoch, amount)`` pairs.
+    """
+    since = timezone.now() - timedelta(seconds=HOUR)
+    rows = Transaction.objects.using(
+        router.db_for_write(UserBankAccount)
+    ).filter(
+        account_id=account_id,
+        transaction_type__in=DEBIT_TRANSACTION_TYPES,
+        timestamp__gt=since,
+    ).values_list('timestamp', 'amount')
+    return [(timestamp.timestamp(), amount) for timestamp, amount in rows]
+
+
+def withdrawn_this_hour(account_id):
+    store = get_store()
+    now = time.time()
+    withdrawn = store.withdrawn(account_id, now)
+    if withdrawn is None:
+        withdrawn = store.load(
+            account_id, lambda: _ledger_debits(account_id), now
+        )
+    return withdrawn
+
+
+def check_withdrawal(account, amount):
+    """
+    Raise ``LimitExceeded`` if debiting ``amount`` from ``account`` would
+    break its account type's daily or hourly limit.
+    """
+    account_type = account.account_type
+
+    daily_limit = account_type.maximum_daily_withdrawal_amount
+    if daily_limit is not None:
+        withdrawn = account.daily_totals()[1]
+        if amount + withdrawn > daily_limit:
+            raise LimitExceeded(
+                f'You can withdraw at most {daily_limit} $ per day. '
+                f'You have already withdrawn {withdrawn} $ today'
+            )
+
+    hourly_limit = account_type.maximum_hourly_withdrawal_amount
+    if hourly_limit is not None:
+        withdrawn = withdrawn_this_hour(account.pk)
+        if amount + withdrawn > hourly_limit:
+            raise LimitExceeded(
+                f'You can withdraw at most {hourly_limit} $ per hour. '
+                f'You have withdrawn {withdrawn} $ in the last hour'
+            )
+
+
+def record(entries):
+    """
+    Add committed debits to the store. Called by the ledger after commit.
+    """
+    store = get_store()
+    for entry in entries:
+        if entry.transaction_type in DEBIT_TRANSACTION_TYPES:
+            store.add(
+                entry.account_id, entry.amount, entry.timestamp.timestamp()
+            )
@@ -0,0 +1,64 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts.models import BankAccountType
+from transactions.interest import DEFAULT_CHUNK_SIZE, accrue_interest, period_end
+
+
+class Command(BaseCommand):
+    help = 'Credit interest for a month to every eligible account.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period',
+            help='Month to accrue for (YYYY-MM). Defaults to last month.',
+        )
+        parser.add_argument(
+            '--account-type',
+            type=int,
+            action='append',
+            dest='account_types',
+            help='Only accrue for this BankAccountType id. May be repeated.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        if options['period']:
+            try:
+                year, month = map(int, options['period'].split('-'))
+                until = period_end(year, month)
+            except ValueError:
+                raise CommandError('--period must be a YYYY-MM month')
+        else:
+            first_of_month = timezone.localdate().replace(day=1)
+            last_month = first_of_month - datetime.timedelta(days=1)
+            until = period_end(last_month.year, last_month.month)
+
+        account_types = BankAccountType.objects.filter(
+            annual_interest_rate__gt=0
+        )
+        if options['account_types']:
+            account_types = account_types.filter(
+                pk__in=options['account_types']
+            )
+
+        for account_type in account_types:
+            if not account_type.is_interest_month(until.month):
+                continue
+            credited, total = accrue_interest(
+                account_type, until, chunk_size=options['chunk_size']
+            )
+            self.stdout.write(
+                f'{account_type}: credited {total} $ interest '
+                f'to {credited} accounts'
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Interest accrued until {until}'
+        ))
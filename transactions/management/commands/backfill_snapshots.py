@@ -0,0 +1,53 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from transactions.models import Transaction
+from transactions.snapshots import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily balance snapshots from the transaction ledger.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before',
+            help=(
+                'Only rebuild days before this date (YYYY-MM-DD). Defaults '
+                'to today, leaving days still being posted to the posting '
+                'path.'
+            ),
+        )
+        parser.add_argument(
+            '--account-no',
+            type=int,
+            action='append',
+            dest='account_nos',
+            help='Limit the rebuild to this account. May be repeated.',
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                before = datetime.date.fromisoformat(options['before'])
+            except ValueError:
+                raise CommandError('--before must be a YYYY-MM-DD date')
+        else:
+            before = timezone.localdate()
+
+        transactions = Transaction.objects.filter(
+            timestamp__lt=timezone.make_aware(
+                datetime.datetime.combine(before, datetime.time.min)
+            )
+        )
+        if options['account_nos']:
+            transactions = transactions.filter(
+                account__account_no__in=options['account_nos']
+            )
+
+        written = rebuild(transactions, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {written} daily snapshots before {before}'
+        ))
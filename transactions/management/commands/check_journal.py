@@ -0,0 +1,33 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from transactions.journal import unbalanced
+
+
+class Command(BaseCommand):
+    help = 'Check that the journal entries posted on a day sum to zero.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=datetime.date.fromisoformat,
+            help='Business date as YYYY-MM-DD. Defaults to yesterday.',
+        )
+
+    def handle(self, *args, **options):
+        date = options['date'] or (
+            timezone.localdate() - datetime.timedelta(days=1)
+        )
+        entries = unbalanced(date)
+        for journal_entry_id, total in sorted(entries.items()):
+            self.stdout.write(f'Journal entry {journal_entry_id}: {total}')
+
+        if entries:
+            raise CommandError(
+                f'{len(entries)} unbalanced journal entries on {date}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'All journal entries on {date} balance'
+        ))
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from transactions import ledger, partitions
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the monthly ledger partitions ahead of time and, with '
+        '--archive, move old months to compressed archive files. '
+        'PostgreSQL only.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=settings.TRANSACTION_PARTITION_MONTHS_AHEAD,
+        )
+        parser.add_argument(
+            '--archive',
+            action='store_true',
+            help='Archive the months older than --keep-months.',
+        )
+        parser.add_argument(
+            '--keep-months',
+            type=int,
+            default=settings.TRANSACTION_ARCHIVE_AFTER_MONTHS,
+            help='Months to keep in the database, the current one included.',
+        )
+
+    def handle(self, *args, **options):
+        using = ledger.posting_db()
+        connection = connections[using]
+        if not partitions.is_partitioned(connection):
+            raise CommandError('The ledger table is not partitioned')
+
+        for month in partitions.ensure_partitions(
+            connection, options['months_ahead']
+        ):
+            self.stdout.write(f'Created partition {month:%Y-%m}')
+
+        if not options['archive']:
+            return
+        if options['keep_months'] < 1:
+            raise CommandError('--keep-months must be at least 1')
+
+        cutoff = partitions.add_months(
+            timezone.localdate().replace(day=1), 1 - options['keep_months']
+        )
+        for month in partitions.partitions(connection):
+            if month >= cutoff:
+                break
+            try:
+                archived = partitions.archive_partition(month, using)
+            except partitions.PartitionError as e:
+                raise CommandError(e)
+            self.stdout.write(
+                f'Archived {month:%Y-%m}: {archived.rows} rows to '
+                f'{archived.path}'
+            )
@@ -0,0 +1,66 @@
+import csv
+import sys
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.batch import DEFAULT_CHUNK_SIZE, READERS, post_batch
+
+
+class Command(BaseCommand):
+    help = 'Post a CSV or JSON-lines file of deposits and withdrawals.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'file',
+            help="Path to the batch file, or '-' to read from stdin.",
+        )
+        parser.add_argument(
+            '--format',
+            choices=sorted(READERS),
+            help='Input format. Guessed from the file extension if omitted.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Rows posted per database transaction.',
+        )
+        parser.add_argument(
+            '--rejects',
+            help='Write rejected rows to this CSV file instead of stderr.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['file']
+        fmt = options['format']
+        if fmt is None:
+            fmt = 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+        with ExitStack() as files:
+            try:
+                stream = sys.stdin
+                if path != '-':
+                    stream = files.enter_context(Path(path).open(newline=''))
+                rejects_file = self.stderr
+                if options['rejects']:
+                    rejects_file = files.enter_context(
+                        open(options['rejects'], 'w', newline='')
+                    )
+            except OSError as e:
+                raise CommandError(e)
+
+            writer = csv.writer(rejects_file)
+            writer.writerow(['line', 'account_no', 'reason'])
+            result = post_batch(
+                READERS[fmt](stream),
+                chunk_size=options['chunk_size'],
+                on_reject=writer.writerow,
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Posted {result.posted} rows, rejected {result.rejected} '
+            f'in {result.elapsed:.2f}s '
+            f'({result.rows_per_second:.0f} rows/s)'
+        ))
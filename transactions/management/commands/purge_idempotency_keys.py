@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from transactions.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete idempotency keys older than IDEMPOTENCY_KEY_TTL seconds. '
+        'Run it periodically, e.g. hourly from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} idempotency keys older than '
+            f'{settings.IDEMPOTENCY_KEY_TTL} seconds'
+        ))
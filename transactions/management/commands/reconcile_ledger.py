@@ -0,0 +1,78 @@
+import csv
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import runner
+from core.models import BatchCheckpoint
+from transactions.reconciliation import REPORT_FIELDS
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay the ledger of every account, in parallel over account '
+        'number partitions, and report balances and running balances that '
+        'do not match it. Rerunning with the same --run-key resumes '
+        'unfinished partitions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--run-key',
+            help='Identifies the run. Defaults to the current time.',
+        )
+        parser.add_argument('--partitions', type=int, default=8)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Worker processes. Defaults to the number of CPUs.',
+        )
+
+    def handle(self, *args, **options):
+        run_key = options['run_key'] or timezone.now().strftime(
+            '%Y-%m-%dT%H:%M:%S.%f'
+        )
+        directory = settings.RECONCILIATION_DIR / run_key.replace(':', '-')
+        checkpoints = runner.run(
+            'reconcile_ledger',
+            run_key,
+            partitions=options['partitions'],
+            workers=options['workers'],
+            options={'report_dir': str(directory / 'partitions')},
+        )
+
+        failed = [
+            checkpoint for checkpoint in checkpoints
+            if checkpoint.status == BatchCheckpoint.FAILED
+        ]
+        for checkpoint in failed:
+            self.stderr.write(checkpoint.error)
+        if failed:
+            raise CommandError(
+                f'{len(failed)} partitions failed; rerun with --run-key '
+                f'{run_key} to resume'
+            )
+
+        # Merge the partition reports, in account number order.
+        parts = [
+            checkpoint.result['report'] for checkpoint in checkpoints
+            if checkpoint.result and checkpoint.result['report']
+        ]
+        if not parts:
+            self.stdout.write(self.style.SUCCESS('No discrepancies found'))
+            return
+
+        report = directory / 'discrepancies.csv'
+        found = 0
+        with report.open('w', newline='') as output:
+            writer = csv.writer(output)
+            writer.writerow(REPORT_FIELDS)
+            for part in parts:
+                with open(part, newline='') as rows:
+                    rows = csv.reader(rows)
+                    next(rows)
+                    for row in rows:
+                        writer.writerow(row)
+                        found += 1
+        raise CommandError(f'{found} discrepancies, see {report}')
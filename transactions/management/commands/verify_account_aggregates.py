@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import UserBankAccount
+from transactions.aggregates import verify
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the running aggregates on every account from the '
+        'transaction ledger and report drift.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Rewrite drifted accounts from the ledger.',
+        )
+        parser.add_argument(
+            '--account-no',
+            type=int,
+            action='append',
+            dest='account_nos',
+            help='Only check this account. May be repeated.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        accounts = None
+        if options['account_nos']:
+            accounts = UserBankAccount.objects.filter(
+                account_no__in=options['account_nos']
+            )
+
+        drifted = set()
+        for drift in verify(
+            accounts, fix=options['fix'], chunk_size=options['chunk_size']
+        ):
+            drifted.add(drift.account_no)
+            self.stdout.write(
+                f'{drift.account_no} {drift.field}: stored {drift.stored}, '
+                f'ledger {drift.expected}'
+            )
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('No drift found'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Fixed {len(drifted)} drifted accounts'
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'{len(drifted)} accounts drifted; rerun with --fix to '
+                f'repair them'
+            ))
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import runner
+from core.models import BatchCheckpoint
+
+
+class Command(BaseCommand):
+    help = (
+        'Verify the hash chains of the transaction ledger, in parallel over '
+        'account number partitions. Each account resumes from its last '
+        'verified row, and rerunning with the same --run-key skips finished '
+        'partitions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--run-key',
+            help='Identifies the run. Defaults to the current time.',
+        )
+        parser.add_argument('--partitions', type=int, default=8)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Worker processes. Defaults to the number of CPUs.',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore the checkpoints and verify every chain in full.',
+        )
+
+    def handle(self, *args, **options):
+        run_key = options['run_key'] or timezone.now().strftime(
+            '%Y-%m-%dT%H:%M:%S.%f'
+        )
+        checkpoints = runner.run(
+            'verify_ledger',
+            run_key,
+            partitions=options['partitions'],
+            workers=options['workers'],
+            options={'full': options['full']},
+        )
+
+        failed = 0
+        accounts = rows = 0
+        breaks = []
+        for checkpoint in checkpoints:
+            if checkpoint.status == BatchCheckpoint.FAILED:
+                failed += 1
+                self.stderr.write(checkpoint.error)
+            elif checkpoint.result:
+                accounts += checkpoint.result['accounts']
+                rows += checkpoint.result['rows']
+                breaks.extend(checkpoint.result['breaks'])
+
+        for account_no, sequence, reason in breaks:
+            self.stdout.write(f'{account_no} #{sequence}: {reason}')
+
+        if failed:
+            raise CommandError(
+                f'{failed} partitions failed; rerun with --run-key '
+                f'{run_key} to resume'
+            )
+        if breaks:
+            raise CommandError(f'{len(breaks)} broken ledger chains')
+        self.stdout.write(self.style.SUCCESS(
+            f'Verified {rows} rows in {accounts} accounts'
+        ))
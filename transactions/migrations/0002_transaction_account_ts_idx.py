@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'timestamp', 'id'], name='transaction_account_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.16 on 2026-10-18 18:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('transactions', '0002_transaction_account_ts_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('opening_balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('closing_balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('debit_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('credit_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_snapshots', to='accounts.userbankaccount')),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailybalancesnapshot',
+            constraint=models.UniqueConstraint(fields=('account', 'date'), name='unique_account_snapshot_date'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.16 on 2026-10-18 19:04
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0004_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.16 on 2026-10-18 19:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_ledger_head'),
+        ('transactions', '0005_transaction_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveBigIntegerField()),
+                ('entry_hash', models.CharField(max_length=64)),
+                ('verified_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='entry_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='sequence',
+            field=models.PositiveBigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(fields=('account', 'sequence'), name='unique_account_ledger_sequence'),
+        ),
+        migrations.AddField(
+            model_name='ledgercheckpoint',
+            name='account',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_checkpoint', to='accounts.userbankaccount'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.16 on 2026-10-18 19:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_ledger_head'),
+        ('transactions', '0007_journal_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('total_credit', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('total_debit', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('transaction_count', models.PositiveIntegerField()),
+                ('last_transaction_at', models.DateTimeField()),
+                ('sequence', models.PositiveBigIntegerField(null=True)),
+                ('entry_hash', models.CharField(max_length=64, null=True)),
+                ('archived_until', models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedPartition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('path', models.CharField(max_length=500)),
+                ('rows', models.PositiveBigIntegerField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['month'],
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='transaction',
+            name='unique_account_ledger_sequence',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'sequence'], name='transaction_account_seq_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedledger',
+            name='account',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='archived_ledger', to='accounts.userbankaccount'),
+        ),
+    ]
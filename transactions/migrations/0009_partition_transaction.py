@@ -0,0 +1,123 @@
+import datetime
+
+from django.db import migrations
+from django.utils import timezone
+
+TABLE = 'transactions_transaction'
+UNPARTITIONED = f'{TABLE}_unpartitioned'
+MONTHS_AHEAD = 3
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def month_start(month):
+    return timezone.make_aware(
+        datetime.datetime(month.year, month.month, 1)
+    ).isoformat()
+
+
+def partition_transactions(apps, schema_editor):
+    """
+    Rebuild the ledger table as a monthly range-partitioned table on
+    PostgreSQL, copying the existing rows. Other databases keep the plain
+    table.
+
+    The primary key becomes ``(id, timestamp)``, as PostgreSQL requires the
+    partition key in it; ``id`` stays unique through its sequence. Indexes
+    and foreign keys are recreated on the partitioned table under their
+    original names.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    qn = schema_editor.quote_name
+    table, old = qn(TABLE), qn(UNPARTITIONED)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT indexname, indexdef FROM pg_indexes '
+            'WHERE schemaname = current_schema() AND tablename = %s',
+            [TABLE],
+        )
+        indexes = [
+            definition for name, definition in cursor.fetchall()
+            if name != f'{TABLE}_pkey'
+        ]
+        cursor.execute(
+            'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint '
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT MIN("timestamp") FROM {table}')
+        oldest = cursor.fetchone()[0]
+
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {old}')
+        cursor.execute(
+            f'CREATE TABLE {table} '
+            f'(LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute(
+            f'CREATE TABLE {qn(f"{TABLE}_default")} '
+            f'PARTITION OF {table} DEFAULT'
+        )
+
+        current = timezone.localdate().replace(day=1)
+        month = (
+            timezone.localtime(oldest).date().replace(day=1)
+            if oldest else current
+        )
+        while month <= add_months(current, MONTHS_AHEAD):
+            end = add_months(month, 1)
+            cursor.execute(
+                f'CREATE TABLE {qn(f"{TABLE}_p{month:%Y%m}")} '
+                f'PARTITION OF {table} '
+                f"FOR VALUES FROM ('{month_start(month)}') "
+                f"TO ('{month_start(end)}')"
+            )
+            month = end
+
+        cursor.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+        cursor.execute(f'DROP TABLE {old}')
+
+        sequence = qn(f'{TABLE}_id_seq')
+        cursor.execute(
+            f'CREATE SEQUENCE {sequence} OWNED BY {table}.{qn("id")}'
+        )
+        cursor.execute(
+            f'ALTER TABLE {table} ALTER COLUMN {qn("id")} '
+            f"SET DEFAULT nextval('{sequence}')"
+        )
+        cursor.execute(
+            f"SELECT setval('{sequence}', COALESCE(MAX({qn('id')}), 0) + 1, "
+            f'false) FROM {table}'
+        )
+        cursor.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {qn(f"{TABLE}_pkey")} '
+            f'PRIMARY KEY ({qn("id")}, {qn("timestamp")})'
+        )
+        for definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(
+                f'ALTER TABLE {table} ADD CONSTRAINT {qn(name)} {definition}'
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0008_ledger_archive'),
+    ]
+
+    operations = [
+        # Not reversed: the partitioned table works with the earlier
+        # migrations' model state.
+        migrations.RunPython(
+            partition_transactions, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0009_partition_transaction'),
+    ]
+
+    operations = [
+        # Includes the partition key, so PostgreSQL accepts it on the
+        # partitioned table. Added first, so lookups by sequence always
+        # have an index.
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(fields=('account', 'sequence', 'timestamp'), name='unique_account_ledger_sequence'),
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='transaction_account_seq_idx',
+        ),
+    ]
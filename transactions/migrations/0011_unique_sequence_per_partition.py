@@ -0,0 +1,74 @@
+from django.db import migrations, models
+
+TABLE = 'transactions_transaction'
+NAME = 'unique_account_ledger_sequence'
+
+PARTITIONED = models.UniqueConstraint(
+    fields=('account', 'sequence', 'timestamp'), name=NAME
+)
+UNIQUE = models.UniqueConstraint(fields=('account', 'sequence'), name=NAME)
+
+
+def is_partitioned(schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table '
+            'WHERE partrelid = %s::regclass',
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def unique_sequences(apps, schema_editor):
+    """
+    Hold ``(account, sequence)`` unique. A partitioned table can not have
+    that index itself, so each partition gets one instead and
+    ``create_partition`` adds it to new ones. Runs after the state change,
+    so SQLite rebuilds the table with the new constraint.
+    """
+    Transaction = apps.get_model('transactions', 'Transaction')
+    if not is_partitioned(schema_editor):
+        schema_editor.remove_constraint(Transaction, PARTITIONED)
+        schema_editor.add_constraint(Transaction, UNIQUE)
+        return
+
+    qn = schema_editor.quote_name
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i '
+            'JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass',
+            [TABLE],
+        )
+        for partition, in cursor.fetchall():
+            cursor.execute(
+                f'CREATE UNIQUE INDEX IF NOT EXISTS '
+                f'{qn(f"{partition}_account_seq_uniq")} '
+                f'ON {qn(partition)} ("account_id", "sequence")'
+            )
+    schema_editor.remove_constraint(Transaction, PARTITIONED)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0010_unique_ledger_sequence'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveConstraint(
+                    model_name='transaction', name=NAME
+                ),
+                migrations.AddConstraint(
+                    model_name='transaction', constraint=UNIQUE
+                ),
+            ],
+        ),
+        # Not reversed: 0010's constraint only ever held rows posted at the
+        # same instant.
+        migrations.RunPython(unique_sequences, migrations.RunPython.noop),
+    ]
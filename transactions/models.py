@@ -1,15 +1,39 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 from .constants import TRANSACTION_TYPE_CHOICES
 from accounts.models import UserBankAccount
 
 
+class JournalEntry(models.Model):
+    """
+    Header of a movement posted as several balanced ledger rows, such as a
+    transfer. Its legs are the ``Transaction`` rows pointing at it and sum
+    to zero.
+    """
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
+
+    def __str__(self):
+        return f'Journal entry {self.pk}'
+
+    class Meta:
+        verbose_name_plural = 'journal entries'
+
+
 class Transaction(models.Model):
     account = models.ForeignKey(
         UserBankAccount,
         related_name='transactions',
         on_delete=models.CASCADE,
     )
+    journal_entry = models.ForeignKey(
+        JournalEntry,
+        null=True,
+        blank=True,
+        related_name='legs',
+        on_delete=models.PROTECT,
+    )
     amount = models.DecimalField(
         decimal_places=2,
         max_digits=12
@@ -21,10 +45,172 @@ class Transaction(models.Model):
     transaction_type = models.PositiveSmallIntegerField(
         choices=TRANSACTION_TYPE_CHOICES
     )
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set by the posting engine, so the account's last_transaction_at can
+    # carry the exact same value.
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
+    # Position in the account's ledger and hash chaining the row to the
+    # previous one, see ``transactions.chain``. Empty on rows posted before
+    # the chain was introduced.
+    sequence = models.PositiveBigIntegerField(null=True, editable=False)
+    entry_hash = models.CharField(max_length=64, null=True, editable=False)
 
     def __str__(self):
         return str(self.account.account_no)
 
     class Meta:
         ordering = ['timestamp']
+        constraints = [
+            # On PostgreSQL the table is partitioned by timestamp, and a
+            # unique index on the partitioned table would have to include
+            # it. There each partition gets a unique index of its own (see
+            # ``partitions.create_partition``), which holds sequences unique
+            # within a month; verify_ledger catches repeats across months.
+            models.UniqueConstraint(
+                fields=['account', 'sequence'],
+                name='unique_account_ledger_sequence',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['account', 'timestamp', 'id'],
+                name='transaction_account_ts_idx',
+            ),
+            # Legs by day, for the journal zero-sum check.
+            models.Index(
+                fields=['timestamp'],
+                name='transaction_journal_ts_idx',
+                condition=models.Q(journal_entry__isnull=False),
+            ),
+        ]
+
+
+class DailyBalanceSnapshot(models.Model):
+    account = models.ForeignKey(
+        UserBankAccount,
+        related_name='daily_snapshots',
+        on_delete=models.CASCADE,
+    )
+    date = models.DateField()
+    opening_balance = models.DecimalField(
+        default=0,
+        decimal_places=2,
+        max_digits=12
+    )
+    closing_balance = models.DecimalField(
+        default=0,
+        decimal_places=2,
+        max_digits=12
+    )
+    debit_total = models.DecimalField(
+        default=0,
+        decimal_places=2,
+        max_digits=12
+    )
+    credit_total = models.DecimalField(
+        default=0,
+        decimal_places=2,
+        max_digits=12
+    )
+    transaction_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.account.account_no} {self.date}'
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['account', 'date'],
+                name='unique_account_snapshot_date',
+            ),
+        ]
+
+
+class LedgerCheckpoint(models.Model):
+    """
+    Last row of an account's ledger whose hash chain has been verified.
+    ``verify_ledger`` resumes after it.
+    """
+    account = models.OneToOneField(
+        UserBankAccount,
+        related_name='ledger_checkpoint',
+        on_delete=models.CASCADE,
+    )
+    sequence = models.PositiveBigIntegerField()
+    entry_hash = models.CharField(max_length=64)
+    verified_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.account.account_no} #{self.sequence}'
+
+
+class ArchivedPartition(models.Model):
+    """
+    A month of the ledger moved out of the database into a compressed
+    file, see ``transactions.partitions``.
+    """
+    month = models.DateField(unique=True)
+    path = models.CharField(max_length=500)
+    rows = models.PositiveBigIntegerField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.month:%Y-%m}'
+
+    class Meta:
+        ordering = ['month']
+
+
+class ArchivedLedger(models.Model):
+    """
+    What an account's archived ledger rows add up to, so that checks which
+    replay the ledger can start where the database copy begins.
+    """
+    account = models.OneToOneField(
+        UserBankAccount,
+        related_name='archived_ledger',
+        on_delete=models.CASCADE,
+    )
+    # balance_after_transaction of the last archived row.
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    total_credit = models.DecimalField(max_digits=14, decimal_places=2)
+    total_debit = models.DecimalField(max_digits=14, decimal_places=2)
+    transaction_count = models.PositiveIntegerField()
+    last_transaction_at = models.DateTimeField()
+    # Last archived link of the hash chain, if any archived row had one.
+    sequence = models.PositiveBigIntegerField(null=True)
+    entry_hash = models.CharField(max_length=64, null=True)
+    archived_until = models.DateField()
+
+    def __str__(self):
+        return f'{self.account.account_no} until {self.archived_until}'
+
+
+class IdempotencyKey(models.Model):
+    """
+    Outcome of a posting request sent with an ``Idempotency-Key``, kept so
+    that retries of the same request replay it instead of posting again.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True)
+    response_location = models.CharField(max_length=500, blank=True)
+    response_content_type = models.CharField(max_length=100, blank=True)
+    response_body = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.key
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'key'],
+                name='unique_user_idempotency_key',
+            ),
+        ]
@@ -0,0 +1,387 @@
+"""
+Monthly partitioning of the ledger on PostgreSQL, and archival of old
+months.
+
+Migration ``0009_partition_transaction`` turns ``transactions_transaction``
+into a table range-partitioned on ``timestamp``, one partition per calendar
+month in ``TIME_ZONE``. Queries with a time range, or ordered by time with a
+limit, only read the partitions they need. A default partition catches rows
+outside the created months; ``maintain_partitions`` keeps
+``TRANSACTION_PARTITION_MONTHS_AHEAD`` months created ahead so it stays
+empty. Every partition has a unique index on ``(account_id, sequence)``.
+
+Archiving a month, always the oldest one left, does three things:
+
+* writes its rows to ``TRANSACTION_ARCHIVE_DIR/<YYYY-MM>.ndjson.gz``,
+  one JSON object per line, each account's rows in time order in a gzip
+  member of their own, and where each member starts to an index file next
+  to it;
+* folds each account's rows into ``ArchivedLedger``, which the aggregate,
+  hash chain and reconciliation checks start from;
+* detaches and drops the partition, in one transaction with the fold.
+
+The statement export reads archived months back from the files: it looks
+the account up in the index of each month it covers and decompresses only
+that account's member.
+"""
+import datetime
+import gzip
+import json
+import os
+import struct
+import zlib
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .constants import CREDIT_TRANSACTION_TYPES
+from .models import ArchivedLedger, ArchivedPartition, Transaction
+
+TABLE = Transaction._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+ARCHIVE_FIELDS = (
+    'account_id',
+    'id',
+    'journal_entry_id',
+    'timestamp',
+    'transaction_type',
+    'amount',
+    'balance_after_transaction',
+    'sequence',
+    'entry_hash',
+)
+
+# Index entries: account id, offset and length of its gzip member.
+INDEX_ENTRY = struct.Struct('>QQQ')
+
+
+class PartitionError(Exception):
+    pass
+
+
+def add_months(month, months):
+    """
+    The first day of the month ``months`` after ``month``'s.
+    """
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def month_range(month):
+    """
+    The ``[start, end)`` datetimes of ``month`` in the current time zone.
+    """
+    start = timezone.make_aware(
+        datetime.datetime(month.year, month.month, 1)
+    )
+    end = timezone.make_aware(
+        datetime.datetime.combine(add_months(month, 1), datetime.time.min)
+    )
+    return start, end
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y%m}'
+
+
+def is_partitioned(connection):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table '
+            'WHERE partrelid = %s::regclass',
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def partitions(connection):
+    """
+    The months with a partition attached, oldest first.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i '
+            'JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass',
+            [TABLE],
+        )
+        names = [name for name, in cursor.fetchall()]
+    prefix = f'{TABLE}_p'
+    return sorted(
+        datetime.datetime.strptime(name[len(prefix):], '%Y%m').date()
+        for name in names
+        if name.startswith(prefix)
+    )
+
+
+def create_sequence_index(cursor, qn, partition):
+    """
+    Hold ledger sequences unique within ``partition``; the partitioned
+    table can not, as its unique indexes must include the timestamp.
+    """
+    cursor.execute(
+        f'CREATE UNIQUE INDEX IF NOT EXISTS '
+        f'{qn(f"{partition}_account_seq_uniq")} '
+        f'ON {qn(partition)} ("account_id", "sequence")'
+    )
+
+
+def create_partition(connection, month):
+    """
+    Create the partition of ``month`` unless it exists. Bounds are DDL, so
+    they are inlined rather than passed as parameters.
+    """
+    qn = connection.ops.quote_name
+    start, end = month_range(month)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {qn(partition_name(month))} '
+            f'PARTITION OF {qn(TABLE)} '
+            f"FOR VALUES FROM ('{start.isoformat()}') "
+            f"TO ('{end.isoformat()}')"
+        )
+        create_sequence_index(cursor, qn, partition_name(month))
+
+
+def ensure_partitions(connection, months_ahead, today=None):
+    """
+    Create the partitions of the current month and ``months_ahead`` months
+    after it. Return the months that were missing.
+    """
+    current = (today or timezone.localdate()).replace(day=1)
+    existing = set(partitions(connection))
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            create_partition(connection, month)
+            created.append(month)
+    return created
+
+
+# -------------------------
+# ARCHIVAL
+# -------------------------
+def archive_path(month):
+    return settings.TRANSACTION_ARCHIVE_DIR / f'{month:%Y-%m}.ndjson.gz'
+
+
+def index_path(path):
+    return Path(path).with_suffix('.idx')
+
+
+def _encode(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def export_month(month, using, chunk_size=10000):
+    """
+    Write ``month``'s rows to its archive and index files and return the
+    row count. The files are written under temporary names and renamed
+    when complete.
+    """
+    start, end = month_range(month)
+    rows = Transaction.objects.using(using).filter(
+        timestamp__gte=start, timestamp__lt=end
+    ).order_by('account_id', 'timestamp', 'pk').values_list(
+        *ARCHIVE_FIELDS
+    ).iterator(chunk_size=chunk_size)
+
+    path = archive_path(month)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partials = [
+        file.with_name(file.name + '.partial')
+        for file in (path, index_path(path))
+    ]
+    count = 0
+    with open(partials[0], 'wb') as archive, open(partials[1], 'wb') as index:
+        # Concatenated members still read as one gzip file.
+        for account_id, account_rows in groupby(rows, key=itemgetter(0)):
+            offset = archive.tell()
+            with gzip.GzipFile(fileobj=archive, mode='wb') as member:
+                for row in account_rows:
+                    member.write(json.dumps(
+                        dict(zip(ARCHIVE_FIELDS, map(_encode, row)))
+                    ).encode() + b'\n')
+                    count += 1
+            index.write(INDEX_ENTRY.pack(
+                account_id, offset, archive.tell() - offset
+            ))
+        for file in (archive, index):
+            file.flush()
+            os.fsync(file.fileno())
+    for partial in partials:
+        partial.replace(partial.with_suffix(''))
+    return count
+
+
+FOLD_SQL = '''
+INSERT INTO {archived} (
+    account_id, balance, total_credit, total_debit, transaction_count,
+    last_transaction_at, sequence, entry_hash, archived_until
+)
+SELECT
+    account_id,
+    (array_agg(balance_after_transaction ORDER BY id DESC))[1],
+    SUM(CASE WHEN transaction_type IN ({credit}) THEN amount ELSE 0 END),
+    SUM(CASE WHEN transaction_type IN ({credit}) THEN 0 ELSE amount END),
+    COUNT(*),
+    MAX("timestamp"),
+    MAX(sequence),
+    (array_agg(entry_hash ORDER BY sequence DESC NULLS LAST))[1],
+    %s
+FROM {partition}
+GROUP BY account_id
+ON CONFLICT (account_id) DO UPDATE SET
+    balance = EXCLUDED.balance,
+    total_credit = {archived}.total_credit + EXCLUDED.total_credit,
+    total_debit = {archived}.total_debit + EXCLUDED.total_debit,
+    transaction_count =
+        {archived}.transaction_count + EXCLUDED.transaction_count,
+    last_transaction_at = EXCLUDED.last_transaction_at,
+    sequence = COALESCE(EXCLUDED.sequence, {archived}.sequence),
+    entry_hash = COALESCE(EXCLUDED.entry_hash, {archived}.entry_hash),
+    archived_until = EXCLUDED.archived_until
+'''
+
+
+def archive_partition(month, using):
+    """
+    Archive the partition of ``month``, which must be the oldest one, and
+    return the ``ArchivedPartition`` record.
+    """
+    connection = connections[using]
+    if not is_partitioned(connection):
+        raise PartitionError('The ledger is not partitioned')
+    months = partitions(connection)
+    if not months or months[0] != month:
+        raise PartitionError(f'{month:%Y-%m} is not the oldest partition')
+
+    start, end = month_range(month)
+    unverified = Transaction.objects.using(using).filter(
+        Q(account__ledger_checkpoint__isnull=True)
+        | Q(sequence__gt=F('account__ledger_checkpoint__sequence')),
+        timestamp__gte=start,
+        timestamp__lt=end,
+        sequence__isnull=False,
+    )
+    if unverified.exists():
+        raise PartitionError(
+            f'{month:%Y-%m} has rows verify_ledger has not checked yet'
+        )
+
+    # Nothing posts into past months, so the export can run outside the
+    # transaction that detaches the partition.
+    rows = export_month(month, using)
+
+    qn = connection.ops.quote_name
+    partition = qn(partition_name(month))
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                FOLD_SQL.format(
+                    archived=qn(ArchivedLedger._meta.db_table),
+                    partition=partition,
+                    credit=', '.join(map(str, CREDIT_TRANSACTION_TYPES)),
+                ),
+                [add_months(month, 1) - datetime.timedelta(days=1)],
+            )
+            cursor.execute(
+                f'ALTER TABLE {qn(TABLE)} DETACH PARTITION {partition}'
+            )
+            cursor.execute(f'DROP TABLE {partition}')
+        return ArchivedPartition.objects.using(using).create(
+            month=month, path=str(archive_path(month)), rows=rows
+        )
+
+
+def find_member(path, account_id):
+    """
+    The ``(offset, length)`` of ``account_id``'s member in the archive at
+    ``path``, or None if it has no rows there. The index is sorted by
+    account, so this is a binary search over its entries.
+    """
+    with open(index_path(path), 'rb') as index:
+        low, high = 0, index.seek(0, os.SEEK_END) // INDEX_ENTRY.size
+        while low < high:
+            middle = (low + high) // 2
+            index.seek(middle * INDEX_ENTRY.size)
+            key, offset, length = INDEX_ENTRY.unpack(
+                index.read(INDEX_ENTRY.size)
+            )
+            if key < account_id:
+                low = middle + 1
+            elif key > account_id:
+                high = middle
+            else:
+                return offset, length
+    return None
+
+
+def read_member(path, offset, length, chunk_size=64 * 1024):
+    """
+    Yield the lines of the gzip member at ``offset``, decompressing it a
+    chunk at a time.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    pending = b''
+    with open(path, 'rb') as archive:
+        archive.seek(offset)
+        while length:
+            data = archive.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            *lines, pending = (
+                pending + decompressor.decompress(data)
+            ).split(b'\n')
+            yield from lines
+
+
+def archived_statement_rows(account_id, daterange=None, using=None):
+    """
+    Yield an account's archived rows as ``STATEMENT_FIELDS`` tuples in
+    ``(timestamp, id)`` order, optionally limited to a ``[start, end)``
+    ``daterange``. Only the account's members of overlapping months are
+    read.
+    """
+    archives = ArchivedPartition.objects.using(using)
+    if daterange:
+        start, end = daterange
+        archives = archives.filter(
+            month__gte=timezone.localtime(start).date().replace(day=1),
+            month__lt=timezone.localtime(end).date(),
+        )
+
+    for archive in archives.order_by('month'):
+        member = find_member(archive.path, account_id)
+        if member is None:
+            continue
+        for line in read_member(archive.path, *member):
+            row = json.loads(line)
+            timestamp = datetime.datetime.fromisoformat(row['timestamp'])
+            if daterange:
+                if timestamp < start:
+                    continue
+                if timestamp >= end:
+                    # The member is in time order.
+                    break
+            yield (
+                timestamp,
+                row['transaction_type'],
+                Decimal(row['amount']),
+                Decimal(row['balance_after_transaction']),
+            )
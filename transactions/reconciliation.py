@@ -0,0 +1,182 @@
+"""
+Reconciliation of stored balances against a replay of the ledger.
+
+``reconcile`` reads a set of accounts and their ledger rows as two streams
+ordered by account, and merges them, so memory use does not grow with
+the number of accounts or rows. Rows are taken in primary key order:
+postings to an account insert under its row lock, so ids follow the
+order the balance moved in.
+
+For every account:
+
+* each row's ``balance_after_transaction`` must equal the previous row's
+  plus the row's signed amount, starting from zero, or from the balance
+  of the account's archived rows (``continuity``);
+* the stored balance must equal that starting point plus the sum of the
+  signed amounts (``balance``).
+
+Amounts are compared in integer cents, a chunk of rows at a time. A
+balance mismatch found in the stream can be a posting that landed between
+the two reads, so it is only reported if it persists when the account is
+rechecked under its row lock.
+"""
+import csv
+from collections import namedtuple
+from decimal import Decimal
+from itertools import chain, groupby, islice
+from operator import itemgetter
+from pathlib import Path
+
+from django.db import transaction
+from django.db.models import Sum
+
+from accounts.models import UserBankAccount
+
+from . import ledger
+from .constants import CREDIT_TRANSACTION_TYPES
+from .journal import SIGNED_AMOUNT
+from .models import ArchivedLedger, Transaction
+
+DEFAULT_CHUNK_SIZE = 10000
+
+REPORT_FIELDS = ['account_no', 'transaction_id', 'kind', 'expected', 'found']
+
+Discrepancy = namedtuple('Discrepancy', REPORT_FIELDS)
+
+
+def _cents(value):
+    return int(value * 100)
+
+
+def _amount(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def _replay(account_no, rows, opening, chunk_size):
+    """
+    Check the continuity of one account's ``(id, type, amount, balance)``
+    rows from an ``opening`` balance in cents. Return the replayed balance
+    in cents and the breaks found.
+    """
+    found = []
+    replayed = opening
+    # Each row is checked against the stored balance of the row before it,
+    # so one bad balance breaks two rows rather than every row after it.
+    last = opening
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return replayed, found
+
+        ids, types, amounts, balances = zip(*chunk)
+        deltas = [
+            _cents(amount) if transaction_type in CREDIT_TRANSACTION_TYPES
+            else -_cents(amount)
+            for transaction_type, amount in zip(types, amounts)
+        ]
+        balances = [_cents(value) for value in balances]
+        previous = chain([last], balances)
+        for pk, before, delta, after in zip(ids, previous, deltas, balances):
+            if before + delta != after:
+                found.append(Discrepancy(
+                    account_no,
+                    pk,
+                    'continuity',
+                    _amount(before + delta),
+                    _amount(after),
+                ))
+        replayed += sum(deltas)
+        last = balances[-1]
+
+
+def _confirm(pk, using):
+    """
+    Recompute the ledger total of an account under its row lock. Return
+    ``(stored, replayed)``.
+    """
+    with transaction.atomic(using=using):
+        stored = UserBankAccount.objects.using(using).select_for_update(
+        ).values_list('balance', flat=True).get(pk=pk)
+        replayed = Transaction.objects.using(using).filter(
+            account_id=pk
+        ).aggregate(total=Sum(SIGNED_AMOUNT, default=ledger.ZERO))['total']
+        opening = ArchivedLedger.objects.using(using).filter(
+            account_id=pk
+        ).values_list('balance', flat=True).first() or ledger.ZERO
+    # SQLite sums decimals as floats.
+    return stored, (opening + replayed).quantize(ledger.CENT)
+
+
+def reconcile(accounts, using, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Reconcile ``accounts`` (a ``UserBankAccount`` queryset) and yield a
+    ``Discrepancy`` per problem found. Both streams use server-side cursors
+    where the database has them.
+    """
+    accounts = accounts.using(using)
+    groups = groupby(
+        Transaction.objects.using(using).filter(
+            account__in=accounts.values('pk')
+        ).order_by('account_id', 'pk').values_list(
+            'account_id',
+            'pk',
+            'transaction_type',
+            'amount',
+            'balance_after_transaction',
+        ).iterator(chunk_size=chunk_size),
+        key=itemgetter(0),
+    )
+
+    mismatched = {}
+    group = next(groups, None)
+    for pk, account_no, stored, opening in accounts.order_by(
+        'pk'
+    ).values_list(
+        'pk', 'account_no', 'balance', 'archived_ledger__balance'
+    ).iterator(chunk_size=chunk_size):
+        # Rows of accounts deleted since the ledger stream started.
+        while group is not None and group[0] < pk:
+            group = next(groups, None)
+
+        rows = ()
+        if group is not None and group[0] == pk:
+            rows = (row[1:] for row in group[1])
+        replayed, found = _replay(
+            account_no, rows, _cents(opening or 0), chunk_size
+        )
+        if rows:
+            group = next(groups, None)
+
+        yield from found
+        if _cents(stored) != replayed:
+            mismatched[pk] = account_no
+
+    for pk, account_no in mismatched.items():
+        stored, replayed = _confirm(pk, using)
+        if stored != replayed:
+            yield Discrepancy(account_no, '', 'balance', replayed, stored)
+
+
+def write_report(discrepancies, path):
+    """
+    Write ``discrepancies`` to a CSV file at ``path``, which is only
+    created if there are any. Return how many were written.
+    """
+    path = Path(path)
+    path.unlink(missing_ok=True)
+    written = 0
+    report = None
+    try:
+        for discrepancy in discrepancies:
+            if report is None:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                report = path.open('w', newline='')
+                writer = csv.writer(report)
+                writer.writerow(REPORT_FIELDS)
+            writer.writerow(discrepancy)
+            written += 1
+    finally:
+        if report:
+            report.close()
+    return written
@@ -0,0 +1,184 @@
+"""
+Daily balance snapshots.
+
+``DailyBalanceSnapshot`` keeps one row per account and day with the opening
+and closing balance and that day's debit/credit totals. The posting path
+upserts it in the same transaction as the ledger insert, so any historical
+balance can be answered from one snapshot plus at most one day of
+transactions instead of replaying the whole history.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db import connections
+from django.utils import timezone
+
+from .constants import CREDIT_TRANSACTION_TYPES
+from .models import DailyBalanceSnapshot, Transaction
+
+SNAPSHOT_FIELDS = [
+    'opening_balance',
+    'closing_balance',
+    'debit_total',
+    'credit_total',
+    'transaction_count',
+]
+
+UPSERT_BATCH_SIZE = 500
+
+
+def _summarize(rows):
+    """
+    Fold ``(account_id, timestamp, transaction_type, amount, balance_after)``
+    rows, ordered per account by time, into per-day snapshot values.
+    """
+    days = {}
+    for account_id, timestamp, transaction_type, amount, balance in rows:
+        key = (account_id, timezone.localdate(timestamp))
+        day = days.get(key)
+        if day is None:
+            if transaction_type in CREDIT_TRANSACTION_TYPES:
+                opening_balance = balance - amount
+            else:
+                opening_balance = balance + amount
+            day = days[key] = {
+                'opening_balance': opening_balance,
+                'closing_balance': balance,
+                'debit_total': Decimal('0.00'),
+                'credit_total': Decimal('0.00'),
+                'transaction_count': 0,
+            }
+        if transaction_type in CREDIT_TRANSACTION_TYPES:
+            day['credit_total'] += amount
+        else:
+            day['debit_total'] += amount
+        day['closing_balance'] = balance
+        day['transaction_count'] += 1
+    return days
+
+
+def record(entries, using):
+    """
+    Fold freshly posted ledger rows into their accounts' snapshots with a
+    single upsert. Must run inside the posting transaction, after the
+    account rows have been locked, so snapshot updates for one account are
+    applied in posting order.
+    """
+    days = _summarize(
+        (
+            entry.account_id,
+            entry.timestamp,
+            entry.transaction_type,
+            entry.amount,
+            entry.balance_after_transaction,
+        )
+        for entry in entries
+    )
+    if not days:
+        return
+
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    table = qn(DailyBalanceSnapshot._meta.db_table)
+    columns = ['account_id', 'date'] + SNAPSHOT_FIELDS
+    accumulate = ', '.join(
+        f'{qn(field)} = {table}.{qn(field)} + EXCLUDED.{qn(field)}'
+        for field in ['debit_total', 'credit_total', 'transaction_count']
+    )
+    row = '(' + ', '.join(['%s'] * len(columns)) + ')'
+
+    days = list(days.items())
+    with connection.cursor() as cursor:
+        # Stay well under the bind parameter limits of every backend.
+        for start in range(0, len(days), UPSERT_BATCH_SIZE):
+            batch = days[start:start + UPSERT_BATCH_SIZE]
+            params = []
+            for (account_id, date), day in batch:
+                params += [account_id, date]
+                params += [day[field] for field in SNAPSHOT_FIELDS]
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(qn(c) for c in columns)}) '
+                f'VALUES {", ".join([row] * len(batch))} '
+                f'ON CONFLICT ({qn("account_id")}, {qn("date")}) DO UPDATE '
+                f'SET {qn("closing_balance")} = '
+                f'EXCLUDED.{qn("closing_balance")}, {accumulate}',
+                params,
+            )
+
+
+def rebuild(transactions, using='default', batch_size=2000):
+    """
+    Recompute snapshots from the ledger rows in ``transactions`` (a
+    ``Transaction`` queryset), replacing any existing values for the days
+    they cover. Rows are streamed, so memory is bounded by ``batch_size``.
+    Returns the number of snapshot rows written.
+    """
+    rows = transactions.using(using).order_by(
+        'account', 'timestamp', 'pk'
+    ).values_list(
+        'account_id',
+        'timestamp',
+        'transaction_type',
+        'amount',
+        'balance_after_transaction',
+    ).iterator(chunk_size=batch_size)
+
+    written = 0
+    pending = []
+    current = None
+
+    def flush():
+        snapshots = [
+            DailyBalanceSnapshot(account_id=account_id, date=date, **day)
+            for (account_id, date), day in _summarize(pending).items()
+        ]
+        DailyBalanceSnapshot.objects.using(using).bulk_create(
+            snapshots,
+            update_conflicts=True,
+            unique_fields=['account', 'date'],
+            update_fields=SNAPSHOT_FIELDS,
+        )
+        return len(snapshots)
+
+    for row in rows:
+        key = (row[0], timezone.localdate(row[1]))
+        # Only flush on a day boundary so a day is never split in two.
+        if key != current and len(pending) >= batch_size:
+            written += flush()
+            pending = []
+        current = key
+        pending.append(row)
+
+    if pending:
+        written += flush()
+    return written
+
+
+# -------------------------
+# QUERIES
+# -------------------------
+def balance_as_of(account, when):
+    """
+    Return the balance of ``account`` at the end of the date ``when``, or
+    at the exact moment ``when`` if it is a datetime.
+    """
+    if isinstance(when, datetime.datetime):
+        day = timezone.localdate(when)
+        balance = Transaction.objects.filter(
+            account=account,
+            timestamp__gte=timezone.make_aware(
+                datetime.datetime.combine(day, datetime.time.min)
+            ),
+            timestamp__lte=when,
+        ).order_by('-timestamp', '-pk').values_list(
+            'balance_after_transaction', flat=True
+        ).first()
+        if balance is not None:
+            return balance
+        when = day - datetime.timedelta(days=1)
+
+    balance = DailyBalanceSnapshot.objects.filter(
+        account=account,
+        date__lte=when,
+    ).order_by('-date').values_list('closing_balance', flat=True).first()
+    return balance if balance is not None else Decimal('0.00')
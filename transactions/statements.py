@@ -0,0 +1,61 @@
+"""
+Statement formatting shared by the export endpoint and the batch runner.
+"""
+import csv
+from pathlib import Path
+
+from .constants import TRANSACTION_TYPE_CHOICES
+
+STATEMENT_FIELDS = (
+    'timestamp',
+    'transaction_type',
+    'amount',
+    'balance_after_transaction',
+)
+
+TRANSACTION_TYPES = dict(TRANSACTION_TYPE_CHOICES)
+
+
+def encode_row(timestamp, transaction_type, amount, balance):
+    return (
+        timestamp.isoformat(),
+        TRANSACTION_TYPES.get(transaction_type, transaction_type),
+        str(amount),
+        str(balance),
+    )
+
+
+def write_statements(transactions, directory, chunk_size=2000):
+    """
+    Write one CSV statement per account in ``transactions`` to
+    ``directory/<account_no>.csv``, reading the ledger as a single ordered
+    stream. Returns the number of statements written.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    rows = transactions.order_by(
+        'account', 'timestamp', 'pk'
+    ).values_list(
+        'account__account_no', *STATEMENT_FIELDS
+    ).iterator(chunk_size=chunk_size)
+
+    written = 0
+    current = None
+    statement = None
+    try:
+        for account_no, *row in rows:
+            if account_no != current:
+                if statement:
+                    statement.close()
+                path = directory / f'{account_no}.csv'
+                statement = path.open('w', newline='')
+                writer = csv.writer(statement)
+                writer.writerow(STATEMENT_FIELDS)
+                current = account_no
+                written += 1
+            writer.writerow(encode_row(*row))
+    finally:
+        if statement:
+            statement.close()
+    return written
@@ -1,3 +1,953 @@
-from django.test import TestCase
+import datetime
+import gzip
+import io
+import json
+import re
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import UserBankAccount
+from accounts.tests import create_account
+
+from . import (
+    aggregates,
+    idempotency,
+    ledger,
+    limits,
+    reconciliation,
+    snapshots,
+)
+from .batch import post_batch, read_csv, read_jsonl
+from .constants import (
+    DEPOSIT,
+    INTEREST,
+    TRANSFER_IN,
+    TRANSFER_OUT,
+    WITHDRAWAL,
+)
+from .forms import FundTransferForm, WithdrawForm
+from .interest import accrue_interest
+from .journal import unbalanced
+from .models import (
+    ArchivedPartition,
+    DailyBalanceSnapshot,
+    IdempotencyKey,
+    Transaction,
+)
+from .partitions import (
+    archived_statement_rows,
+    create_partition,
+    export_month,
+    partition_name,
+)
+
+
+# -------------------------
+# POSTING ENGINE
+# -------------------------
+class TransferTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.low = create_account(
+            'low@x.com', 1000000001, balance=Decimal('100.00')
+        )
+        cls.high = create_account(
+            'high@x.com', 1000000002, balance=Decimal('100.00')
+        )
+
+    def balances(self):
+        return list(
+            UserBankAccount.objects.order_by('pk')
+            .values_list('balance', flat=True)
+        )
+
+    def test_locks_accounts_in_primary_key_order(self):
+        for from_account, to_account in [
+            (self.low, self.high), (self.high, self.low)
+        ]:
+            with CaptureQueriesContext(connection) as queries:
+                ledger.transfer(from_account, to_account, Decimal('10.00'))
+            # The balance UPDATEs take the row locks.
+            locked = [
+                int(match[1]) for match in (
+                    re.search(r'WHERE "id" = (\d+)', query['sql'])
+                    for query in queries
+                    if 'RETURNING' in query['sql']
+                )
+                if match
+            ]
+            self.assertEqual(locked, [self.low.pk, self.high.pk])
+
+    def test_posts_both_legs(self):
+        debit, credit = ledger.transfer(
+            self.low, self.high, Decimal('30.00')
+        )
+        self.assertEqual(
+            (debit.transaction_type, credit.transaction_type),
+            (TRANSFER_OUT, TRANSFER_IN),
+        )
+        self.assertEqual(debit.journal_entry_id, credit.journal_entry_id)
+        self.assertEqual(
+            self.balances(), [Decimal('70.00'), Decimal('130.00')]
+        )
+
+    def test_refuses_overdrafts(self):
+        with self.assertRaises(ledger.InsufficientFunds):
+            ledger.transfer(self.low, self.high, Decimal('100.01'))
+        with self.assertRaises(ledger.PostingError):
+            ledger.transfer(self.low, self.low, Decimal('1.00'))
+        self.assertEqual(
+            self.balances(), [Decimal('100.00'), Decimal('100.00')]
+        )
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_sequence_is_unique_per_account(self):
+        entry = ledger.deposit(self.low, Decimal('10.00'))
+        entry.pk = None
+        entry.timestamp += datetime.timedelta(seconds=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            entry.save()
+
+
+# Migration 0009 partitions the ledger on PostgreSQL.
+@skipUnless(connection.vendor == 'postgresql', 'Needs PostgreSQL')
+class PartitionTests(TestCase):
+
+    def test_new_partitions_hold_sequences_unique(self):
+        month = datetime.date(2099, 1, 1)
+        create_partition(connection, month)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT indexdef FROM pg_indexes WHERE tablename = %s',
+                [partition_name(month)],
+            )
+            definitions = [definition for definition, in cursor.fetchall()]
+        self.assertIn(
+            'CREATE UNIQUE INDEX transactions_transaction_p209901_account_'
+            'seq_uniq ON public.transactions_transaction_p209901 USING '
+            'btree (account_id, sequence)',
+            definitions,
+        )
+
+# -------------------------
+# ARCHIVAL
+# -------------------------
+class ArchiveTests(TestCase):
+
+    month = datetime.date(2024, 1, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.accounts = [
+            create_account(f'archive{n}@x.com', 1000000001 + n)
+            for n in range(3)
+        ]
+        # Out of id order, which the archive must not keep.
+        for account, day, amount in [
+            (cls.accounts[0], 20, 20),
+            (cls.accounts[1], 5, 30),
+            (cls.accounts[0], 10, 10),
+        ]:
+            entry = ledger.deposit(account, Decimal(amount))
+            Transaction.objects.filter(pk=entry.pk).update(
+                timestamp=cls.at(day)
+            )
+
+    @staticmethod
+    def at(day):
+        return timezone.make_aware(datetime.datetime(2024, 1, day))
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        archive_dir = override_settings(
+            TRANSACTION_ARCHIVE_DIR=Path(directory.name)
+        )
+        archive_dir.enable()
+        self.addCleanup(archive_dir.disable)
+
+        self.path = ArchivedPartition.objects.create(
+            month=self.month,
+            path=str(Path(directory.name) / '2024-01.ndjson.gz'),
+            rows=export_month(self.month, 'default'),
+        ).path
+
+    def amounts(self, account, daterange=None):
+        return [
+            (timestamp.day, amount)
+            for timestamp, _, amount, _ in archived_statement_rows(
+                account.pk, daterange
+            )
+        ]
+
+    def test_reads_each_account_in_time_order(self):
+        self.assertEqual(self.amounts(self.accounts[0]), [(10, 10), (20, 20)])
+        self.assertEqual(self.amounts(self.accounts[1]), [(5, 30)])
+        self.assertEqual(self.amounts(self.accounts[2]), [])
+
+    def test_daterange(self):
+        self.assertEqual(
+            self.amounts(self.accounts[0], (self.at(15), self.at(31))),
+            [(20, 20)],
+        )
+        self.assertEqual(
+            self.amounts(self.accounts[0], (self.at(1), self.at(15))),
+            [(10, 10)],
+        )
+
+    def test_archive_reads_as_one_file(self):
+        with gzip.open(self.path, 'rt') as lines:
+            self.assertEqual(len(list(lines)), 3)
+
+
+# -------------------------
+# TRANSACTION REPORT
+# -------------------------
+@override_settings(TRANSACTION_REPORT_PAGE_SIZE=2)
+class TransactionReportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.account = create_account('report@x.com', 1000000001)
+        for amount in (10, 20, 30, 40, 50):
+            ledger.deposit(cls.account, Decimal(amount))
+
+    def setUp(self):
+        # Cached views outlive the rolled back test data.
+        cache.clear()
+        self.client.force_login(self.account.user)
+
+    def page(self, query):
+        response = self.client.get(
+            reverse('transactions:transaction_report') + query
+        )
+        self.assertFalse(response.context['form'].errors)
+        return response
+
+    def test_next_links_walk_every_row_once(self):
+        amounts = []
+        query = '?daterange='
+        while query:
+            response = self.page(query)
+            amounts += [t.amount for t in response.context['object_list']]
+            cursor = response.context['next_cursor']
+            query = f'?daterange=&after={cursor}' if cursor else None
+        self.assertEqual(amounts, [10, 20, 30, 40, 50])
+
+
+@mock.patch.object(limits, '_store', None)
+class TransactionExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.account = create_account('export@x.com', 1000000001)
+        cls.other = create_account('other@x.com', 1000000002)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.account.user)
+        for day, account, amount, transaction_type in [
+            (1, self.account, '100.00', DEPOSIT),
+            (2, self.other, '500.00', DEPOSIT),
+            (2, self.account, '30.00', WITHDRAWAL),
+            (3, self.account, '5.50', DEPOSIT),
+            (5, self.account, '10.00', WITHDRAWAL),
+        ]:
+            when = timezone.make_aware(datetime.datetime(2024, 3, day, 12))
+            with mock.patch('django.utils.timezone.now', return_value=when):
+                ledger.post(account, Decimal(amount), transaction_type)
+
+    def export(self, **query):
+        response = self.client.get(
+            reverse('transactions:transaction_export'), query
+        )
+        if response.streaming:
+            response.text = b''.join(response.streaming_content).decode()
+        return response
+
+    def test_csv(self):
+        response = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename="statement-1000000001.csv"',
+        )
+        self.assertEqual(response.text.splitlines(), [
+            'timestamp,transaction_type,amount,balance_after_transaction',
+            '2024-03-01T12:00:00+00:00,Deposit,100.00,100.00',
+            '2024-03-02T12:00:00+00:00,Withdrawal,30.00,70.00',
+            '2024-03-03T12:00:00+00:00,Deposit,5.50,75.50',
+            '2024-03-05T12:00:00+00:00,Withdrawal,10.00,65.50',
+        ])
+
+    def test_ndjson(self):
+        response = self.export(format='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0], {
+            'timestamp': '2024-03-01T12:00:00+00:00',
+            'transaction_type': 'Deposit',
+            'amount': '100.00',
+            'balance_after_transaction': '100.00',
+        })
+
+    def test_daterange_includes_both_days(self):
+        response = self.export(
+            format='ndjson', daterange='2024-03-02 - 2024-03-03'
+        )
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([row['amount'] for row in rows], ['30.00', '5.50'])
+
+    def test_unknown_format(self):
+        self.assertEqual(self.export(format='xlsx').status_code, 400)
+
+
+# -------------------------
+# JSON API
+# -------------------------
+class BalanceAPITests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.account = create_account(
+            'api@x.com', 1000000001, balance=Decimal('12.50')
+        )
+        cls.other = create_account('other@x.com', 1000000002)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, account):
+        return self.client.get(reverse(
+            'api:account_balance', args=[account.account_no]
+        ))
+
+    def test_balance(self):
+        self.client.force_login(self.account.user)
+        response = self.get(self.account)
+        self.assertEqual(
+            response.json(),
+            {'account_no': 1000000001, 'balance': '12.50'},
+        )
+
+    def test_requires_the_owner(self):
+        self.assertEqual(self.get(self.account).status_code, 401)
+        self.client.force_login(self.account.user)
+        self.assertEqual(self.get(self.other).status_code, 404)
+
+
+# -------------------------
+# IDEMPOTENCY KEYS
+# -------------------------
+class IdempotencyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.account = create_account('retry@x.com', 1000000001)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.account.user)
+        self.recent = self.empty_lru()
+        patcher = mock.patch.object(idempotency, '_recent', self.recent)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def empty_lru(self):
+        return idempotency.LRUCache(100, settings.IDEMPOTENCY_KEY_TTL)
+
+    def deposit(self, amount, key='retry-1'):
+        return self.client.post(reverse('transactions:deposit_money'), {
+            'amount': amount, idempotency.FORM_FIELD: key,
+        })
+
+    def balance(self):
+        self.account.refresh_from_db()
+        return self.account.balance
+
+    def test_replays_the_same_key(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.deposit('100')
+        self.assertEqual(first.status_code, 302)
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+
+        replays = [self.deposit('100')]
+        self.assertIsNotNone(
+            self.recent.get((self.account.user_id, 'retry-1'))
+        )
+        # Another process, whose LRU has not seen the key.
+        with mock.patch.object(idempotency, '_recent', self.empty_lru()):
+            replays.append(self.deposit('100'))
+        for replay in replays:
+            with self.subTest(replay=replay):
+                self.assertEqual(replay.status_code, 302)
+                self.assertEqual(replay['Location'], first['Location'])
+                self.assertEqual(replay['Idempotent-Replayed'], 'true')
+
+        self.assertEqual(self.account.transactions.count(), 1)
+        self.assertEqual(self.balance(), Decimal('100.00'))
+
+    def test_rejects_the_same_key_for_another_request(self):
+        self.assertEqual(self.deposit('100').status_code, 302)
+        self.assertEqual(self.deposit('200').status_code, 422)
+        self.assertEqual(self.account.transactions.count(), 1)
+        self.assertEqual(self.balance(), Decimal('100.00'))
+
+    def test_failed_posts_do_not_bind_the_key(self):
+        # Below MINIMUM_DEPOSIT_AMOUNT: the form is shown again.
+        self.assertEqual(self.deposit('1').status_code, 200)
+        with mock.patch.object(ledger, 'post', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.deposit('100')
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        response = self.deposit('100')
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(self.balance(), Decimal('100.00'))
+
+    def test_lru_entries_expire_with_the_key(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.deposit('100')
+        record = IdempotencyKey.objects.get()
+        record.created_at -= datetime.timedelta(
+            seconds=settings.IDEMPOTENCY_KEY_TTL - 10
+        )
+        record.save(update_fields=['created_at'])
+
+        # Loaded from the table, it keeps the key's remaining 10 seconds.
+        recent = self.empty_lru()
+        with mock.patch.object(idempotency, '_recent', recent):
+            self.deposit('100')
+        cache_key = (self.account.user_id, 'retry-1')
+        self.assertIsNotNone(recent.get(cache_key))
+        later = time.monotonic() + 11
+        with mock.patch('time.monotonic', return_value=later):
+            self.assertIsNone(recent.get(cache_key))
+            # Stored when posted, it lasts the full TTL.
+            self.assertIsNotNone(self.recent.get(cache_key))
+
+
+# -------------------------
+# INTEREST
+# -------------------------
+class InterestTests(TestCase):
+
+    def test_pays_on_the_balance_at_period_end(self):
+        account = create_account('interest@x.com', 1000000001)
+        account.account_type.annual_interest_rate = Decimal('12.00')
+        account.account_type.save()
+
+        ledger.deposit(account, Decimal('1000.00'))
+        until = timezone.localdate().replace(day=1) - datetime.timedelta(1)
+        DailyBalanceSnapshot.objects.update(date=until)
+        # Posted after the period, so it earns nothing for it.
+        ledger.deposit(account, Decimal('5000.00'))
+
+        self.assertEqual(
+            accrue_interest(account.account_type, until),
+            (1, Decimal('10.00')),
+        )
+        self.assertEqual(accrue_interest(account.account_type, until), (0, 0))
+        account.refresh_from_db()
+        self.assertEqual(account.balance, Decimal('6010.00'))
+        self.assertEqual(account.interest_accrued_until, until)
+        self.assertEqual(
+            Transaction.objects.get(transaction_type=INTEREST)
+            .balance_after_transaction,
+            Decimal('6010.00'),
+        )
+
+
+# -------------------------
+# BALANCE SNAPSHOTS
+# -------------------------
+@mock.patch.object(limits, '_store', None)
+class SnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.account = create_account('snapshots@x.com', 1000000001)
+        cls.other = create_account('other@x.com', 1000000002)
+
+    def setUp(self):
+        cache.clear()
+        self.post(self.at(2024, 3, 1, 9), self.account, '100.00')
+        self.post(
+            self.at(2024, 3, 1, 23, 59, 59), self.account, '30.00', WITHDRAWAL
+        )
+        self.post(self.at(2024, 3, 2), self.account, '50.00')
+        self.post(self.at(2024, 3, 2, 10), self.other, '500.00')
+        self.post(
+            self.at(2024, 3, 4, 12), self.account, '20.00', WITHDRAWAL
+        )
+
+    def at(self, *args):
+        return timezone.make_aware(datetime.datetime(*args))
+
+    def post(self, when, account, amount, transaction_type=DEPOSIT):
+        with mock.patch('django.utils.timezone.now', return_value=when):
+            ledger.post(account, Decimal(amount), transaction_type)
+
+    def snapshots(self):
+        return list(DailyBalanceSnapshot.objects.order_by(
+            'account', 'date'
+        ).values_list('account', 'date', *snapshots.SNAPSHOT_FIELDS))
+
+    def test_balance_as_of(self):
+        for when, balance in [
+            # Before the first row.
+            (datetime.date(2024, 2, 29), '0.00'),
+            (self.at(2024, 3, 1, 8), '0.00'),
+            (self.at(2024, 3, 1, 9), '100.00'),
+            (datetime.date(2024, 3, 1), '70.00'),
+            # Either side of midnight, with a row right on it.
+            (self.at(2024, 3, 1, 23, 59, 59, 999999), '70.00'),
+            (self.at(2024, 3, 2), '120.00'),
+            # A day without rows, and before the first row of a day.
+            (datetime.date(2024, 3, 3), '120.00'),
+            (self.at(2024, 3, 4, 11), '120.00'),
+            (datetime.date(2024, 3, 4), '100.00'),
+            # After the last snapshot.
+            (datetime.date(2024, 12, 31), '100.00'),
+            (self.at(2024, 12, 31, 12), '100.00'),
+        ]:
+            with self.subTest(when=when):
+                self.assertEqual(
+                    snapshots.balance_as_of(self.account, when),
+                    Decimal(balance),
+                )
+
+    def test_rebuild_matches_record(self):
+        recorded = self.snapshots()
+        self.assertEqual(len(recorded), 4)
+
+        DailyBalanceSnapshot.objects.filter(
+            date=datetime.date(2024, 3, 1)
+        ).delete()
+        DailyBalanceSnapshot.objects.filter(
+            date=datetime.date(2024, 3, 4)
+        ).update(closing_balance=0, transaction_count=5)
+        # Batches of one row still keep each day in a single batch.
+        self.assertEqual(
+            snapshots.rebuild(Transaction.objects.all(), batch_size=1), 4
+        )
+        self.assertEqual(self.snapshots(), recorded)
+
+
+# -------------------------
+# WITHDRAWAL LIMITS
+# -------------------------
+@mock.patch.object(limits, '_store', None)
+class LimitTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.account = create_account(
+            'limits@x.com', 1000000001, balance=Decimal('500.00')
+        )
+        cls.other = create_account('other@x.com', 1000000002)
+        cls.account_type = cls.account.account_type
+
+    def set_limits(self, daily=None, hourly=None):
+        self.account_type.maximum_daily_withdrawal_amount = daily
+        self.account_type.maximum_hourly_withdrawal_amount = hourly
+        self.account_type.save()
+        ledger.withdraw(self.account, Decimal('50.00'))
+        self.account.refresh_from_db()
+
+    def transfer_errors(self, amount):
+        form = FundTransferForm(
+            {'to_account': self.other.account_no, 'amount': amount},
+            account=self.account,
+        )
+        return form.errors.get('__all__')
+
+    def test_daily_limit(self):
+        self.set_limits(daily=Decimal('100.00'))
+        form = WithdrawForm(
+            {'amount': '60', 'transaction_type': WITHDRAWAL},
+            account=self.account,
+        )
+        self.assertIn('per day', form.errors['amount'][0])
+        self.assertIn('per day', self.transfer_errors('60')[0])
+        self.assertIsNone(self.transfer_errors('50'))
+
+    def test_hourly_limit(self):
+        self.set_limits(hourly=Decimal('60.00'))
+        self.assertIn('per hour', self.transfer_errors('20')[0])
+        self.assertIsNone(self.transfer_errors('10'))
+
+    def test_batch_hourly_limit(self):
+        self.set_limits(hourly=Decimal('60.00'))
+        rejects = []
+        result = post_batch(read_csv(io.StringIO(
+            'account_no,amount,transaction_type\n'
+            '1000000001,10,withdrawal\n'
+            '1000000001,10,withdrawal\n'
+        )), on_reject=rejects.append)
+        self.assertEqual(result.posted, 1)
+        self.assertEqual(
+            [reject.reason for reject in rejects],
+            ['You can withdraw at most 60.00 $ per hour'],
+        )
+
+    @override_settings(SERVER_PROCESSES=4)
+    def test_refuses_per_process_stores_with_several_processes(self):
+        for store in ('LocalStore', 'CacheStore'):
+            with self.subTest(store), override_settings(
+                LIMITS_STORE=f'transactions.limits.{store}'
+            ), self.assertRaises(ImproperlyConfigured):
+                # The test cache is in-process memory.
+                limits.get_store()
+
+    def test_load_keeps_debits_added_meanwhile(self):
+        now = time.time()
+        for store in (limits.LocalStore(), limits.CacheStore()):
+            cache.clear()
+
+            def read():
+                # Commits after the ledger read, before the load ends.
+                store.add(1, Decimal('5.00'), now)
+                return [(now - 10, Decimal('20.00'))]
+
+            with self.subTest(type(store).__name__):
+                self.assertEqual(store.load(1, read, now), Decimal('25.00'))
+                self.assertEqual(store.withdrawn(1, now), Decimal('25.00'))
+
+
+# -------------------------
+# BATCH POSTING
+# -------------------------
+class BatchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.account = create_account(
+            'batch@x.com', 1000000001, balance=Decimal('100.00')
+        )
+
+    def post(self, rows):
+        rejects = []
+        result = post_batch(rows, on_reject=rejects.append)
+        return result, {reject.line: reject.reason for reject in rejects}
+
+    def test_posts_valid_rows(self):
+        result, rejects = self.post(read_csv(io.StringIO(
+            'account_no,amount,transaction_type\n'
+            '1000000001,50,deposit\n'
+            '1000000001,30,withdrawal\n'
+        )))
+        self.assertEqual((result.posted, rejects), (2, {}))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('120.00'))
+        self.assertEqual(
+            list(Transaction.objects.values_list(
+                'transaction_type', 'balance_after_transaction'
+            ).order_by('pk')),
+            [(DEPOSIT, Decimal('150.00')), (WITHDRAWAL, Decimal('120.00'))],
+        )
+
+    def test_rejects_invalid_values(self):
+        result, rejects = self.post(read_csv(io.StringIO(
+            'account_no,amount,transaction_type\n'
+            'abc,50,deposit\n'
+            '99999999999999999999,50,deposit\n'
+            '1000000001,NaN,deposit\n'
+            '1000000001,Infinity,deposit\n'
+            '1000000001,1e20,deposit\n'
+            '1000000001,ten,deposit\n'
+            '1000000001,50,refund\n'
+            '1000000001,5,deposit\n'
+            '1000000002,50,deposit\n'
+            '1000000001,500,withdrawal\n'
+            '1000000001,50,deposit\n'
+        )))
+        self.assertEqual((result.posted, result.rejected), (1, 10))
+        self.assertEqual(rejects, {
+            2: 'Invalid account number',
+            3: 'Invalid account number',
+            4: 'Invalid amount',
+            5: 'Invalid amount',
+            6: 'Invalid amount',
+            7: 'Invalid amount',
+            8: 'Invalid transaction type',
+            9: 'You need to deposit at least 10 $',
+            10: 'Account not found',
+            11: 'Insufficient balance',
+        })
+
+    def test_rejects_malformed_json_lines(self):
+        result, rejects = self.post(read_jsonl(io.StringIO(
+            '{"account_no": 1000000001, "amount": "50", '
+            '"transaction_type": "deposit"}\n'
+            '{"account_no": 1000000001,\n'
+            '[1000000001, 50, "deposit"]\n'
+            '"deposit"\n'
+            '\n'
+            '{"account_no": 1000000001, "amount": NaN, '
+            '"transaction_type": "deposit"}\n'
+        )))
+        self.assertEqual((result.posted, result.rejected), (1, 4))
+        self.assertEqual(rejects, {
+            2: 'Malformed record',
+            3: 'Malformed record',
+            4: 'Malformed record',
+            6: 'Invalid amount',
+        })
+        self.assertEqual(
+            UserBankAccount.objects.get().balance, Decimal('150.00')
+        )
+
+    def test_rejects_values_it_would_have_to_coerce(self):
+        result, rejects = self.post(read_jsonl(io.StringIO(
+            '{"account_no": 1000000001.9, "amount": 50, '
+            '"transaction_type": "deposit"}\n'
+            '{"account_no": true, "amount": 50, '
+            '"transaction_type": "deposit"}\n'
+            '{"account_no": 1000000001, "amount": 10.005, '
+            '"transaction_type": "deposit"}\n'
+            '{"account_no": 1000000001, "amount": "10.001", '
+            '"transaction_type": "deposit"}\n'
+            '{"account_no": 1000000001, "amount": true, '
+            '"transaction_type": "deposit"}\n'
+            '{"account_no": "1000000001", "amount": "10.50", '
+            '"transaction_type": "deposit"}\n'
+            '{"account_no": 1000000001, "amount": 12.5, '
+            '"transaction_type": "deposit"}\n'
+        )))
+        self.assertEqual((result.posted, result.rejected), (2, 5))
+        self.assertEqual(rejects, {
+            1: 'Invalid account number',
+            2: 'Invalid account number',
+            3: 'Invalid amount',
+            4: 'Invalid amount',
+            5: 'Invalid amount',
+        })
+        self.assertEqual(
+            UserBankAccount.objects.get().balance, Decimal('123.00')
+        )
+
+    def test_command_writes_rejects_to_a_file(self):
+        temporary = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary.cleanup)
+        directory = Path(temporary.name)
+        batch = directory / 'batch.csv'
+        batch.write_text(
+            'account_no,amount,transaction_type\n'
+            '1000000001,50,deposit\n'
+            '1000000009,50,deposit\n'
+        )
+
+        with self.assertRaises(CommandError):
+            call_command(
+                'post_batch', str(batch),
+                '--rejects', str(directory / 'missing' / 'rejects.csv'),
+            )
+        self.assertFalse(Transaction.objects.exists())
+
+        rejects = directory / 'rejects.csv'
+        call_command(
+            'post_batch', str(batch), '--rejects', str(rejects),
+            stdout=io.StringIO(),
+        )
+        self.assertEqual(rejects.read_text().splitlines(), [
+            'line,account_no,reason',
+            '3,1000000009,Account not found',
+        ])
+
+
+# -------------------------
+# JOURNAL CHECK
+# -------------------------
+@mock.patch.object(limits, '_store', None)
+class JournalCheckTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sender = create_account('sender@x.com', 1000000001)
+        cls.receiver = create_account('receiver@x.com', 1000000002)
+
+    def setUp(self):
+        cache.clear()
+        ledger.deposit(self.sender, Decimal('100.00'))
+        self.debit, self.credit = ledger.transfer(
+            self.sender, self.receiver, Decimal('25.00')
+        )
+        self.today = timezone.localdate()
+
+    def check_journal(self, stdout):
+        call_command(
+            'check_journal', '--date', self.today.isoformat(), stdout=stdout
+        )
+
+    def test_reports_unbalanced_entries(self):
+        self.assertEqual(unbalanced(self.today), {})
+        self.check_journal(io.StringIO())
+
+        Transaction.objects.filter(pk=self.credit.pk).update(
+            amount=Decimal('30.00')
+        )
+        self.assertEqual(
+            unbalanced(self.today), {self.debit.journal_entry_id: 5}
+        )
+        stdout = io.StringIO()
+        with self.assertRaisesMessage(
+            CommandError, '1 unbalanced journal entries'
+        ):
+            self.check_journal(stdout)
+        self.assertIn(
+            f'Journal entry {self.debit.journal_entry_id}: 5',
+            stdout.getvalue(),
+        )
+        # Another day's entries are not read.
+        self.today -= datetime.timedelta(days=1)
+        self.assertEqual(unbalanced(self.today), {})
+
+
+# -------------------------
+# RECONCILIATION
+# -------------------------
+@mock.patch.object(limits, '_store', None)
+class ReconciliationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.account = create_account('reconcile@x.com', 1000000001)
+        cls.other = create_account('other@x.com', 1000000002)
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        report_dir = override_settings(
+            RECONCILIATION_DIR=Path(directory.name)
+        )
+        report_dir.enable()
+        self.addCleanup(report_dir.disable)
+
+        for account in (self.account, self.other):
+            ledger.deposit(account, Decimal('100.00'))
+            ledger.withdraw(account, Decimal('40.00'))
+            ledger.deposit(account, Decimal('15.00'))
+
+    def reconcile(self):
+        # A chunk size of one puts every row in a chunk of its own.
+        return list(reconciliation.reconcile(
+            UserBankAccount.objects.all(), 'default', chunk_size=1
+        ))
+
+    def reconcile_ledger(self, run_key):
+        call_command(
+            'reconcile_ledger', '--run-key', run_key, '--workers', '1',
+            stdout=io.StringIO(),
+        )
+
+    def test_reports_balance_mismatches(self):
+        self.assertEqual(self.reconcile(), [])
+        self.reconcile_ledger('clean')
+
+        UserBankAccount.objects.filter(pk=self.other.pk).update(
+            balance=Decimal('80.00')
+        )
+        self.assertEqual(self.reconcile(), [
+            reconciliation.Discrepancy(
+                1000000002, '', 'balance', Decimal('75.00'), Decimal('80.00')
+            ),
+        ])
+        with self.assertRaisesMessage(CommandError, '1 discrepancies'):
+            self.reconcile_ledger('mismatch')
+        report = (
+            settings.RECONCILIATION_DIR / 'mismatch' / 'discrepancies.csv'
+        )
+        self.assertEqual(report.read_text().splitlines(), [
+            ','.join(reconciliation.REPORT_FIELDS),
+            '1000000002,,balance,75.00,80.00',
+        ])
+
+    def test_reports_broken_running_balances(self):
+        _, withdrawal, deposit = self.account.transactions.order_by('pk')
+        Transaction.objects.filter(pk=withdrawal.pk).update(
+            balance_after_transaction=Decimal('70.00')
+        )
+        # The row itself and the one after it, but not the stored balance.
+        self.assertEqual(
+            [(d.transaction_id, d.kind, d.expected, d.found)
+             for d in self.reconcile()],
+            [
+                (withdrawal.pk, 'continuity', Decimal('60.00'),
+                 Decimal('70.00')),
+                (deposit.pk, 'continuity', Decimal('85.00'),
+                 Decimal('75.00')),
+            ],
+        )
+
+
+# -------------------------
+# ACCOUNT AGGREGATES
+# -------------------------
+@mock.patch.object(limits, '_store', None)
+class AggregateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.account = create_account('aggregates@x.com', 1000000001)
+        cls.other = create_account('other@x.com', 1000000002)
+
+    def setUp(self):
+        cache.clear()
+        for account in (self.account, self.other):
+            ledger.deposit(account, Decimal('100.00'))
+            ledger.withdraw(account, Decimal('40.00'))
+
+    def verify(self, *args):
+        stdout = io.StringIO()
+        call_command('verify_account_aggregates', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_reports_and_fixes_drift(self):
+        self.assertEqual(list(aggregates.verify()), [])
+        UserBankAccount.objects.filter(pk=self.account.pk).update(
+            total_credit=Decimal('90.00'), transaction_count=3
+        )
+
+        drift = [
+            aggregates.Drift(
+                1000000001, 'total_credit', Decimal('90.00'),
+                Decimal('100.00'),
+            ),
+            aggregates.Drift(1000000001, 'transaction_count', 3, 2),
+        ]
+        # Reporting leaves the account as it is.
+        self.assertEqual(list(aggregates.verify(chunk_size=1)), drift)
+        self.assertIn('1 accounts drifted', self.verify())
+        self.assertIn(
+            '1000000001 total_credit: stored 90.00, ledger 100.00',
+            self.verify('--account-no', '1000000001'),
+        )
+        self.assertIn(
+            'No drift found', self.verify('--account-no', '1000000002')
+        )
+
+        self.assertIn('Fixed 1 drifted accounts', self.verify('--fix'))
+        self.account.refresh_from_db()
+        self.assertEqual(
+            (self.account.total_credit, self.account.transaction_count),
+            (Decimal('100.00'), 2),
+        )
+        self.assertIn('No drift found', self.verify())
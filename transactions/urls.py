@@ -3,6 +3,7 @@ from .views import (
     DepositMoneyView,
     WithdrawMoneyView,
     TransactionRepostView,
+    TransactionExportView,
     fund_transfer,
 )
 
@@ -12,5 +13,10 @@ urlpatterns = [
     path("deposit/", DepositMoneyView.as_view(), name="deposit_money"),
     path("withdraw/", WithdrawMoneyView.as_view(), name="withdraw_money"),
     path("report/", TransactionRepostView.as_view(), name="transaction_report"),
+    path(
+        "report/export/",
+        TransactionExportView.as_view(),
+        name="transaction_export",
+    ),
     path("transfer/", fund_transfer, name="fund_transfer"),
 ]
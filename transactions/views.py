@@ -1,12 +1,25 @@
+import csv
+import datetime
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from itertools import chain
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import router
+from django.db.models import Q
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.urls import reverse_lazy
-from django.views.generic import CreateView, ListView
+from django.utils.decorators import method_decorator
+from django.views.generic import CreateView, ListView, View
 
 from accounts.models import UserBankAccount
+from transactions import ledger
 from transactions.constants import DEPOSIT, WITHDRAWAL
+from transactions.idempotency import FORM_FIELD, idempotent, new_key
 from transactions.forms import (
     DepositForm,
     WithdrawForm,
@@ -14,42 +27,158 @@ from transactions.forms import (
     FundTransferForm,
 )
 from transactions.models import Transaction
+from transactions.partitions import archived_statement_rows
+from transactions.statements import STATEMENT_FIELDS, encode_row
 
 
 # -------------------------
 # TRANSACTION REPORT
 # -------------------------
+def filter_by_daterange(queryset, daterange):
+    if daterange:
+        start, end = daterange
+        queryset = queryset.filter(timestamp__gte=start, timestamp__lt=end)
+    return queryset
+
+
+def encode_cursor(transaction):
+    value = f'{transaction.timestamp.isoformat()}|{transaction.pk}'
+    return urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, pk = urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeError):
+        return None
+
+
 class TransactionRepostView(LoginRequiredMixin, ListView):
+    """
+    Keyset-paginated on ``(timestamp, id)``: each page continues strictly
+    after the last row of the previous one, so fetching a page costs the
+    same index range scan no matter how deep into the history it is.
+    """
     template_name = 'transactions/transaction_report.html'
     model = Transaction
+    read_only = True
     form_data = {}
 
     def get(self, request, *args, **kwargs):
-        form = TransactionDateRangeForm(request.GET or None)
-        if form.is_valid():
-            self.form_data = form.cleaned_data
+        self.form = TransactionDateRangeForm(request.GET or None)
+        if self.form.is_valid():
+            self.form_data = self.form.cleaned_data
         return super().get(request, *args, **kwargs)
 
+    def get_page_size(self):
+        return settings.TRANSACTION_REPORT_PAGE_SIZE
+
     def get_queryset(self):
         queryset = Transaction.objects.filter(
             account=self.request.user.account
         )
 
-        daterange = self.form_data.get("daterange")
-        if daterange:
-            queryset = queryset.filter(timestamp__date__range=daterange)
+        queryset = filter_by_daterange(
+            queryset, self.form_data.get("daterange")
+        )
 
-        return queryset
+        cursor = decode_cursor(self.request.GET.get('after', ''))
+        if cursor:
+            timestamp, pk = cursor
+            queryset = queryset.filter(
+                Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, pk__gt=pk),
+                timestamp__gte=timestamp,
+            )
+
+        # One extra row tells us whether there is a next page.
+        return queryset.order_by('timestamp', 'pk')[:self.get_page_size() + 1]
 
     def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+        object_list = list(kwargs.pop('object_list', self.object_list))
+        page_size = self.get_page_size()
+        has_next = len(object_list) > page_size
+        object_list = object_list[:page_size]
+
+        context = super().get_context_data(object_list=object_list, **kwargs)
         context.update({
             'account': self.request.user.account,
-            'form': TransactionDateRangeForm(self.request.GET or None),
+            'form': self.form,
+            'next_cursor': encode_cursor(object_list[-1]) if has_next else None,
         })
         return context
 
 
+# -------------------------
+# STATEMENT EXPORT
+# -------------------------
+class Echo:
+    """
+    File-like object that hands back what is written to it, so ``csv``
+    can format one row at a time for a streaming response.
+    """
+
+    def write(self, value):
+        return value
+
+
+class TransactionExportView(LoginRequiredMixin, View):
+    """
+    Stream the full statement as CSV or NDJSON.
+
+    Rows are read through a server-side cursor as plain tuples and encoded
+    as they go out, so memory stays flat whatever the statement size.
+    Archived months come first, read back from their archive files. The
+    rows are read after the view returns, so the database is picked here.
+    """
+    fields = STATEMENT_FIELDS
+    read_only = True
+    content_types = {
+        'csv': 'text/csv',
+        'ndjson': 'application/x-ndjson',
+    }
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in self.content_types:
+            return HttpResponseBadRequest('Unsupported export format')
+
+        form = TransactionDateRangeForm(request.GET or None)
+        daterange = form.cleaned_data['daterange'] if form.is_valid() else None
+
+        account = request.user.account
+        using = router.db_for_read(Transaction)
+        rows = chain(
+            archived_statement_rows(account.pk, daterange, using),
+            filter_by_daterange(
+                Transaction.objects.using(using).filter(account=account),
+                daterange,
+            ).order_by('timestamp', 'pk').values_list(*self.fields).iterator(
+                chunk_size=settings.TRANSACTION_EXPORT_CHUNK_SIZE
+            ),
+        )
+
+        encode = getattr(self, f'encode_{export_format}')
+        response = StreamingHttpResponse(
+            encode(rows), content_type=self.content_types[export_format]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="statement-{account.account_no}'
+            f'.{export_format}"'
+        )
+        return response
+
+    def encode_csv(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.fields)
+        for row in rows:
+            yield writer.writerow(encode_row(*row))
+
+    def encode_ndjson(self, rows):
+        for row in rows:
+            yield json.dumps(dict(zip(self.fields, encode_row(*row)))) + '\n'
+
+
 # -------------------------
 # BASE MIXIN
 # -------------------------
@@ -63,10 +192,18 @@ class TransactionCreateMixin(LoginRequiredMixin, CreateView):
         kwargs['account'] = self.request.user.account
         return kwargs
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['idempotency_key'] = (
+            self.request.POST.get(FORM_FIELD) or new_key()
+        )
+        return context
+
 
 # -------------------------
 # DEPOSIT
 # -------------------------
+@method_decorator(idempotent, name='dispatch')
 class DepositMoneyView(TransactionCreateMixin):
     form_class = DepositForm
 
@@ -75,18 +212,16 @@ class DepositMoneyView(TransactionCreateMixin):
 
     def form_valid(self, form):
         amount = form.cleaned_data['amount']
-        account = self.request.user.account
-
-        account.balance += amount
-        account.save(update_fields=['balance'])
+        response = super().form_valid(form)
 
         messages.success(self.request, f'{amount} credited successfully')
-        return super().form_valid(form)
+        return response
 
 
 # -------------------------
 # WITHDRAW
 # -------------------------
+@method_decorator(idempotent, name='dispatch')
 class WithdrawMoneyView(TransactionCreateMixin):
     form_class = WithdrawForm
 
@@ -95,19 +230,21 @@ class WithdrawMoneyView(TransactionCreateMixin):
 
     def form_valid(self, form):
         amount = form.cleaned_data['amount']
-        account = self.request.user.account
-
-        account.balance -= amount
-        account.save(update_fields=['balance'])
+        try:
+            response = super().form_valid(form)
+        except ledger.InsufficientFunds as e:
+            form.add_error('amount', str(e))
+            return self.form_invalid(form)
 
         messages.success(self.request, f'{amount} debited successfully')
-        return super().form_valid(form)
+        return response
 
 
 # -------------------------
 # FUND TRANSFER  ✅ MUST BE AT MODULE LEVEL
 # -------------------------
 @login_required
+@idempotent
 def fund_transfer(request):
     from_account = request.user.account
 
@@ -117,38 +254,22 @@ def fund_transfer(request):
             to_account_no = form.cleaned_data['to_account']
             amount = form.cleaned_data['amount']
 
+            # Failures re-render the form rather than redirecting, so an
+            # idempotency key is only ever bound to a completed transfer.
             try:
                 to_account = UserBankAccount.objects.get(
                     account_no=to_account_no
                 )
             except UserBankAccount.DoesNotExist:
-                messages.error(request, "Target account not found")
-                return redirect('transactions:fund_transfer')
-
-            # Debit
-            from_account.balance -= amount
-            from_account.save()
-
-            Transaction.objects.create(
-                account=from_account,
-                amount=amount,
-                balance_after_transaction=from_account.balance,
-                transaction_type=WITHDRAWAL,
-            )
-
-            # Credit
-            to_account.balance += amount
-            to_account.save()
-
-            Transaction.objects.create(
-                account=to_account,
-                amount=amount,
-                balance_after_transaction=to_account.balance,
-                transaction_type=DEPOSIT,
-            )
-
-            messages.success(request, "Fund transfer successful")
-            return redirect('accounts:dashboard')
+                form.add_error('to_account', "Target account not found")
+            else:
+                try:
+                    ledger.transfer(from_account, to_account, amount)
+                except ledger.PostingError as e:
+                    form.add_error(None, str(e))
+                else:
+                    messages.success(request, "Fund transfer successful")
+                    return redirect('accounts:dashboard')
 
     else:
         form = FundTransferForm(account=from_account)
@@ -156,5 +277,8 @@ def fund_transfer(request):
     return render(
         request,
         'transactions/fund_transfer.html',
-        {'form': form},
+        {
+            'form': form,
+            'idempotency_key': request.POST.get(FORM_FIELD) or new_key(),
+        },
     )